@@ -1,27 +1,49 @@
 import uuid
 import tempfile
 import os
+from contextlib import asynccontextmanager
 from datetime import datetime, timezone
-from typing import Dict, Optional
-from fastapi import FastAPI, UploadFile, File, HTTPException, BackgroundTasks, Depends, Header
-from fastapi.responses import StreamingResponse
+from typing import Dict, List, Optional
+from fastapi import FastAPI, UploadFile, File, Form, HTTPException, BackgroundTasks, Depends, Header, Query
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import Response, StreamingResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from fastapi.responses import StreamingResponse
 from dotenv import load_dotenv
 import pandas as pd
 from app.services.evaluation_service import EvaluationService
 from app.services.cloud_storage import CloudStorageService
-from app.utils.csv_handler import read_product_ids, write_evaluation_results
+from app.services.diff_report import compute_diff, load_category_lookup, load_result_set, parse_db_source
+from app.services.result_writer import CsvSink, DatabaseSink, ResultSink, ResultsIndexSink, ResultWriter
+from app.services.results_index import GROUP_BY_COLUMNS, MAX_PAGE_SIZE, ResultsIndex, get_results_index
+from app.services.vtex_client import resolve_account
+from app.services.webhook_notifier import get_webhook_notifier, validate_callback_url
+from app.utils.csv_handler import read_product_ids
 from app.models.product import Product
 from app.models.evaluation_result import EvaluationResult
+from app.utils.budget import create_governor, get_global_budget, job_budget
+from app.utils.circuit_breaker import circuit_breaker_snapshots
+from app.utils.job_control import JobCancelled, JobControl
 from app.utils.logger import get_logger
+from app.utils.metrics import render_latest
+from app.utils.rate_limiter import rate_limiter_snapshots
+from app.utils.tracing import tracer
 
 # Load environment variables
 load_dotenv()
 
 logger = get_logger(__name__)
 
-app = FastAPI(title="Catalog Quality Evaluator API", version="1.0.0")
+tracer.configure(export_path=os.getenv('TRACE_EXPORT_PATH'))
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    # The export file is buffered; spans still in the buffer are lost unless it is closed
+    tracer.close()
+
+
+app = FastAPI(title="Catalog Quality Evaluator API", version="1.0.0", lifespan=lifespan)
 
 # API Key security
 API_KEY = os.getenv('API_KEY', 'your-secret-api-key-here')  # Change this to a secure key
@@ -42,14 +64,48 @@ async def health_check() -> Dict:
     return {"status": "healthy", "version": "1.0.0"}
 
 
+@app.get("/health/upstreams")
+async def upstream_health() -> Dict:
+    """Circuit breaker, rate limiter and daily budget state for VTEX and Gemini, and webhook delivery state."""
+    return {
+        "circuit_breakers": circuit_breaker_snapshots(),
+        "rate_limiters": rate_limiter_snapshots(),
+        "gemini_budget": get_global_budget().snapshot(),
+        "webhooks": get_webhook_notifier().snapshot(),
+    }
+
+
+@app.get("/metrics")
+async def metrics() -> Response:
+    """Prometheus metrics for scraping."""
+    payload, content_type = render_latest()
+    return Response(content=payload, media_type=content_type)
+
+
 @app.post("/evaluate", dependencies=[Depends(verify_api_key)])
 async def evaluate_catalog(
     background_tasks: BackgroundTasks,
-    file: UploadFile = File(...)
+    file: UploadFile = File(...),
+    account: Optional[str] = Form(None, description="VTEX account to evaluate (default VTEX_ACCOUNT_NAME)"),
+    callback_url: Optional[str] = Form(None),
+    progress_every: int = Form(0, ge=0, description="Send a job.progress webhook every N batches (0 = off)"),
+    max_requests: Optional[int] = Form(None, ge=0, description="Gemini request cap for this job (0 = unlimited)"),
+    max_input_tokens: Optional[int] = Form(None, ge=0, description="Gemini input token cap for this job"),
+    max_output_tokens: Optional[int] = Form(None, ge=0, description="Gemini output token cap for this job")
 ) -> Dict:
     """Start catalog quality evaluation job."""
     if not file.filename.endswith('.csv'):
         raise HTTPException(status_code=400, detail="File must be CSV")
+    if callback_url:
+        try:
+            # Resolves the host, so keep the DNS lookup off the event loop
+            await run_in_threadpool(validate_callback_url, callback_url)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    try:
+        account = resolve_account(account)[0]
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
     # Generate job ID
     job_id = str(uuid.uuid4())
@@ -65,8 +121,14 @@ async def evaluate_catalog(
         'status': 'processing',
         'started_at': datetime.now(timezone.utc),
         'input_file': input_file,
-        'progress': {'processed': 0, 'total': 0, 'errors': 0}
+        'account': account,
+        'progress': {'processed': 0, 'total': 0, 'errors': 0},
+        'callback_url': callback_url,
+        'progress_every': progress_every,
+        'budget': job_budget(job_id, max_requests, max_input_tokens, max_output_tokens),
+        'control': JobControl()
     }
+    jobs[job_id]['governor'] = create_governor(jobs[job_id]['budget'])
 
     # Start background processing
     background_tasks.add_task(process_evaluation_job, job_id)
@@ -90,12 +152,174 @@ async def get_job_status(job_id: str) -> Dict:
     return {
         'job_id': job_id,
         'status': job['status'],
+        'account': job['account'],
         'progress': job.get('progress', {}),
         'started_at': job['started_at'].isoformat(),
-        'completed_at': job.get('completed_at', '').isoformat() if 'completed_at' in job else None
+        'completed_at': job.get('completed_at', '').isoformat() if 'completed_at' in job else None,
+        'budget': job['governor'].snapshot(),
+        'control': job['control'].snapshot()
     }
 
 
+@app.post("/jobs/{job_id}/budget", dependencies=[Depends(verify_api_key)])
+async def update_job_budget(
+    job_id: str,
+    max_requests: Optional[int] = Form(None, ge=0),
+    max_input_tokens: Optional[int] = Form(None, ge=0),
+    max_output_tokens: Optional[int] = Form(None, ge=0)
+) -> Dict:
+    """Change a job's Gemini caps; raising an exhausted cap resumes a paused job."""
+    if job_id not in jobs:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    job = jobs[job_id]
+    job['budget'].set_caps(
+        requests=max_requests, input_tokens=max_input_tokens, output_tokens=max_output_tokens
+    )
+    logger.info("Updated job budget", extra={'job_id': job_id})
+    return job['budget'].snapshot()
+
+
+def _control_job(job_id: str, action: str) -> Dict:
+    if job_id not in jobs:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    job = jobs[job_id]
+    if job['status'] not in ('processing', 'paused'):
+        raise HTTPException(status_code=409, detail=f"Cannot {action} a job that is {job['status']}")
+    if not getattr(job['control'], action)():
+        # Also refused once evaluation finished, while results are still being stored
+        raise HTTPException(status_code=409, detail=f"Cannot {action} a job that is {job['control'].state}")
+
+    if action == 'pause':
+        job['status'] = 'paused'
+    elif action == 'resume':
+        job['status'] = 'processing'
+    else:
+        job['status'] = 'cancelling'
+    logger.info(f"Job {action} requested", extra={'job_id': job_id})
+    return {'job_id': job_id, 'status': job['status'], 'progress': dict(job['progress'])}
+
+
+@app.post("/jobs/{job_id}/cancel", dependencies=[Depends(verify_api_key)])
+async def cancel_job(job_id: str) -> Dict:
+    """Stop a job at its next checkpoint, keeping the results it already produced."""
+    return _control_job(job_id, 'cancel')
+
+
+@app.post("/jobs/{job_id}/pause", dependencies=[Depends(verify_api_key)])
+async def pause_job(job_id: str) -> Dict:
+    """Hold a job at its next checkpoint; Gemini calls already in flight finish."""
+    return _control_job(job_id, 'pause')
+
+
+@app.post("/jobs/{job_id}/resume", dependencies=[Depends(verify_api_key)])
+async def resume_job(job_id: str) -> Dict:
+    """Continue a paused job where it stopped."""
+    return _control_job(job_id, 'resume')
+
+
+def _require_results_index() -> ResultsIndex:
+    results_index = get_results_index()
+    if results_index is None:
+        raise HTTPException(status_code=503, detail="Results index not configured (set RESULTS_INDEX_PATH)")
+    return results_index
+
+
+# Declared before /results/{job_id} so these paths are not captured as job ids
+@app.get("/results/query", dependencies=[Depends(verify_api_key)])
+def query_results(
+    account: Optional[str] = Query(None, description="VTEX account (default VTEX_ACCOUNT_NAME)"),
+    category: Optional[str] = None,
+    brand: Optional[str] = None,
+    category_id: Optional[str] = None,
+    brand_id: Optional[str] = None,
+    job_id: Optional[str] = None,
+    min_score: Optional[int] = Query(None, ge=0, le=5),
+    max_score: Optional[int] = Query(None, ge=0, le=5),
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    after: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE)
+) -> Dict:
+    """Filtered, paginated lookup of the latest evaluation per product of one account."""
+    return _require_results_index().query(
+        account=account, category=category, brand=brand, category_id=category_id, brand_id=brand_id, job_id=job_id,
+        min_score=min_score, max_score=max_score, since=since, until=until, after=after, limit=limit
+    )
+
+
+@app.get("/results/summary", dependencies=[Depends(verify_api_key)])
+def summarize_results(
+    group_by: str = Query('category', description=f"One of {', '.join(GROUP_BY_COLUMNS)}"),
+    account: Optional[str] = Query(None, description="VTEX account (default VTEX_ACCOUNT_NAME)"),
+    category: Optional[str] = None,
+    brand: Optional[str] = None,
+    category_id: Optional[str] = None,
+    brand_id: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None
+) -> Dict:
+    """Product counts, average score and score distribution per category, brand, their ids or day."""
+    results_index = _require_results_index()
+    try:
+        return results_index.summary(
+            group_by, account=account, category=category, brand=brand, category_id=category_id, brand_id=brand_id,
+            since=since, until=until
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+def _diff_source(source: str) -> str:
+    """Map a job id, results-bucket URL or db source to something load_result_set reads.
+
+    Arbitrary local paths are not accepted from API callers.
+    """
+    if source in jobs:
+        results_file = jobs[source].get('results_file')
+        if jobs[source]['status'] not in ('completed', 'cancelled') or not results_file:
+            raise HTTPException(status_code=404, detail=f"Job {source} has no results")
+        return results_file
+    bucket_name = os.getenv('GCS_BUCKET_NAME', 'catalog-evaluator-results')
+    if source.startswith(f"gs://{bucket_name}/"):
+        return source
+    if source == 'db' or source.startswith('db:'):
+        try:
+            parse_db_source(source)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        return source
+    raise HTTPException(
+        status_code=400,
+        detail=f"Unknown result set {source}: use a job id, gs://{bucket_name}/..., db or db:SINCE..UNTIL"
+    )
+
+
+@app.get("/diff", dependencies=[Depends(verify_api_key)])
+def diff_results(
+    base: str = Query(..., description="Earlier result set"),
+    head: str = Query(..., description="Later result set"),
+    top: int = Query(20, ge=0, le=MAX_PAGE_SIZE),
+    account: Optional[str] = Query(None, description="VTEX account of db sources and index categories")
+) -> Dict:
+    """Compare two result sets: score deltas, new/removed products and per-category movement."""
+    base_source, head_source = _diff_source(base), _diff_source(head)
+    try:
+        report = compute_diff(
+            load_result_set(base_source, account=account),
+            load_result_set(head_source, account=account),
+            category_lookup=load_category_lookup(get_results_index(), account),
+            top=top
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Diff of {base} and {head} failed: {e}")
+        raise HTTPException(status_code=500, detail="Failed to compute diff")
+    return {'base': base, 'head': head, **report.to_dict()}
+
+
 @app.get("/results/{job_id}", dependencies=[Depends(verify_api_key)])
 async def get_job_results(job_id: str):
     """Download evaluation results CSV."""
@@ -103,7 +327,8 @@ async def get_job_results(job_id: str):
         raise HTTPException(status_code=404, detail="Job not found")
 
     job = jobs[job_id]
-    if job['status'] != 'completed':
+    # Cancelled jobs keep (and serve) the results produced before cancellation
+    if job['status'] not in ('completed', 'cancelled'):
         raise HTTPException(status_code=404, detail="Job not completed")
 
     results_file = job.get('results_file')
@@ -147,6 +372,13 @@ async def get_job_results(job_id: str):
         )
 
 
+def _notify(job_id: str, event: str, **data) -> None:
+    """Queue a webhook event if the job registered a callback URL."""
+    job = jobs[job_id]
+    if job.get('callback_url'):
+        get_webhook_notifier().notify(job['callback_url'], event, job_id, {'progress': dict(job['progress']), **data})
+
+
 def process_evaluation_job(job_id: str):
     """Background task to process evaluation job."""
     try:
@@ -158,18 +390,17 @@ def process_evaluation_job(job_id: str):
         job['progress']['total'] = len(product_ids)
 
         # Initialize evaluation service
-        evaluation_service = EvaluationService()
-
-        # Evaluate catalog
-        products, evaluation_results = evaluation_service.evaluate_catalog(product_ids)
-
-        # Update progress
-        job['progress']['processed'] = len(product_ids)
-        job['progress']['errors'] = sum(1 for result in evaluation_results if result.quality_score == 0)
+        evaluation_service = EvaluationService(
+            budget=job['governor'], control=job['control'], account=job['account']
+        )
 
         # Initialize Cloud Storage (cheaper than database!)
-        storage_service = CloudStorageService()
-        storage_service.ensure_bucket_exists()
+        storage_service = None
+        try:
+            storage_service = CloudStorageService()
+            storage_service.ensure_bucket_exists()
+        except Exception as e:
+            logger.warning(f"Cloud Storage initialization failed: {e}. Using local storage.")
         
         # Optional database service (only if configured)
         db_service = None
@@ -182,41 +413,73 @@ def process_evaluation_job(job_id: str):
             except Exception as e:
                 logger.warning(f"Database initialization failed: {e}. Using Cloud Storage only.")
 
-        # Store results in database (optional)
-        if evaluation_results:
-            if db_service:
-                try:
-                    db_service.store_evaluation_results(products, evaluation_results)
-                except Exception as e:
-                    logger.warning(f"Database storage failed: {e}. Results stored in Cloud Storage only.")
-            
+        # Evaluate catalog; the writer stage streams batches to a local CSV, the index and the database
+        with tempfile.NamedTemporaryFile(delete=False, suffix='.csv') as temp_file:
+            results_path = temp_file.name
+        sinks: List[ResultSink] = [CsvSink(results_path)]
+        results_index = get_results_index()
+        if results_index:
+            sinks.append(ResultsIndexSink(results_index, job_id, job['account']))
+        if db_service:
+            sinks.append(DatabaseSink(db_service, job['account']))
+
+        progress_every = job.get('progress_every') or 0
+        batch_count = 0
+        cancelled = False
+        with ResultWriter(sinks) as writer:
+            try:
+                for batch in evaluation_service.evaluate_catalog_batches(product_ids):
+                    writer.submit(batch)
+                    batch_count += 1
+                    job['progress']['processed'] += len(batch)
+                    job['progress']['errors'] += batch.scores.count(0)
+                    if progress_every and batch_count % progress_every == 0:
+                        _notify(job_id, 'job.progress')
+                # Every product was evaluated; a cancel accepted just before this still counts
+                cancelled = not job['control'].finish()
+            except JobCancelled:
+                # Raised at a chunk boundary once the chunk's finished rows were yielded;
+                # batches already submitted are still flushed when the writer closes
+                cancelled = True
+                logger.info(f"Job cancelled after {job['progress']['processed']} products", extra={'job_id': job_id})
+
+        if not cancelled:
+            job['progress']['processed'] = len(product_ids)
+
+        if writer.rows_written:
             # Always store results in Cloud Storage (much cheaper!)
             try:
+                if storage_service is None:
+                    raise RuntimeError("Cloud Storage is not available")
                 gcs_filename = f"results_{job_id}.csv"
-                gcs_url = storage_service.upload_results_csv(evaluation_results, gcs_filename)
+                gcs_url = storage_service.upload_results_file(results_path, gcs_filename)
                 job['results_file'] = gcs_url
+                os.unlink(results_path)
                 logger.info(f"Results stored in Cloud Storage: {gcs_url}")
             except Exception as e:
                 logger.error(f"Cloud Storage upload failed: {e}")
-                # Fallback: store locally
-                with tempfile.NamedTemporaryFile(delete=False, suffix='.csv') as temp_file:
-                    write_evaluation_results(evaluation_results, temp_file.name)
-                    job['results_file'] = temp_file.name
-                    logger.warning("Using local storage as fallback")
+                # Fallback: keep the local CSV
+                job['results_file'] = results_path
+                logger.warning("Using local storage as fallback")
         else:
             logger.warning("No evaluation results to store")
 
         # Update job status
-        job['status'] = 'completed'
+        job['status'] = 'cancelled' if cancelled else 'completed'
         job['completed_at'] = datetime.now(timezone.utc)
 
-        logger.info("Completed evaluation job", extra={'job_id': job_id})
+        logger.info(f"Job {job['status']}", extra={'job_id': job_id})
+        _notify(job_id, f"job.{job['status']}", results_path=f"/results/{job_id}",
+                completed_at=job['completed_at'].isoformat())
 
     except Exception as e:
         logger.error(f"Job {job_id} failed: {e}", extra={'job_id': job_id})
         job['status'] = 'failed'
         job['error'] = str(e)
+        _notify(job_id, 'job.failed', error=str(e))
     finally:
+        # A job's spans are complete once it reaches a terminal status
+        tracer.flush()
         # Cleanup input file
         if os.path.exists(input_file):
             os.unlink(input_file)
\ No newline at end of file
@@ -5,39 +5,143 @@ Run this script to create the required tables for the catalog evaluator.
 """
 
 import os
+from datetime import datetime, timedelta, timezone
 from dotenv import load_dotenv
+from sqlalchemy import text
 from app.services.database import DatabaseService
 from app.utils.logger import get_logger
 
 logger = get_logger(__name__)
 
-# Schema SQL from data-model.md
+# Schema SQL from data-model.md; product ids are only unique within a VTEX account
 SCHEMA_SQL = """
 CREATE TABLE IF NOT EXISTS products (
-    product_id VARCHAR(255) PRIMARY KEY,
+    account VARCHAR(255) NOT NULL,
+    product_id VARCHAR(255) NOT NULL,
     description TEXT,
     name VARCHAR(255),
     category VARCHAR(255),
     brand VARCHAR(255),
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (account, product_id)
 );
 
-CREATE TABLE IF NOT EXISTS evaluation_results (
-    id SERIAL PRIMARY KEY,
-    product_id VARCHAR(255) NOT NULL REFERENCES products(product_id),
-    quality_score INTEGER NOT NULL CHECK (quality_score >= 0 AND quality_score <= 5),
-    evaluation_timestamp TIMESTAMP NOT NULL,
+-- Full evaluation history, one row per evaluation run, range-partitioned by month.
+-- Partitions are created by DatabaseService as new months are written.
+CREATE TABLE IF NOT EXISTS evaluation_history (
+    id BIGINT GENERATED ALWAYS AS IDENTITY,
+    account VARCHAR(255) NOT NULL,
+    product_id VARCHAR(255) NOT NULL,
+    quality_score SMALLINT NOT NULL CHECK (quality_score >= 0 AND quality_score <= 5),
+    evaluation_timestamp TIMESTAMPTZ NOT NULL,
     reason TEXT,
     raw_response TEXT,
-    UNIQUE(product_id)
+    PRIMARY KEY (evaluation_timestamp, id)
+) PARTITION BY RANGE (evaluation_timestamp);
+
+-- Covering indexes: per-product history and score filters are answered from the index
+CREATE INDEX IF NOT EXISTS idx_evaluation_history_product_ts
+    ON evaluation_history (account, product_id, evaluation_timestamp DESC) INCLUDE (quality_score);
+CREATE INDEX IF NOT EXISTS idx_evaluation_history_score_ts
+    ON evaluation_history (quality_score, evaluation_timestamp DESC) INCLUDE (account, product_id);
+
+-- Latest score per product, upserted alongside every history insert
+CREATE TABLE IF NOT EXISTS latest_evaluations (
+    account VARCHAR(255) NOT NULL,
+    product_id VARCHAR(255) NOT NULL,
+    quality_score SMALLINT NOT NULL CHECK (quality_score >= 0 AND quality_score <= 5),
+    evaluation_timestamp TIMESTAMPTZ NOT NULL,
+    reason TEXT,
+    PRIMARY KEY (account, product_id)
 );
 
--- Indexes for performance
-CREATE INDEX IF NOT EXISTS idx_evaluation_results_product_id ON evaluation_results(product_id);
-CREATE INDEX IF NOT EXISTS idx_evaluation_results_timestamp ON evaluation_results(evaluation_timestamp);
+CREATE INDEX IF NOT EXISTS idx_latest_evaluations_score
+    ON latest_evaluations (account, quality_score, product_id);
+CREATE INDEX IF NOT EXISTS idx_latest_evaluations_timestamp
+    ON latest_evaluations (evaluation_timestamp);
 """
 
 
+# Indexes whose columns changed when tables were keyed by account; re-created by SCHEMA_SQL
+_UNSCOPED_INDEXES = (
+    'idx_evaluation_history_product_ts', 'idx_evaluation_history_score_ts', 'idx_latest_evaluations_score'
+)
+
+
+def _require_default_account(default_account: str) -> str:
+    if not default_account:
+        raise ValueError("Set VTEX_ACCOUNT_NAME: existing rows are assigned to that account")
+    return default_account
+
+
+def migrate_account_keys(conn, default_account: str) -> None:
+    """Add the account column to tables created before multi-account support.
+
+    Existing rows are assigned to ``default_account`` and products and
+    latest_evaluations are re-keyed on (account, product_id). Runs before
+    SCHEMA_SQL so the account-leading indexes can be created.
+    """
+    migrated = False
+    for table in ('products', 'evaluation_history', 'latest_evaluations'):
+        if conn.execute(text("SELECT to_regclass(:table)"), {'table': table}).scalar() is None:
+            continue
+        has_account = conn.execute(text("""
+            SELECT EXISTS (
+                SELECT 1 FROM information_schema.columns WHERE table_name = :table AND column_name = 'account'
+            )
+        """), {'table': table}).scalar()
+        if has_account:
+            continue
+
+        account_literal = _require_default_account(default_account).replace("'", "''")
+        # A constant default fills existing rows without rewriting the table
+        conn.execute(text(
+            f"ALTER TABLE {table} ADD COLUMN account VARCHAR(255) NOT NULL DEFAULT '{account_literal}'"
+        ))
+        conn.execute(text(f"ALTER TABLE {table} ALTER COLUMN account DROP DEFAULT"))
+        if table != 'evaluation_history':
+            conn.execute(text(f"ALTER TABLE {table} DROP CONSTRAINT {table}_pkey"))
+            conn.execute(text(f"ALTER TABLE {table} ADD PRIMARY KEY (account, product_id)"))
+        logger.info(f"Assigned existing {table} rows to account {default_account}")
+        migrated = True
+
+    if migrated:
+        for index in _UNSCOPED_INDEXES:
+            conn.execute(text(f"DROP INDEX IF EXISTS {index}"))
+
+
+def migrate_legacy_results(db_service: DatabaseService, conn, default_account: str) -> None:
+    """Copy rows from the pre-history evaluation_results table, once, if it exists."""
+    legacy = conn.execute(text("SELECT to_regclass('evaluation_results')")).scalar()
+    if legacy is None:
+        return
+    if conn.execute(text("SELECT EXISTS (SELECT 1 FROM evaluation_history)")).scalar():
+        logger.info("evaluation_history already populated; skipping legacy migration")
+        return
+
+    months = conn.execute(text("""
+        SELECT DISTINCT date_trunc('month', evaluation_timestamp) FROM evaluation_results
+    """)).scalars().all()
+    db_service.ensure_history_partitions(conn, [month.replace(tzinfo=timezone.utc) for month in months])
+
+    # Legacy timestamps were stored without a time zone, in UTC; legacy rows predate multiple accounts
+    params = {'account': _require_default_account(default_account)}
+    copied = conn.execute(text("""
+        INSERT INTO evaluation_history (account, product_id, quality_score, evaluation_timestamp, reason, raw_response)
+        SELECT :account, product_id, quality_score, evaluation_timestamp AT TIME ZONE 'UTC', reason, raw_response
+        FROM evaluation_results
+    """), params).rowcount
+    conn.execute(text("""
+        INSERT INTO latest_evaluations (account, product_id, quality_score, evaluation_timestamp, reason)
+        SELECT DISTINCT ON (product_id) :account, product_id, quality_score,
+               evaluation_timestamp AT TIME ZONE 'UTC', reason
+        FROM evaluation_results
+        ORDER BY product_id, evaluation_timestamp DESC
+        ON CONFLICT (account, product_id) DO NOTHING
+    """), params)
+    logger.info(f"Migrated {copied} rows from evaluation_results into evaluation_history")
+
+
 def main():
     """Create database schema."""
     load_dotenv()
@@ -55,14 +159,21 @@ def main():
         # Execute schema creation
         engine = db_service.get_engine()
 
+        default_account = os.getenv('VTEX_ACCOUNT_NAME', '')
         with engine.begin() as conn:
+            migrate_account_keys(conn, default_account)
+
             # Split SQL into individual statements
             statements = [stmt.strip() for stmt in SCHEMA_SQL.split(';') if stmt.strip()]
 
             for statement in statements:
                 if statement:
                     logger.info(f"Executing: {statement[:50]}...")
-                    conn.execute(statement)
+                    conn.execute(text(statement))
+
+            now = datetime.now(timezone.utc)
+            db_service.ensure_history_partitions(conn, [now, now.replace(day=28) + timedelta(days=4)])
+            migrate_legacy_results(db_service, conn, default_account)
 
         logger.info("Database schema migration completed successfully")
 
@@ -0,0 +1,46 @@
+import argparse
+import json
+from dotenv import load_dotenv
+from app.services.diff_report import compute_diff, load_category_lookup, load_result_set
+from app.services.results_index import get_results_index
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+def main():
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(
+        description='Compare two evaluation result sets (e.g. consecutive nightly runs)',
+        epilog='Result sets are local CSV paths, gs://bucket/object URLs, db (latest evaluations) '
+               'or db:SINCE..UNTIL (last evaluation per product in an ISO time window).'
+    )
+    parser.add_argument('base', help='Earlier result set')
+    parser.add_argument('head', help='Later result set')
+    parser.add_argument('--output', '-o', help='Write every new, removed or changed product to this CSV')
+    parser.add_argument('--report', help='Write the JSON report to this file instead of stdout')
+    parser.add_argument('--top', type=int, default=20, help='Largest regressions/improvements to list')
+    parser.add_argument('--account', help='VTEX account of db sources and index categories (default VTEX_ACCOUNT_NAME)')
+    args = parser.parse_args()
+
+    report = compute_diff(
+        load_result_set(args.base, account=args.account),
+        load_result_set(args.head, account=args.account),
+        category_lookup=load_category_lookup(get_results_index(), args.account),
+        top=args.top
+    )
+    if args.output:
+        report.write_changes(args.output)
+
+    payload = json.dumps(report.to_dict(), indent=2)
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as report_file:
+            report_file.write(payload)
+        logger.info(f"Diff report written to {args.report}")
+    else:
+        print(payload)
+
+
+if __name__ == '__main__':
+    main()
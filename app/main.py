@@ -5,10 +5,12 @@ from dotenv import load_dotenv
 from typing import List
 from app.services.evaluation_service import EvaluationService
 from app.services.cloud_storage import CloudStorageService
-from app.utils.csv_handler import read_product_ids, write_evaluation_results
-from app.models.product import Product
-from app.models.evaluation_result import EvaluationResult
+from app.services.result_writer import CsvSink, DatabaseSink, ResultSink, ResultsIndexSink, ResultWriter
+from app.services.results_index import get_results_index
+from app.utils.csv_handler import read_product_ids
 from app.utils.logger import get_logger
+from app.utils.metrics import export_metrics
+from app.utils.tracing import tracer
 
 logger = get_logger(__name__)
 
@@ -19,39 +21,51 @@ def main():
 
     # Parse command line arguments
     parser = argparse.ArgumentParser(description='Evaluate VTEX product catalog quality')
-    parser.add_argument('--input', '-i', required=True, help='Input CSV file with product_ids')
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--input', '-i', help='Input CSV file with product_ids')
+    source.add_argument('--all-products', action='store_true',
+                        help='Enumerate product IDs from the VTEX catalog instead of reading a CSV')
     parser.add_argument('--output', '-o', required=True, help='Output CSV file for results')
+    parser.add_argument('--category-id', help='With --all-products, only enumerate this VTEX category')
+    parser.add_argument('--brand-id', help='Only evaluate products of this VTEX brand')
+    parser.add_argument('--account', help='VTEX account to evaluate (default VTEX_ACCOUNT_NAME)')
+    parser.add_argument('--batch-mode', action='store_true',
+                        help='Evaluate through asynchronous Gemini batch jobs (overnight full-catalog sweeps)')
+    parser.add_argument('--trace-file', help='Export per-product stage spans as JSON lines to this file')
+    parser.add_argument('--profile', action='store_true',
+                        help='Capture cProfile/tracemalloc snapshots and print a stage-time breakdown at exit')
     args = parser.parse_args()
+    if args.category_id and not args.all_products:
+        parser.error('--category-id requires --all-products')
 
-    logger.info("Starting catalog quality evaluation", extra={'input_file': args.input, 'output_file': args.output})
+    tracer.configure(export_path=args.trace_file or os.getenv('TRACE_EXPORT_PATH'), enabled=args.profile)
+    profiler = None
+    if args.profile:
+        from app.utils.profiling import RunProfiler
+        profiler = RunProfiler(output_prefix=os.path.splitext(args.output)[0] + '_profile')
+        profiler.start()
 
-    try:
-        # 1. Read product IDs from CSV
-        product_ids = read_product_ids(args.input)
-        if not product_ids:
-            logger.error("No product IDs found in input file")
-            return
-
-        # 2. Initialize evaluation service
-        evaluation_service = EvaluationService()
-
-        # 3. Evaluate catalog in batches and persist results incrementally
-        products: List[Product] = []
-        evaluation_results: List[EvaluationResult] = []
-        write_evaluation_results([], args.output, mode='w', write_header=True)
+    logger.info(
+        "Starting catalog quality evaluation",
+        extra={'input_file': args.input or 'vtex-catalog', 'output_file': args.output}
+    )
 
-        for batch_products, batch_results in evaluation_service.evaluate_catalog_batches(product_ids):
-            if batch_products:
-                products.extend(batch_products)
-            if batch_results:
-                evaluation_results.extend(batch_results)
-                write_evaluation_results(batch_results, args.output, mode='a', write_header=False)
+    try:
+        # 1. Initialize evaluation service
+        evaluation_service = EvaluationService(
+            evaluator_backend='batch' if args.batch_mode else None, account=args.account
+        )
 
-        if not evaluation_results:
-            logger.error("No evaluation results generated")
-            return
+        # 2. Read product IDs from CSV, or stream them from the VTEX catalog
+        if args.all_products:
+            product_ids = evaluation_service.vtex_client.iter_product_ids(category_id=args.category_id)
+        else:
+            product_ids = read_product_ids(args.input)
+            if not product_ids:
+                logger.error("No product IDs found in input file")
+                return
 
-        # 4. Initialize Cloud Storage service (optional, cheaper alternative)
+        # 3. Initialize Cloud Storage service (optional, cheaper alternative)
         storage_service = None
         if os.getenv('GCS_BUCKET_NAME'):
             try:
@@ -61,7 +75,7 @@ def main():
             except Exception as e:
                 logger.warning(f"Cloud Storage initialization failed: {e}")
         
-        # 5. Initialize Database service (optional)
+        # 4. Initialize Database service (optional)
         db_service = None
         db_instance = os.getenv('DB_INSTANCE_CONNECTION_NAME')
         db_user = os.getenv('DB_USER')
@@ -76,30 +90,50 @@ def main():
         else:
             logger.info("Database not configured. Results will be saved to CSV/Cloud Storage.")
 
-        # 6. Store results in database (optional)
+        # 5. Evaluate catalog in batches; the writer stage persists them to CSV, index and database
+        sinks: List[ResultSink] = [CsvSink(args.output)]
+        account = evaluation_service.vtex_client.account_name
+        results_index = get_results_index()
+        if results_index:
+            sinks.append(ResultsIndexSink(results_index, account=account))
         if db_service:
-            try:
-                db_service.store_evaluation_results(products, evaluation_results)
-            except Exception as e:
-                logger.warning(f"Database storage failed: {e}")
+            sinks.append(DatabaseSink(db_service, account))
+
+        with ResultWriter(sinks) as writer:
+            for batch in evaluation_service.evaluate_catalog_batches(product_ids, brand_id=args.brand_id):
+                writer.submit(batch)
+
+        total_results = writer.rows_written
+        logger.info(f"Gemini budget usage: {evaluation_service.gemini_evaluator.budget.snapshot()}")
+        if not total_results:
+            logger.error("No evaluation results generated")
+            return
 
-        # 7. Store results in Cloud Storage (optional, cheaper alternative)
+        # 6. Store results in Cloud Storage (optional, cheaper alternative)
         if storage_service:
             try:
                 filename = os.path.basename(args.output)
-                gcs_url = storage_service.upload_results_csv(evaluation_results, filename)
+                gcs_url = storage_service.upload_results_file(args.output, filename)
                 logger.info(f"Results uploaded to Cloud Storage: {gcs_url}")
             except Exception as e:
                 logger.warning(f"Cloud Storage upload failed: {e}")
 
         logger.info(
             "Catalog quality evaluation completed successfully",
-            extra={'total_products': len(product_ids), 'total_results': len(evaluation_results)}
+            extra={
+                'total_products': len(product_ids) if isinstance(product_ids, list) else total_results,
+                'total_results': total_results
+            }
         )
 
     except Exception as e:
         logger.error(f"Pipeline execution failed: {e}")
         raise
+    finally:
+        if profiler:
+            profiler.stop()
+        tracer.close()
+        export_metrics()
 
 
 if __name__ == "__main__":
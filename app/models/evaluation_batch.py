@@ -0,0 +1,151 @@
+import sys
+from array import array
+from datetime import datetime, timedelta, timezone
+from typing import Iterable, Iterator, List, Optional, Tuple
+from app.models.evaluation_result import EvaluationResult
+from app.models.product import Product
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def _intern(value: Optional[str]) -> Optional[str]:
+    return sys.intern(value) if value else value
+
+
+def canonical_raw_response(score: int, reason: Optional[str]) -> str:
+    """The text-mode response that a (score, reason) pair was parsed from."""
+    return f"SCORE: {score}\nREASON: {reason}"
+
+
+class EvaluationBatch:
+    """Columnar batch of evaluation rows and the products they were evaluated from.
+
+    Scores and timestamps live in typed arrays, repeated strings (category,
+    brand, marker raw responses) are interned, and ``raw_response`` is only
+    stored when it differs from the canonical ``SCORE:/REASON:`` text, which
+    is rebuilt on access. Rows that failed before evaluation (e.g. VTEX
+    errors) have no product columns. This is the unit handed from the
+    pipeline to every sink; consumers iterate it instead of copying it.
+    """
+
+    __slots__ = (
+        'product_ids', 'scores', 'timestamps_us', 'reasons', 'raw_responses',
+        'has_product', 'names', 'descriptions', 'categories', 'brands', 'category_ids', 'brand_ids',
+    )
+
+    def __init__(self):
+        self.product_ids: List[str] = []
+        self.scores = array('b')
+        self.timestamps_us = array('q')
+        self.reasons: List[Optional[str]] = []
+        # None means "canonical", see raw_response()
+        self.raw_responses: List[Optional[str]] = []
+        self.has_product = bytearray()
+        self.names: List[Optional[str]] = []
+        self.descriptions: List[Optional[str]] = []
+        self.categories: List[Optional[str]] = []
+        self.brands: List[Optional[str]] = []
+        self.category_ids: List[Optional[str]] = []
+        self.brand_ids: List[Optional[str]] = []
+
+    def __len__(self) -> int:
+        return len(self.product_ids)
+
+    def __bool__(self) -> bool:
+        return bool(self.product_ids)
+
+    def append(self, result: EvaluationResult, product: Optional[Product] = None) -> None:
+        """Add one row, dropping the per-row objects once their fields are stored."""
+        timestamp = result.evaluation_timestamp
+        if timestamp.tzinfo is None:
+            timestamp = timestamp.replace(tzinfo=timezone.utc)
+        delta = timestamp - _EPOCH
+
+        raw_response = result.raw_response
+        if raw_response == canonical_raw_response(result.quality_score, result.reason):
+            raw_response = None
+        elif raw_response and len(raw_response) <= 64:
+            # Markers such as VTEX_API_ERROR or PRE_SCORER:<rule> repeat across rows
+            raw_response = sys.intern(raw_response)
+
+        self.product_ids.append(result.product_id)
+        self.scores.append(result.quality_score)
+        self.timestamps_us.append((delta.days * 86400 + delta.seconds) * 1_000_000 + delta.microseconds)
+        self.reasons.append(result.reason)
+        self.raw_responses.append(raw_response)
+
+        self.has_product.append(product is not None)
+        self.names.append(product.name if product else None)
+        self.descriptions.append(product.description if product else None)
+        self.categories.append(_intern(product.category) if product else None)
+        self.brands.append(_intern(product.brand) if product else None)
+        self.category_ids.append(_intern(product.category_id) if product else None)
+        self.brand_ids.append(_intern(product.brand_id) if product else None)
+
+    def timestamp(self, index: int) -> datetime:
+        return _EPOCH + timedelta(microseconds=self.timestamps_us[index])
+
+    def raw_response(self, index: int) -> Optional[str]:
+        raw_response = self.raw_responses[index]
+        if raw_response is None:
+            return canonical_raw_response(self.scores[index], self.reasons[index])
+        return raw_response
+
+    def result(self, index: int) -> EvaluationResult:
+        return EvaluationResult(
+            product_id=self.product_ids[index],
+            quality_score=self.scores[index],
+            evaluation_timestamp=self.timestamp(index),
+            reason=self.reasons[index],
+            raw_response=self.raw_response(index)
+        )
+
+    def __iter__(self) -> Iterator[EvaluationResult]:
+        """Materialize rows one at a time as EvaluationResult views."""
+        for index in range(len(self.product_ids)):
+            yield self.result(index)
+
+    def products(self) -> Iterator[Product]:
+        """Products of the rows that reached evaluation."""
+        for index, has_product in enumerate(self.has_product):
+            if has_product:
+                yield Product(
+                    product_id=self.product_ids[index],
+                    description=self.descriptions[index],
+                    name=self.names[index],
+                    category=self.categories[index],
+                    brand=self.brands[index],
+                    category_id=self.category_ids[index],
+                    brand_id=self.brand_ids[index]
+                )
+
+    @property
+    def product_count(self) -> int:
+        return sum(self.has_product)
+
+    def rows(self) -> Iterator[Tuple[str, int, str, Optional[str], Optional[str]]]:
+        """(product_id, score, ISO timestamp, reason, raw_response) tuples for writers."""
+        for index in range(len(self.product_ids)):
+            yield (
+                self.product_ids[index],
+                self.scores[index],
+                self.timestamp(index).isoformat(),
+                self.reasons[index],
+                self.raw_response(index)
+            )
+
+    @classmethod
+    def concat(cls, batches: Iterable["EvaluationBatch"]) -> "EvaluationBatch":
+        """Merge batches into one (column-wise extends, no per-row objects)."""
+        merged = cls()
+        for batch in batches:
+            for name in cls.__slots__:
+                getattr(merged, name).extend(getattr(batch, name))
+        return merged
+
+    @classmethod
+    def from_results(cls, results: Iterable[EvaluationResult]) -> "EvaluationBatch":
+        batch = cls()
+        for result in results:
+            batch.append(result)
+        return batch
@@ -3,7 +3,7 @@ from datetime import datetime
 from typing import Optional
 
 
-@dataclass
+@dataclass(slots=True)
 class EvaluationResult:
     """Represents the quality evaluation result for a product description."""
     product_id: str
@@ -3,7 +3,7 @@ from datetime import datetime
 from typing import Optional
 
 
-@dataclass
+@dataclass(slots=True)
 class Product:
     """Represents a VTEX product fetched from the catalog API."""
     product_id: str
@@ -11,6 +11,8 @@ class Product:
     name: Optional[str] = None
     category: Optional[str] = None
     brand: Optional[str] = None
+    category_id: Optional[str] = None
+    brand_id: Optional[str] = None
 
     def __post_init__(self):
         if not self.product_id:
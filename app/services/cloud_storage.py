@@ -1,7 +1,9 @@
 import os
 from google.cloud import storage
-from typing import List
+from typing import Iterable, List
+from app.models.evaluation_batch import EvaluationBatch
 from app.models.evaluation_result import EvaluationResult
+from app.utils.csv_handler import RESULT_CSV_HEADER, evaluation_rows
 from app.utils.logger import get_logger
 
 logger = get_logger(__name__)
@@ -23,7 +25,7 @@ class CloudStorageService:
         else:
             logger.info(f"Bucket {self.bucket_name} already exists")
 
-    def upload_results_csv(self, results: List[EvaluationResult], filename: str) -> str:
+    def upload_results_csv(self, results: EvaluationBatch | Iterable[EvaluationResult], filename: str) -> str:
         """Upload evaluation results as CSV to Cloud Storage."""
         try:
             import io
@@ -34,21 +36,10 @@ class CloudStorageService:
             writer = csv.writer(output, quoting=csv.QUOTE_ALL)
             
             # Write header
-            writer.writerow(['product_id', 'quality_score', 'evaluation_timestamp', 'reason', 'raw_response'])
+            writer.writerow(RESULT_CSV_HEADER)
             
-            # Write data rows
-            for result in results:
-                # Clean reason and raw_response to remove newlines and extra spaces
-                clean_reason = (result.reason or '').replace('\n', ' ').replace('\r', ' ').strip()
-                clean_raw_response = (result.raw_response or '').replace('\n', ' ').replace('\r', ' ').strip()
-                
-                writer.writerow([
-                    result.product_id,
-                    result.quality_score,
-                    result.evaluation_timestamp.isoformat(),
-                    clean_reason,
-                    clean_raw_response
-                ])
+            # Write data rows (newlines removed from reason and raw_response)
+            writer.writerows(evaluation_rows(results))
             
             csv_content = output.getvalue()
             output.close()
@@ -65,6 +56,20 @@ class CloudStorageService:
             logger.error(f"Failed to upload results to GCS: {e}")
             raise
 
+    def upload_results_file(self, path: str, filename: str) -> str:
+        """Upload a results CSV already written to local disk to Cloud Storage."""
+        try:
+            blob = self.bucket.blob(filename)
+            blob.upload_from_filename(path, content_type='text/csv')
+
+            gcs_url = f"gs://{self.bucket_name}/{filename}"
+            logger.info(f"Uploaded results to {gcs_url}")
+            return gcs_url
+
+        except Exception as e:
+            logger.error(f"Failed to upload results to GCS: {e}")
+            raise
+
     def download_results_csv(self, filename: str) -> str:
         """Download evaluation results CSV from Cloud Storage."""
         try:
@@ -77,6 +82,19 @@ class CloudStorageService:
             logger.error(f"Failed to download results from GCS: {e}")
             raise
 
+    def download_results_file(self, gcs_url: str, path: str) -> str:
+        """Download a results object (gs://bucket/name) to a local file without holding it in memory."""
+        try:
+            bucket_name, _, filename = gcs_url[len('gs://'):].partition('/')
+            bucket = self.bucket if bucket_name == self.bucket_name else self.client.bucket(bucket_name)
+            bucket.blob(filename).download_to_filename(path)
+            logger.info(f"Downloaded {gcs_url} to {path}")
+            return path
+
+        except Exception as e:
+            logger.error(f"Failed to download results from GCS: {e}")
+            raise
+
     def list_result_files(self, prefix: str = "results_", limit: int = 10) -> List[str]:
         """List available result files."""
         try:
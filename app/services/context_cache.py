@@ -0,0 +1,127 @@
+import atexit
+import threading
+import time
+from typing import Dict, Optional, Tuple
+from google.genai import errors, types
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class ContextCache:
+    """Gemini cached content holding the static evaluation instructions, one entry per model.
+
+    Entries are created on first use and their TTL is extended once less
+    than ``refresh_margin_seconds`` remain, so requests only carry the
+    per-product payload. If the API rejects the cache (for instance because
+    the instructions are below the model's minimum cacheable size), the
+    caller falls back to sending the instructions as a system instruction;
+    other failures fall back only until the next retry.
+    """
+
+    RETRY_SECONDS = 60
+
+    def __init__(self, client, instructions: str, ttl_seconds: int = 3600, refresh_margin_seconds: Optional[int] = None):
+        self.client = client
+        self.instructions = instructions
+        self.ttl_seconds = ttl_seconds
+        self.refresh_margin_seconds = (
+            refresh_margin_seconds if refresh_margin_seconds is not None else min(300, ttl_seconds // 5)
+        )
+        # model -> (cache name, monotonic expiry); a None name falls back to system instructions until expiry
+        self._entries: Dict[str, Tuple[Optional[str], float]] = {}
+        self._lock = threading.Lock()
+        self.created = 0
+        self.refreshed = 0
+
+    def _create(self, model: str) -> Tuple[Optional[str], float]:
+        try:
+            cache = self.client.caches.create(
+                model=model,
+                config=types.CreateCachedContentConfig(
+                    system_instruction=self.instructions,
+                    ttl=f"{self.ttl_seconds}s",
+                    display_name='catalog-evaluator-rubric'
+                )
+            )
+        except errors.ClientError as e:
+            logger.warning(f"Could not cache evaluation instructions for {model}, "
+                           f"sending them as a system instruction instead: {e}")
+            # Rejected requests (other than throttling) will not succeed on retry
+            return None, time.monotonic() + (self.RETRY_SECONDS if e.code == 429 else float('inf'))
+        except Exception as e:
+            logger.warning(f"Could not cache evaluation instructions for {model}, "
+                           f"retrying in {self.RETRY_SECONDS}s: {e}")
+            return None, time.monotonic() + self.RETRY_SECONDS
+        self.created += 1
+        logger.info(f"Cached evaluation instructions for {model} as {cache.name}")
+        return cache.name, time.monotonic() + self.ttl_seconds
+
+    def _refresh(self, model: str, name: str) -> Tuple[Optional[str], float]:
+        try:
+            self.client.caches.update(
+                name=name,
+                config=types.UpdateCachedContentConfig(ttl=f"{self.ttl_seconds}s")
+            )
+        except Exception as e:
+            logger.warning(f"Could not extend cache {name}, creating a new one: {e}")
+            return self._create(model)
+        self.refreshed += 1
+        return name, time.monotonic() + self.ttl_seconds
+
+    def name_for(self, model: str) -> Optional[str]:
+        """Cache name to send with a request to ``model``, or None to fall back to a system instruction."""
+        with self._lock:
+            name, expires_at = self._entries.get(model, (None, 0.0))
+            now = time.monotonic()
+            if name is None:
+                if now >= expires_at:
+                    name, expires_at = self._entries[model] = self._create(model)
+            elif expires_at - now < self.refresh_margin_seconds:
+                name, expires_at = self._entries[model] = self._refresh(model, name)
+            return name
+
+    def invalidate(self, model: str, name: Optional[str] = None) -> None:
+        """Forget a model's entry (e.g. after the API no longer finds it) so the next call re-creates it.
+
+        With ``name``, only that entry is forgotten, so concurrent calls that
+        all hit the same stale cache re-create it once.
+        """
+        with self._lock:
+            current = self._entries.get(model, (None, 0.0))[0]
+            if current is not None and (name is None or current == name):
+                del self._entries[model]
+
+    def close(self) -> None:
+        """Delete the cache entries instead of waiting for them to expire."""
+        with self._lock:
+            entries, self._entries = self._entries, {}
+        for name, _ in entries.values():
+            if name:
+                try:
+                    self.client.caches.delete(name=name)
+                except Exception as e:
+                    logger.warning(f"Could not delete cache {name}: {e}")
+
+    def report(self) -> Dict:
+        with self._lock:
+            return {
+                'models': {model: name for model, (name, _) in self._entries.items()},
+                'created': self.created,
+                'refreshed': self.refreshed,
+            }
+
+
+_caches: Dict[str, ContextCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_context_cache(client, instructions: str, ttl_seconds: int) -> ContextCache:
+    """Return the process-wide cache for an instruction block, shared by every job's evaluator."""
+    with _caches_lock:
+        cache = _caches.get(instructions)
+        if cache is None:
+            cache = ContextCache(client, instructions, ttl_seconds)
+            _caches[instructions] = cache
+            atexit.register(cache.close)
+        return cache
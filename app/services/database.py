@@ -1,17 +1,78 @@
+import base64
 import os
+import threading
+from dataclasses import dataclass, field
+from datetime import date, datetime, timezone
 from google.cloud.sql.connector import Connector
 import pg8000
-from typing import Optional, List
+from typing import Dict, Iterable, Iterator, Optional, List, Set, Tuple
 import sqlalchemy
 from sqlalchemy import create_engine, text, insert, select
-from sqlalchemy.exc import IntegrityError
 from app.models.product import Product
+from app.models.evaluation_batch import EvaluationBatch
 from app.models.evaluation_result import EvaluationResult
 from app.utils.logger import get_logger
 
 logger = get_logger(__name__)
 
-logger = get_logger(__name__)
+MAX_PAGE_SIZE = 1000
+TREND_INTERVALS = ('day', 'week', 'month')
+_INSERT_BATCH_SIZE = 1000
+
+
+def _month_start(value: datetime) -> date:
+    return date(value.year, value.month, 1)
+
+
+def _next_month(value: date) -> date:
+    return date(value.year + value.month // 12, value.month % 12 + 1, 1)
+
+
+def history_partition_ddl(month: date) -> str:
+    """CREATE statement for the monthly evaluation_history partition containing ``month``."""
+    month = date(month.year, month.month, 1)
+    return (
+        f"CREATE TABLE IF NOT EXISTS evaluation_history_{month:y%Ym%m} PARTITION OF evaluation_history "
+        f"FOR VALUES FROM ('{month.isoformat()}') TO ('{_next_month(month).isoformat()}')"
+    )
+
+
+def _encode_cursor(*parts) -> str:
+    return base64.urlsafe_b64encode('|'.join(str(part) for part in parts).encode()).decode()
+
+
+def _decode_cursor(cursor: str, parts: int) -> List[str]:
+    try:
+        values = base64.urlsafe_b64decode(cursor.encode()).decode().split('|', parts - 1)
+    except (ValueError, UnicodeDecodeError):
+        values = []
+    if len(values) != parts:
+        raise ValueError("Invalid cursor")
+    return values
+
+
+def _utc(value: Optional[datetime]) -> Optional[datetime]:
+    if value is not None and value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+
+def _chunks(rows: Iterable[Dict], size: int = _INSERT_BATCH_SIZE) -> Iterable[List[Dict]]:
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+@dataclass
+class ResultPage:
+    """One keyset page of evaluation rows; pass ``next_cursor`` back to get the next one."""
+    results: List[EvaluationResult] = field(default_factory=list)
+    next_cursor: Optional[str] = None
 
 
 class DatabaseService:
@@ -20,6 +81,9 @@ class DatabaseService:
     def __init__(self):
         self.connector = Connector()
         self.engine: Optional[sqlalchemy.engine.Engine] = None
+        # Monthly history partitions known to exist (created on first write to a month)
+        self._partitions: Set[date] = set()
+        self._partitions_lock = threading.Lock()
 
     def get_connection(self):
         """Get a database connection using Cloud SQL connector."""
@@ -77,91 +141,325 @@ class DatabaseService:
             self.connector.close()
             logger.info("Database connector closed")
 
-    def store_evaluation_results(self, products: List[Product], results: List[EvaluationResult]) -> None:
-        """Store products and evaluation results in database."""
+    def ensure_history_partitions(self, conn, timestamps: Iterable[datetime]) -> None:
+        """Create the monthly evaluation_history partitions the given timestamps fall into."""
+        months = {_month_start(ts.astimezone(timezone.utc)) for ts in timestamps}
+        with self._partitions_lock:
+            missing = sorted(months - self._partitions)
+        for month in missing:
+            conn.execute(text(history_partition_ddl(month)))
+        with self._partitions_lock:
+            self._partitions.update(missing)
+
+    def store_evaluation_results(
+        self,
+        products: Iterable[Product],
+        results: EvaluationBatch | Iterable[EvaluationResult],
+        *,
+        account: str
+    ) -> None:
+        """Append an account's evaluation results to the history and refresh its latest score per product."""
         try:
             engine = self.get_engine()
+            product_count = 0
+            result_count = 0
 
             with engine.begin() as conn:
                 # Store products first (ignore if already exists)
-                for product in products:
-                    try:
-                        conn.execute(
-                            text("""
-                                INSERT INTO products (product_id, description, name, category, brand)
-                                VALUES (:product_id, :description, :name, :category, :brand)
-                                ON CONFLICT (product_id) DO NOTHING
-                            """),
-                            {
-                                'product_id': product.product_id,
-                                'description': product.description,
-                                'name': product.name,
-                                'category': product.category,
-                                'brand': product.brand
-                            }
-                        )
-                    except Exception as e:
-                        logger.warning(f"Failed to store product {product.product_id}: {e}")
-
-                # Store evaluation results
-                for result in results:
-                    try:
-                        conn.execute(
-                            text("""
-                                INSERT INTO evaluation_results (product_id, quality_score, evaluation_timestamp, reason, raw_response)
-                                VALUES (:product_id, :quality_score, :evaluation_timestamp, :reason, :raw_response)
-                            """),
-                            {
-                                'product_id': result.product_id,
-                                'quality_score': result.quality_score,
-                                'evaluation_timestamp': result.evaluation_timestamp,
-                                'reason': result.reason,
-                                'raw_response': result.raw_response
-                            }
-                        )
-                        logger.info(f"Stored evaluation result for product {result.product_id}",
-                                  extra={'product_id': result.product_id})
-                    except IntegrityError:
-                        logger.warning(f"Evaluation result already exists for product {result.product_id}",
-                                     extra={'product_id': result.product_id})
-                    except Exception as e:
-                        logger.error(f"Failed to store evaluation result for product {result.product_id}: {e}")
-
-            logger.info(f"Stored {len(products)} products and {len(results)} evaluation results")
+                for chunk in _chunks({
+                    'account': account,
+                    'product_id': product.product_id,
+                    'description': product.description,
+                    'name': product.name,
+                    'category': product.category,
+                    'brand': product.brand
+                } for product in products):
+                    conn.execute(
+                        text("""
+                            INSERT INTO products (account, product_id, description, name, category, brand)
+                            VALUES (:account, :product_id, :description, :name, :category, :brand)
+                            ON CONFLICT (account, product_id) DO NOTHING
+                        """),
+                        chunk
+                    )
+                    product_count += len(chunk)
+
+                # Every run is kept in the history; latest_evaluations only moves forward in time
+                for chunk in _chunks({
+                    'account': account,
+                    'product_id': result.product_id,
+                    'quality_score': result.quality_score,
+                    'evaluation_timestamp': _utc(result.evaluation_timestamp),
+                    'reason': result.reason,
+                    'raw_response': result.raw_response
+                } for result in results):
+                    self.ensure_history_partitions(conn, (row['evaluation_timestamp'] for row in chunk))
+                    conn.execute(
+                        text("""
+                            INSERT INTO evaluation_history
+                                (account, product_id, quality_score, evaluation_timestamp, reason, raw_response)
+                            VALUES (:account, :product_id, :quality_score, :evaluation_timestamp, :reason, :raw_response)
+                        """),
+                        chunk
+                    )
+                    conn.execute(
+                        text("""
+                            INSERT INTO latest_evaluations (account, product_id, quality_score, evaluation_timestamp, reason)
+                            VALUES (:account, :product_id, :quality_score, :evaluation_timestamp, :reason)
+                            ON CONFLICT (account, product_id) DO UPDATE SET
+                                quality_score = EXCLUDED.quality_score,
+                                evaluation_timestamp = EXCLUDED.evaluation_timestamp,
+                                reason = EXCLUDED.reason
+                            WHERE latest_evaluations.evaluation_timestamp <= EXCLUDED.evaluation_timestamp
+                        """),
+                        chunk
+                    )
+                    result_count += len(chunk)
+
+            logger.info(f"Stored {product_count} products and {result_count} evaluation results")
 
         except Exception as e:
+            # Partitions created in the rolled-back transaction are gone too
+            with self._partitions_lock:
+                self._partitions.clear()
             logger.error(f"Failed to store evaluation results: {e}")
             raise
 
     def get_evaluation_results(self, limit: int = 100) -> List[EvaluationResult]:
         """Retrieve recent evaluation results from database."""
+        return self.get_evaluation_history(limit=limit).results
+
+    def get_evaluation_history(
+        self,
+        *,
+        account: Optional[str] = None,
+        product_id: Optional[str] = None,
+        min_score: Optional[int] = None,
+        max_score: Optional[int] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        cursor: Optional[str] = None,
+        limit: int = 100
+    ) -> ResultPage:
+        """History rows newest first, keyset-paginated on (evaluation_timestamp, id)."""
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+        clauses, params = [], {'limit': limit + 1}
+        if account is not None:
+            clauses.append("account = :account")
+            params['account'] = account
+        if product_id is not None:
+            clauses.append("product_id = :product_id")
+            params['product_id'] = product_id
+        if min_score is not None:
+            clauses.append("quality_score >= :min_score")
+            params['min_score'] = min_score
+        if max_score is not None:
+            clauses.append("quality_score <= :max_score")
+            params['max_score'] = max_score
+        # Time bounds let the planner prune partitions
+        if since is not None:
+            clauses.append("evaluation_timestamp >= :since")
+            params['since'] = _utc(since)
+        if until is not None:
+            clauses.append("evaluation_timestamp < :until")
+            params['until'] = _utc(until)
+        if cursor is not None:
+            cursor_timestamp, cursor_id = _decode_cursor(cursor, 2)
+            clauses.append("(evaluation_timestamp, id) < (:cursor_timestamp, :cursor_id)")
+            params['cursor_timestamp'] = datetime.fromisoformat(cursor_timestamp)
+            params['cursor_id'] = int(cursor_id)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+
         try:
-            engine = self.get_engine()
+            with self.get_engine().connect() as conn:
+                rows = conn.execute(
+                    text(f"""
+                        SELECT id, product_id, quality_score, evaluation_timestamp, reason, raw_response
+                        FROM evaluation_history
+                        {where}
+                        ORDER BY evaluation_timestamp DESC, id DESC
+                        LIMIT :limit
+                    """),
+                    params
+                ).fetchall()
+        except Exception as e:
+            logger.error(f"Failed to retrieve evaluation history: {e}")
+            raise
 
-            with engine.connect() as conn:
-                result = conn.execute(
-                    text("""
-                        SELECT product_id, quality_score, evaluation_timestamp, reason, raw_response
-                        FROM evaluation_results
-                        ORDER BY evaluation_timestamp DESC
+        page = ResultPage(results=[
+            EvaluationResult(
+                product_id=row[1],
+                quality_score=row[2],
+                evaluation_timestamp=row[3],
+                reason=row[4],
+                raw_response=row[5]
+            )
+            for row in rows[:limit]
+        ])
+        if len(rows) > limit:
+            last = rows[limit - 1]
+            page.next_cursor = _encode_cursor(_utc(last[3]).isoformat(), last[0])
+        logger.info(f"Retrieved {len(page.results)} evaluation history rows")
+        return page
+
+    def get_latest_evaluations(
+        self,
+        *,
+        account: Optional[str] = None,
+        min_score: Optional[int] = None,
+        max_score: Optional[int] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        cursor: Optional[str] = None,
+        limit: int = 100
+    ) -> ResultPage:
+        """Latest score per product, keyset-paginated on (account, product_id)."""
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+        clauses, params = [], {'limit': limit + 1}
+        if account is not None:
+            clauses.append("account = :account")
+            params['account'] = account
+        if min_score is not None:
+            clauses.append("quality_score >= :min_score")
+            params['min_score'] = min_score
+        if max_score is not None:
+            clauses.append("quality_score <= :max_score")
+            params['max_score'] = max_score
+        if since is not None:
+            clauses.append("evaluation_timestamp >= :since")
+            params['since'] = _utc(since)
+        if until is not None:
+            clauses.append("evaluation_timestamp < :until")
+            params['until'] = _utc(until)
+        if cursor is not None:
+            clauses.append("(account, product_id) > (:after_account, :after)")
+            params['after_account'], params['after'] = _decode_cursor(cursor, 2)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+
+        try:
+            with self.get_engine().connect() as conn:
+                rows = conn.execute(
+                    text(f"""
+                        SELECT product_id, quality_score, evaluation_timestamp, reason, account
+                        FROM latest_evaluations
+                        {where}
+                        ORDER BY account, product_id
                         LIMIT :limit
                     """),
-                    {'limit': limit}
+                    params
+                ).fetchall()
+        except Exception as e:
+            logger.error(f"Failed to retrieve latest evaluations: {e}")
+            raise
+
+        page = ResultPage(results=[
+            EvaluationResult(
+                product_id=row[0],
+                quality_score=row[1],
+                evaluation_timestamp=row[2],
+                reason=row[3]
+            )
+            for row in rows[:limit]
+        ])
+        if len(rows) > limit:
+            page.next_cursor = _encode_cursor(rows[limit - 1][4], rows[limit - 1][0])
+        return page
+
+    def iter_scores(
+        self,
+        *,
+        account: str,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        chunk_rows: int = 50000
+    ) -> Iterator[List[Tuple]]:
+        """Stream an account's (product_id, quality_score, category) rows in chunks for bulk comparisons.
+
+        Without a window this reads latest_evaluations; with ``since``/``until``
+        it takes each product's last evaluation inside the window from the history.
+        """
+        params: Dict = {'account': account}
+        if since is None and until is None:
+            source = "SELECT product_id, quality_score FROM latest_evaluations WHERE account = :account"
+        else:
+            clauses = ["account = :account"]
+            if since is not None:
+                clauses.append("evaluation_timestamp >= :since")
+                params['since'] = _utc(since)
+            if until is not None:
+                clauses.append("evaluation_timestamp < :until")
+                params['until'] = _utc(until)
+            source = f"""
+                SELECT DISTINCT ON (product_id) product_id, quality_score
+                FROM evaluation_history
+                WHERE {' AND '.join(clauses)}
+                ORDER BY product_id, evaluation_timestamp DESC, id DESC
+            """
+
+        try:
+            with self.get_engine().connect() as conn:
+                # Server-side cursor: rows arrive in chunks instead of one fetchall()
+                result = conn.execution_options(stream_results=True, max_row_buffer=chunk_rows).execute(
+                    text(f"""
+                        SELECT s.product_id, s.quality_score, p.category
+                        FROM ({source}) s
+                        LEFT JOIN products p ON p.account = :account AND p.product_id = s.product_id
+                    """),
+                    params
                 )
+                while rows := result.fetchmany(chunk_rows):
+                    yield [tuple(row) for row in rows]
+        except Exception as e:
+            logger.error(f"Failed to stream scores: {e}")
+            raise
 
-                evaluation_results = []
-                for row in result:
-                    evaluation_results.append(EvaluationResult(
-                        product_id=row[0],
-                        quality_score=row[1],
-                        evaluation_timestamp=row[2],
-                        reason=row[3],
-                        raw_response=row[4]
-                    ))
+    def get_score_trend(
+        self,
+        *,
+        since: datetime,
+        until: Optional[datetime] = None,
+        interval: str = 'day',
+        account: Optional[str] = None,
+        product_id: Optional[str] = None
+    ) -> List[Dict]:
+        """Evaluation count and average score per time bucket (failed evaluations excluded from the average)."""
+        if interval not in TREND_INTERVALS:
+            raise ValueError(f"interval must be one of {', '.join(TREND_INTERVALS)}")
 
-            logger.info(f"Retrieved {len(evaluation_results)} evaluation results")
-            return evaluation_results
+        clauses, params = ["evaluation_timestamp >= :since"], {'since': _utc(since)}
+        if until is not None:
+            clauses.append("evaluation_timestamp < :until")
+            params['until'] = _utc(until)
+        if account is not None:
+            clauses.append("account = :account")
+            params['account'] = account
+        if product_id is not None:
+            clauses.append("product_id = :product_id")
+            params['product_id'] = product_id
 
+        try:
+            with self.get_engine().connect() as conn:
+                rows = conn.execute(
+                    text(f"""
+                        SELECT date_trunc('{interval}', evaluation_timestamp, 'UTC') AS bucket,
+                               COUNT(*),
+                               AVG(quality_score) FILTER (WHERE quality_score > 0)
+                        FROM evaluation_history
+                        WHERE {' AND '.join(clauses)}
+                        GROUP BY bucket
+                        ORDER BY bucket
+                    """),
+                    params
+                ).fetchall()
         except Exception as e:
-            logger.error(f"Failed to retrieve evaluation results: {e}")
-            raise
\ No newline at end of file
+            logger.error(f"Failed to retrieve score trend: {e}")
+            raise
+
+        return [
+            {
+                'bucket': row[0].isoformat(),
+                'evaluations': row[1],
+                'average_score': round(float(row[2]), 3) if row[2] is not None else None,
+            }
+            for row in rows
+        ]
@@ -0,0 +1,271 @@
+import csv
+import os
+import tempfile
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+CHANGE_STATUSES = ('new', 'removed', 'improved', 'regressed', 'failed', 'recovered', 'unchanged')
+# Scores run from 1 (excellent) to 5 (very poor), so a drop in score is an improvement
+DELTA_DEFINITION = 'base_score - head_score: positive means improved, negative means regressed'
+
+UNKNOWN_CATEGORY = '(unknown)'
+_COLUMNS = ('product_id', 'quality_score', 'category')
+
+
+def parse_db_source(source: str) -> Tuple[Optional[datetime], Optional[datetime]]:
+    """Window of a ``db`` / ``db:SINCE..UNTIL`` source; (None, None) means the latest evaluations."""
+    window = source.partition(':')[2]
+    if not window or window == 'latest':
+        return None, None
+    since, separator, until = window.partition('..')
+    if not separator:
+        raise ValueError("Database sources look like db, db:latest or db:SINCE..UNTIL")
+    return (
+        datetime.fromisoformat(since) if since else None,
+        datetime.fromisoformat(until) if until else None,
+    )
+
+
+def _normalize(frame: pd.DataFrame) -> pd.DataFrame:
+    """Narrow one chunk to product_id, int8 score and categorical category."""
+    frame = frame.reindex(columns=list(_COLUMNS))
+    frame['quality_score'] = pd.to_numeric(frame['quality_score'], errors='coerce')
+    frame = frame.dropna(subset=['product_id', 'quality_score'])
+    frame['product_id'] = frame['product_id'].astype(str)
+    frame['quality_score'] = frame['quality_score'].astype('int8')
+    frame['category'] = frame['category'].astype('category')
+    return frame
+
+
+def _finish(chunks: List[pd.DataFrame], source: str) -> pd.DataFrame:
+    if chunks:
+        # Chunks have different category sets, so concat yields objects; re-encode once
+        frame = pd.concat(chunks, ignore_index=True)
+        frame['category'] = frame['category'].astype('category')
+    else:
+        frame = _normalize(pd.DataFrame(columns=list(_COLUMNS)))
+    # Appended result files can repeat a product; the last row is its most recent evaluation
+    frame = frame.drop_duplicates('product_id', keep='last').set_index('product_id')
+    logger.info(f"Loaded {len(frame)} products from {source}")
+    return frame
+
+
+def read_results_csv(path: str, chunk_rows: int = 250_000) -> pd.DataFrame:
+    """Scores of a results CSV, parsed in chunks with the free-text columns skipped."""
+    chunks = [
+        _normalize(chunk)
+        for chunk in pd.read_csv(
+            path,
+            usecols=lambda column: column in _COLUMNS,
+            dtype={'product_id': str, 'category': str},
+            chunksize=chunk_rows
+        )
+    ]
+    return _finish(chunks, path)
+
+
+def load_result_set(source: str, chunk_rows: int = 250_000, account: Optional[str] = None) -> pd.DataFrame:
+    """Load one result set, indexed by product_id, from a local CSV, a gs:// object or the database.
+
+    Database sources are ``db`` (latest evaluation per product) or
+    ``db:SINCE..UNTIL`` (each product's last evaluation in that ISO window,
+    either side optional), read for ``account`` (default VTEX_ACCOUNT_NAME).
+    """
+    if source == 'db' or source.startswith('db:'):
+        from app.services.database import DatabaseService
+        since, until = parse_db_source(source)
+        account = account or os.getenv('VTEX_ACCOUNT_NAME')
+        if not account:
+            raise ValueError("Database sources need an account (or VTEX_ACCOUNT_NAME)")
+        db_service = DatabaseService()
+        try:
+            chunks = [
+                _normalize(pd.DataFrame.from_records(rows, columns=list(_COLUMNS)))
+                for rows in db_service.iter_scores(account=account, since=since, until=until, chunk_rows=chunk_rows)
+            ]
+        finally:
+            db_service.close()
+        return _finish(chunks, f"{source} ({account})")
+
+    if source.startswith('gs://'):
+        from app.services.cloud_storage import CloudStorageService
+        with tempfile.NamedTemporaryFile(delete=False, suffix='.csv') as temp_file:
+            path = temp_file.name
+        try:
+            CloudStorageService().download_results_file(source, path)
+            frame = read_results_csv(path, chunk_rows)
+        finally:
+            os.unlink(path)
+        return frame
+
+    return read_results_csv(source, chunk_rows)
+
+
+def load_category_lookup(results_index=None, account: Optional[str] = None) -> Optional[pd.Series]:
+    """product_id -> category of an account from the results index, for result sets without categories."""
+    if results_index is None:
+        return None
+    chunks = [
+        pd.DataFrame.from_records(rows, columns=['product_id', 'category'])
+        for rows in results_index.iter_categories(account)
+    ]
+    if not chunks:
+        return None
+    lookup = pd.concat(chunks, ignore_index=True).dropna()
+    return lookup.set_index('product_id')['category'].astype('category')
+
+
+@dataclass
+class DiffReport:
+    """Run-to-run comparison of two result sets.
+
+    ``changes`` holds one row per product that is new, removed or whose score
+    changed; it is written by ``write_changes`` and left out of ``to_dict``.
+    """
+
+    summary: Dict
+    score_transitions: List[Dict]
+    categories: List[Dict]
+    regressions: List[Dict]
+    improvements: List[Dict]
+    changes: pd.DataFrame = field(repr=False)
+
+    def to_dict(self) -> Dict:
+        return {
+            'summary': self.summary,
+            'score_transitions': self.score_transitions,
+            'categories': self.categories,
+            'top_regressions': self.regressions,
+            'top_improvements': self.improvements,
+        }
+
+    def write_changes(self, path: str) -> None:
+        self.changes.to_csv(path, index=False, quoting=csv.QUOTE_ALL)
+        logger.info(f"Wrote {len(self.changes)} changed products to {path}")
+
+
+def _records(frame: pd.DataFrame) -> List[Dict]:
+    """JSON-friendly records (NaN -> None, numpy scalars -> Python)."""
+    return [
+        {key: (None if pd.isna(value) else value.item() if hasattr(value, 'item') else value)
+         for key, value in row.items()}
+        for row in frame.to_dict('records')
+    ]
+
+
+def compute_diff(
+    base: pd.DataFrame,
+    head: pd.DataFrame,
+    *,
+    category_lookup: Optional[pd.Series] = None,
+    top: int = 20
+) -> DiffReport:
+    """Join two result sets by product_id and summarize what moved between them.
+
+    ``delta`` is ``base_score - head_score``: the rubric ranks 1 as the best
+    score, so a positive delta is an improvement and a negative one a
+    regression. Score 0 marks a failed evaluation rather than a quality
+    judgement, so a product whose head score is 0 counts as ``failed`` and
+    one that comes back from 0 as ``recovered``; neither contributes to
+    score deltas.
+    """
+    started = time.perf_counter()
+    # Hash-join: one factorize over both key sets gives every product a slot,
+    # so alignment is array scatter instead of a sorted index union
+    codes, product_ids = pd.factorize(np.concatenate([base.index.to_numpy(object), head.index.to_numpy(object)]))
+    base_slots, head_slots = codes[:len(base)], codes[len(base):]
+    base_score = np.full(len(product_ids), np.nan, dtype='float32')
+    head_score = np.full(len(product_ids), np.nan, dtype='float32')
+    base_score[base_slots] = base['quality_score'].to_numpy()
+    head_score[head_slots] = head['quality_score'].to_numpy()
+
+    in_base = ~np.isnan(base_score)
+    in_head = ~np.isnan(head_score)
+    common = in_base & in_head
+    comparable = common & (base_score > 0) & (head_score > 0)
+    delta = np.where(comparable, base_score - head_score, np.nan)
+
+    status = np.select(
+        [
+            ~in_base,
+            ~in_head,
+            common & (head_score == 0) & (base_score > 0),
+            common & (base_score == 0) & (head_score > 0),
+            delta > 0,
+            delta < 0,
+        ],
+        ['new', 'removed', 'failed', 'recovered', 'improved', 'regressed'],
+        'unchanged'
+    )
+
+    # Head categories win; the lookup fills products neither result set categorized
+    category = np.full(len(product_ids), None, dtype=object)
+    category[base_slots] = base['category'].to_numpy(object)
+    head_category = head['category'].to_numpy(object)
+    categorized = pd.notna(head_category)
+    category[head_slots[categorized]] = head_category[categorized]
+    category = pd.Series(category, index=pd.Index(product_ids, name='product_id'))
+    if category_lookup is not None:
+        missing = category.isna()
+        category[missing] = category.index[missing].map(category_lookup)
+    category = category.fillna(UNKNOWN_CATEGORY).astype('category')
+
+    frame = pd.DataFrame({
+        'category': category,
+        'base_score': pd.Series(base_score, index=category.index).astype('Int8'),
+        'head_score': pd.Series(head_score, index=category.index).astype('Int8'),
+        'delta': pd.Series(delta, index=category.index).astype('Int8'),
+        'status': pd.Categorical(status, categories=list(CHANGE_STATUSES)),
+    })
+
+    counts = frame['status'].value_counts()
+    summary = {
+        'base_products': int(in_base.sum()),
+        'head_products': int(in_head.sum()),
+        'common_products': int(common.sum()),
+        **{status_name: int(counts.get(status_name, 0)) for status_name in CHANGE_STATUSES},
+        'base_average_score': round(float(base_score[base_score > 0].mean()), 3) if (base_score > 0).any() else None,
+        'head_average_score': round(float(head_score[head_score > 0].mean()), 3) if (head_score > 0).any() else None,
+        'average_delta': round(float(np.nanmean(delta)), 4) if comparable.any() else None,
+        'delta': DELTA_DEFINITION,
+    }
+
+    transitions = (
+        frame[common].groupby(['base_score', 'head_score'], observed=True).size()
+        .rename('products').reset_index()
+    )
+    transitions = transitions[transitions['base_score'] != transitions['head_score']]
+
+    flags = pd.get_dummies(frame['status'])
+    by_category = pd.concat([frame[['category', 'delta']], flags], axis=1).groupby('category', observed=True)
+    categories = by_category[list(CHANGE_STATUSES)].sum()
+    categories.insert(0, 'products', by_category.size())
+    categories['average_delta'] = by_category['delta'].mean().astype(float).round(4)
+    categories = categories.reset_index().sort_values(['average_delta', 'regressed'], ascending=[True, False])
+
+    moved = frame[frame['delta'].notna()].reset_index()
+    regressions = moved[moved['delta'] < 0].nsmallest(top, 'delta')
+    improvements = moved[moved['delta'] > 0].nlargest(top, 'delta')
+
+    report = DiffReport(
+        summary=summary,
+        score_transitions=_records(transitions),
+        categories=_records(categories),
+        regressions=_records(regressions),
+        improvements=_records(improvements),
+        changes=frame[frame['status'] != 'unchanged'].reset_index()
+    )
+    summary['seconds'] = round(time.perf_counter() - started, 3)
+    logger.info(
+        f"Diffed {summary['base_products']} vs {summary['head_products']} products in {summary['seconds']}s: "
+        f"{summary['regressed']} regressed, {summary['improved']} improved, "
+        f"{summary['new']} new, {summary['removed']} removed"
+    )
+    return report
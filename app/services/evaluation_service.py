@@ -1,13 +1,23 @@
+import itertools
 import os
+import time
 from dataclasses import dataclass
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timezone
-from typing import List, Iterator, Tuple
-from app.services.vtex_client import VtexClient
+from typing import Dict, Iterable, List, Iterator, Tuple
+from app.services.vtex_client import get_vtex_client
 from app.services.gemini_evaluator import GeminiEvaluator
+from app.services.near_duplicate_index import NearDuplicateIndex
+from app.services.pre_scorer import PreScorer
 from app.models.product import Product
+from app.models.evaluation_batch import EvaluationBatch
 from app.models.evaluation_result import EvaluationResult
+from app.utils.budget import BudgetGovernor, create_governor
+from app.utils.circuit_breaker import CircuitOpenError
+from app.utils.job_control import JobControl
 from app.utils.logger import get_logger
+from app.utils.metrics import EVALUATION_REUSE, PIPELINE_QUEUE_DEPTH, record_stage
+from app.utils.tracing import tracer
 
 logger = get_logger(__name__)
 
@@ -15,10 +25,53 @@ logger = get_logger(__name__)
 class EvaluationService:
     """Service for evaluating product catalog quality."""
 
-    def __init__(self):
-        self.vtex_client = VtexClient()
-        self.gemini_evaluator = GeminiEvaluator()
+    def __init__(
+        self,
+        evaluator_backend: str | None = None,
+        budget: BudgetGovernor | None = None,
+        control: JobControl | None = None,
+        account: str | None = None
+    ):
+        # Shared per-account client: pooled connections and rate limits span jobs
+        self.vtex_client = get_vtex_client(account)
+        # Cooperative pause/cancel: checked per chunk here and per Gemini call by the evaluator
+        self.control = control
+        # API jobs pass a governor that also enforces their own caps
+        governor = budget or create_governor()
+
+        # 'online' calls Gemini per product; 'batch' runs asynchronous batch jobs for full sweeps
+        evaluator_backend = (evaluator_backend or os.getenv('GEMINI_EVALUATOR_BACKEND', 'online')).lower()
+        if evaluator_backend == 'batch':
+            from app.services.gemini_batch_evaluator import GeminiBatchEvaluator
+            self.gemini_evaluator = GeminiBatchEvaluator(budget=governor, control=control)
+        elif evaluator_backend == 'online':
+            self.gemini_evaluator = GeminiEvaluator(governor, control)
+        else:
+            raise ValueError("evaluator_backend must be 'online' or 'batch'")
         self._product_fetch_workers = max(1, int(os.getenv('VTEX_FETCH_CONCURRENCY', '8')))
+        # Product IDs are fetched and evaluated in chunks so streamed sources (catalog
+        # enumeration) produce results early; batch jobs get one chunk per job by default
+        default_chunk_size = '50000' if evaluator_backend == 'batch' else '1000'
+        self._chunk_size = max(1, int(os.getenv('EVALUATION_CHUNK_SIZE', default_chunk_size)))
+        # How long fetches may wait for an open VTEX circuit breaker before giving up
+        self._max_breaker_pause = float(os.getenv('CIRCUIT_BREAKER_MAX_PAUSE_SECONDS', '600'))
+
+        # Heuristic pre-scoring keeps trivially bad descriptions away from Gemini
+        self.pre_scorer: PreScorer | None = None
+        if os.getenv('PRE_SCORER_ENABLED', 'false').lower() == 'true':
+            self.pre_scorer = PreScorer()
+
+        # Optional near-duplicate clustering: evaluate one representative per cluster.
+        # Cached representative results are dropped together with their index entries.
+        self.near_duplicate_index: NearDuplicateIndex | None = None
+        self._representative_results: Dict[str, EvaluationResult] = {}
+        if os.getenv('NEAR_DUPLICATE_ENABLED', 'false').lower() == 'true':
+            self.near_duplicate_index = NearDuplicateIndex(
+                threshold=float(os.getenv('NEAR_DUPLICATE_THRESHOLD', '0.8')),
+                num_perm=int(os.getenv('NEAR_DUPLICATE_NUM_PERM', '64')),
+                max_size=int(os.getenv('NEAR_DUPLICATE_MAX_REPRESENTATIVES', '100000')),
+                on_evict=lambda key: self._representative_results.pop(key, None)
+            )
 
     @dataclass
     class _FetchOutcome:
@@ -26,11 +79,21 @@ class EvaluationService:
         product_id: str
         product: Product | None = None
         error_result: EvaluationResult | None = None
+        requeue: bool = False
+        skipped: bool = False
 
-    def _fetch_single_product(self, index: int, product_id: str) -> "EvaluationService._FetchOutcome":
+    def _fetch_single_product(
+        self,
+        index: int,
+        product_id: str,
+        brand_id: str | None = None
+    ) -> "EvaluationService._FetchOutcome":
         """Fetch a single product and build error result on failure."""
         try:
-            product = self.vtex_client.get_product(product_id)
+            with tracer.span('fetch', product_id):
+                product = self.vtex_client.get_product(product_id)
+            if product and brand_id and product.brand_id != brand_id:
+                return self._FetchOutcome(index=index, product_id=product_id, skipped=True)
             if product and product.description:
                 return self._FetchOutcome(index=index, product_id=product_id, product=product)
 
@@ -47,6 +110,9 @@ class EvaluationService:
             )
             return self._FetchOutcome(index=index, product_id=product_id, error_result=error_result)
 
+        except CircuitOpenError:
+            return self._FetchOutcome(index=index, product_id=product_id, requeue=True)
+
         except Exception as exc:
             logger.error(
                 f"Failed to fetch product {product_id}: {exc}",
@@ -61,87 +127,266 @@ class EvaluationService:
             )
             return self._FetchOutcome(index=index, product_id=product_id, error_result=error_result)
 
-    def _fetch_products_concurrently(self, product_ids: List[str]) -> List["EvaluationService._FetchOutcome"]:
-        """Fetch VTEX products concurrently to hide network latency."""
+    def _fetch_products_concurrently(
+        self,
+        product_ids: List[str],
+        brand_id: str | None = None
+    ) -> List["EvaluationService._FetchOutcome"]:
+        """Fetch VTEX products concurrently to hide network latency.
+
+        Fetches rejected by an open circuit breaker are requeued after the
+        breaker's open period instead of being recorded as errors.
+        """
         outcomes: List[EvaluationService._FetchOutcome] = []
-        with ThreadPoolExecutor(max_workers=self._product_fetch_workers) as executor:
-            future_map = {
-                executor.submit(self._fetch_single_product, idx, product_id): idx
-                for idx, product_id in enumerate(product_ids)
-            }
-            for future in as_completed(future_map):
-                outcome = future.result()
-                outcomes.append(outcome)
+        pending = list(enumerate(product_ids))
+        paused = 0.0
+
+        queue_depth = PIPELINE_QUEUE_DEPTH.labels('fetch')
+        while pending:
+            requeued: List[EvaluationService._FetchOutcome] = []
+            queue_depth.inc(len(pending))
+            with ThreadPoolExecutor(max_workers=self._product_fetch_workers) as executor:
+                futures = [
+                    executor.submit(self._fetch_single_product, idx, product_id, brand_id)
+                    for idx, product_id in pending
+                ]
+                for future in as_completed(futures):
+                    outcome = future.result()
+                    queue_depth.dec()
+                    if outcome.requeue:
+                        requeued.append(outcome)
+                    else:
+                        outcomes.append(outcome)
+
+            if not requeued:
+                break
+
+            if paused >= self._max_breaker_pause:
+                logger.error(f"VTEX circuit breaker stayed open for {paused:.0f}s; "
+                             f"giving up on {len(requeued)} products")
+                for outcome in requeued:
+                    outcome.error_result = EvaluationResult(
+                        product_id=outcome.product_id,
+                        quality_score=0,
+                        evaluation_timestamp=datetime.now(timezone.utc),
+                        reason="VTEX API unavailable (circuit breaker open)",
+                        raw_response="VTEX_API_ERROR"
+                    )
+                    outcomes.append(outcome)
+                break
+
+            delay = max(1.0, self.vtex_client.circuit_breaker.retry_after())
+            logger.warning(f"VTEX circuit breaker open; pausing {len(requeued)} fetches for {delay:.1f}s")
+            time.sleep(delay)
+            paused += delay
+            pending = [(outcome.index, outcome.product_id) for outcome in requeued]
 
         return sorted(outcomes, key=lambda item: item.index)
 
-    def evaluate_catalog_batches(
+    def _evaluate_with_near_duplicates(self, products: List[Product]) -> List[EvaluationResult]:
+        """Evaluate cluster representatives and propagate their scores to near-duplicates."""
+        index = self.near_duplicate_index
+        assignments: List[Tuple[str, float] | None] = []
+        representatives: List[Product] = []
+        for product in products:
+            representative_id, similarity = index.find_or_add(product.product_id, product.description)
+            if representative_id is None:
+                representatives.append(product)
+                assignments.append(None)
+            else:
+                assignments.append((representative_id, similarity))
+
+        evaluated: Dict[str, EvaluationResult] = {}
+        if representatives:
+            for result in self.gemini_evaluator.evaluate_products(representatives):
+                evaluated[result.product_id] = result
+                # A representative evicted within this batch is not cached (its members become orphans)
+                if result.quality_score > 0 and result.product_id in index:
+                    self._representative_results[result.product_id] = result
+
+        # Members whose representative failed are evaluated on their own
+        orphans = [
+            product for product, assignment in zip(products, assignments)
+            if assignment and assignment[0] not in self._representative_results
+        ]
+        if orphans:
+            for result in self.gemini_evaluator.evaluate_products(orphans):
+                evaluated[result.product_id] = result
+
+        results: List[EvaluationResult] = []
+        reused = 0
+        for product, assignment in zip(products, assignments):
+            source = self._representative_results.get(assignment[0]) if assignment else None
+            if source is None:
+                # Absent only when the job was cancelled before this product was evaluated
+                if product.product_id in evaluated:
+                    results.append(evaluated[product.product_id])
+                continue
+
+            representative_id, similarity = assignment
+            reused += 1
+            results.append(EvaluationResult(
+                product_id=product.product_id,
+                quality_score=source.quality_score,
+                evaluation_timestamp=datetime.now(timezone.utc),
+                reason=source.reason,
+                raw_response=f"NEAR_DUPLICATE_OF:{representative_id} SIMILARITY:{similarity:.2f}"
+            ))
+
+        EVALUATION_REUSE.labels('near_duplicate').inc(reused)
+        logger.info(
+            f"Near-duplicate clustering reused {reused} of {len(products)} evaluations",
+            extra={'reused': reused, 'evaluated': len(representatives) + len(orphans)}
+        )
+        return results
+
+    @property
+    def _cancelled(self) -> bool:
+        return self.control is not None and self.control.cancelled
+
+    def _evaluate_with_llm(self, products: List[Product]) -> List[EvaluationResult]:
+        """Send products to Gemini, reusing near-duplicate evaluations when enabled."""
+        if not products:
+            return []
+        if self.near_duplicate_index is not None:
+            return self._evaluate_with_near_duplicates(products)
+        return self.gemini_evaluator.evaluate_products(products)
+
+    def _evaluate_products(self, products: List[Product]) -> List[EvaluationResult]:
+        """Run the evaluation stages for fetched products, preserving input order."""
+        if self.pre_scorer is None:
+            return self._evaluate_with_llm(products)
+
+        prescored = self.pre_scorer.score(products)
+        remaining = [product for product, result in zip(products, prescored) if result is None]
+        EVALUATION_REUSE.labels('pre_scorer').inc(len(products) - len(remaining))
+        # Realigned by product ID: a cancelled job returns only the evaluations that finished
+        llm_results = {result.product_id: result for result in self._evaluate_with_llm(remaining)}
+        missing = sum(1 for product in remaining if product.product_id not in llm_results)
+        if missing and not self._cancelled:
+            raise RuntimeError(f"Evaluator returned no result for {missing} of {len(remaining)} products")
+
+        logger.info(
+            f"Pre-scorer resolved {len(products) - len(remaining)} of {len(products)} products without Gemini"
+        )
+        results = [
+            result if result is not None else llm_results.get(product.product_id)
+            for product, result in zip(products, prescored)
+        ]
+        return [result for result in results if result is not None]
+
+    def _iter_chunks(self, product_ids: Iterable[str]) -> Iterator[List[str]]:
+        """Split any iterable of product IDs (list, CSV, catalog enumeration) into chunks."""
+        iterator = iter(product_ids)
+        while True:
+            chunk = list(itertools.islice(iterator, self._chunk_size))
+            if not chunk:
+                return
+            yield chunk
+
+    def _fetch_next_chunk(
         self,
-        product_ids: List[str],
-        *,
-        batch_size: int | None = None
-    ) -> Iterator[Tuple[List[Product], List[EvaluationResult]]]:
-        """Yield VTEX products and evaluation results in batches."""
-        resolved_batch_size = max(1, batch_size or self.gemini_evaluator.batch_size)
+        chunks: Iterator[List[str]],
+        brand_id: str | None
+    ) -> List["EvaluationService._FetchOutcome"] | None:
+        """Pull the next chunk of IDs from the source and fetch its products."""
+        if self.control:
+            self.control.checkpoint()
+        chunk = next(chunks, None)
+        if chunk is None:
+            return None
 
-        outcomes = self._fetch_products_concurrently(product_ids)
+        fetch_started = time.perf_counter()
+        outcomes = self._fetch_products_concurrently(chunk, brand_id)
+        fetch_seconds = time.perf_counter() - fetch_started
+        record_stage('fetch', len(outcomes), fetch_seconds)
+        skipped = sum(1 for outcome in outcomes if outcome.skipped)
+        logger.info(
+            f"Fetched {len(outcomes)} products in {fetch_seconds:.2f}s "
+            f"({sum(1 for outcome in outcomes if outcome.error_result)} errors"
+            + (f", {skipped} filtered out by brand)" if skipped else ")")
+        )
+        return outcomes
 
+    def _evaluate_chunk(
+        self,
+        outcomes: List["EvaluationService._FetchOutcome"],
+        resolved_batch_size: int
+    ) -> Iterator[EvaluationBatch]:
+        """Evaluate one fetched chunk and yield its rows as columnar batches, in input order."""
         valid_products = [outcome.product for outcome in outcomes if outcome.product]
-        evaluated_results: List[EvaluationResult] = []
+        evaluated_results: Dict[str, EvaluationResult] = {}
         if valid_products:
-            evaluated_results = self.gemini_evaluator.evaluate_products(valid_products)
-            if len(evaluated_results) != len(valid_products):
+            evaluate_started = time.perf_counter()
+            evaluated_results = {result.product_id: result for result in self._evaluate_products(valid_products)}
+            record_stage('evaluate', len(evaluated_results), time.perf_counter() - evaluate_started)
+            if len(evaluated_results) != len({product.product_id for product in valid_products}) \
+                    and not self._cancelled:
                 logger.error(
                     "Mismatch between evaluated results and fetched products",
                     extra={'expected': len(valid_products), 'received': len(evaluated_results)}
                 )
 
-        evaluation_iter = iter(evaluated_results)
-        batch_products: List[Product] = []
-        batch_results: List[EvaluationResult] = []
+        batch = EvaluationBatch()
 
         for outcome in outcomes:
             if outcome.product:
-                product = outcome.product
-                try:
-                    result = next(evaluation_iter)
-                except StopIteration:
-                    logger.error(
-                        "Ran out of evaluation results while processing products",
-                        extra={'product_id': product.product_id}
-                    )
-                    if batch_products or batch_results:
-                        yield batch_products.copy(), batch_results.copy()
-                    break
-                batch_products.append(product)
-                batch_results.append(result)
-
-                if len(batch_products) >= resolved_batch_size:
-                    yield batch_products.copy(), batch_results.copy()
-                    batch_products.clear()
-                    batch_results.clear()
+                result = evaluated_results.get(outcome.product.product_id)
+                if result is None:
+                    # A cancelled job keeps what finished; the rest of the chunk is not written
+                    continue
+                batch.append(result, outcome.product)
             elif outcome.error_result:
-                if batch_products or batch_results:
-                    yield batch_products.copy(), batch_results.copy()
-                    batch_products.clear()
-                    batch_results.clear()
+                batch.append(outcome.error_result)
+            else:
+                continue
 
-                yield [], [outcome.error_result]
+            # Each full batch is handed off as-is and a fresh one started, so nothing is copied
+            if len(batch) >= resolved_batch_size:
+                yield batch
+                batch = EvaluationBatch()
 
-        if batch_products or batch_results:
-            yield batch_products.copy(), batch_results.copy()
+        if batch:
+            yield batch
 
-    def evaluate_catalog(self, product_ids: List[str]) -> tuple[List[Product], List[EvaluationResult]]:
-        """Evaluate a list of product IDs and return products and evaluation results."""
-        products: List[Product] = []
-        evaluation_results: List[EvaluationResult] = []
+    def evaluate_catalog_batches(
+        self,
+        product_ids: Iterable[str],
+        *,
+        batch_size: int | None = None,
+        brand_id: str | None = None
+    ) -> Iterator[EvaluationBatch]:
+        """Yield evaluation rows, with the VTEX products they came from, as columnar batches.
 
-        for batch_products, batch_results in self.evaluate_catalog_batches(product_ids):
-            if batch_products:
-                products.extend(batch_products)
-            evaluation_results.extend(batch_results)
+        ``product_ids`` may be a lazy iterable such as ``VtexClient.iter_product_ids()``;
+        the next chunk is pulled and fetched in the background while the current one
+        is evaluated. ``brand_id`` drops fetched products of other brands.
+        """
+        resolved_batch_size = max(1, batch_size or self.gemini_evaluator.batch_size)
+        chunks = self._iter_chunks(product_ids)
 
-        if not products:
-            logger.info("No products available for AI evaluation")
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix='fetch-ahead') as prefetcher:
+            pending = prefetcher.submit(self._fetch_next_chunk, chunks, brand_id)
+            while True:
+                outcomes = pending.result()
+                if outcomes is None:
+                    break
+                pending = prefetcher.submit(self._fetch_next_chunk, chunks, brand_id)
+                if self.control:
+                    self.control.checkpoint()
+                # A cancel during evaluation still yields the chunk's finished rows and
+                # surfaces as JobCancelled at the next chunk boundary
+                yield from self._evaluate_chunk(outcomes, resolved_batch_size)
+        if self.control:
+            # The last chunk has no following boundary; report a cancel that cut it short
+            self.control.raise_if_cancelled()
 
-        return products, evaluation_results
\ No newline at end of file
+        if self.pre_scorer is not None:
+            logger.info(f"Pre-scorer report: {self.pre_scorer.report()}")
+
+    def evaluate_catalog(self, product_ids: Iterable[str]) -> EvaluationBatch:
+        """Evaluate product IDs and return all rows as one batch."""
+        batch = EvaluationBatch.concat(self.evaluate_catalog_batches(product_ids))
+        if not batch.product_count:
+            logger.info("No products available for AI evaluation")
+        return batch
@@ -0,0 +1,295 @@
+import os
+import json
+import time
+import uuid
+import tempfile
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional
+from google.genai import types
+from app.services.gemini_evaluator import GeminiEvaluator
+from app.utils.budget import BudgetGovernor
+from app.utils.job_control import JobCancelled, JobControl
+from app.models.product import Product
+from app.models.evaluation_result import EvaluationResult
+from app.utils.logger import get_logger
+from app.utils.response_parser import EVALUATION_RESPONSE_SCHEMA, ResponseParseError
+
+logger = get_logger(__name__)
+
+_SUCCEEDED_STATES = {'JOB_STATE_SUCCEEDED', 'JOB_STATE_PARTIALLY_SUCCEEDED'}
+_FAILED_STATES = {'JOB_STATE_FAILED', 'JOB_STATE_CANCELLED', 'JOB_STATE_EXPIRED'}
+
+
+def _response_text(response: Dict) -> Optional[str]:
+    """Extract the concatenated text parts from a GenerateContentResponse JSON object."""
+    for candidate in response.get('candidates') or []:
+        parts = (candidate.get('content') or {}).get('parts') or []
+        text = ''.join(part.get('text', '') for part in parts)
+        if text:
+            return text.strip()
+    return None
+
+
+class GeminiBatchBackend:
+    """Submits JSONL request files to the Gemini Batch API."""
+
+    def __init__(self, client):
+        self.client = client
+
+    def submit(self, request_path: str, model: str) -> str:
+        uploaded = self.client.files.upload(
+            file=request_path,
+            config=types.UploadFileConfig(display_name=os.path.basename(request_path), mime_type='jsonl')
+        )
+        job = self.client.batches.create(
+            model=model,
+            src=uploaded.name,
+            config=types.CreateBatchJobConfig(display_name=os.path.basename(request_path))
+        )
+        return job.name
+
+    def poll(self, job_name: str) -> str:
+        job = self.client.batches.get(name=job_name)
+        return job.state.name if hasattr(job.state, 'name') else str(job.state)
+
+    def cancel(self, job_name: str) -> None:
+        self.client.batches.cancel(name=job_name)
+
+    def download_results(self, job_name: str, destination: str) -> str:
+        job = self.client.batches.get(name=job_name)
+        if not job.dest or not job.dest.file_name:
+            raise RuntimeError(f"Batch job {job_name} has no result file")
+        content = self.client.files.download(file=job.dest.file_name)
+        with open(destination, 'wb') as result_file:
+            result_file.write(content)
+        return destination
+
+
+class LocalBatchBackend:
+    """Processes JSONL request files in-process, mirroring the Batch API file formats.
+
+    ``generate`` receives ``(model, prompt)`` and returns the response text;
+    raising marks that line as failed.
+    """
+
+    def __init__(self, generate: Callable[[str, str], str]):
+        self.generate = generate
+        self._results: Dict[str, List[str]] = {}
+
+    def submit(self, request_path: str, model: str) -> str:
+        job_name = f"local-batches/{uuid.uuid4()}"
+        lines = []
+        with open(request_path, encoding='utf-8') as request_file:
+            for line in request_file:
+                request = json.loads(line)
+                prompt = ''.join(
+                    part.get('text', '')
+                    for content in request['request']['contents']
+                    for part in content.get('parts', [])
+                )
+                try:
+                    text = self.generate(model, prompt)
+                    entry = {
+                        'key': request['key'],
+                        'response': {'candidates': [{'content': {'parts': [{'text': text}], 'role': 'model'}}]}
+                    }
+                except Exception as e:
+                    entry = {'key': request['key'], 'error': {'message': str(e)}}
+                lines.append(json.dumps(entry))
+        self._results[job_name] = lines
+        return job_name
+
+    def poll(self, job_name: str) -> str:
+        return 'JOB_STATE_SUCCEEDED' if job_name in self._results else 'JOB_STATE_FAILED'
+
+    def cancel(self, job_name: str) -> None:
+        # Local jobs finish during submit; cancelling only discards their output
+        self._results.pop(job_name, None)
+
+    def download_results(self, job_name: str, destination: str) -> str:
+        with open(destination, 'w', encoding='utf-8') as result_file:
+            result_file.write('\n'.join(self._results.pop(job_name)) + '\n')
+        return destination
+
+
+class GeminiBatchEvaluator(GeminiEvaluator):
+    """Evaluator backend that runs evaluations as asynchronous Gemini batch jobs."""
+
+    def __init__(self, backend=None, budget: BudgetGovernor | None = None, control: JobControl | None = None):
+        super().__init__(budget, control)
+        self._poll_interval = max(1.0, float(os.getenv('GEMINI_BATCH_POLL_SECONDS', '30')))
+        self._timeout = float(os.getenv('GEMINI_BATCH_TIMEOUT_SECONDS', str(24 * 3600)))
+        self._max_requests_per_job = max(1, int(os.getenv('GEMINI_BATCH_MAX_REQUESTS', '50000')))
+        self._work_dir = os.getenv('GEMINI_BATCH_WORK_DIR') or tempfile.gettempdir()
+
+        if backend is not None:
+            self.backend = backend
+        elif os.getenv('GEMINI_BATCH_BACKEND', 'gemini').lower() == 'local':
+            # Serially replays each request through the online API
+            self.backend = LocalBatchBackend(lambda model, prompt: self._generate_content(prompt, model).text)
+        else:
+            self.backend = GeminiBatchBackend(self.client)
+
+    def _request_entry(self, product: Product) -> Dict:
+        """Build one JSONL request line for a product."""
+        request = {'contents': [{'role': 'user', 'parts': [{'text': self._create_evaluation_prompt(product)}]}]}
+        if self.context_cache_mode != 'off':
+            request['system_instruction'] = {'parts': [{'text': self._instructions}]}
+        if self.response_mode == 'json':
+            request['generation_config'] = {
+                'response_mime_type': 'application/json',
+                'response_schema': EVALUATION_RESPONSE_SCHEMA,
+                'max_output_tokens': self._generation_config.max_output_tokens,
+            }
+            if self._generation_config.thinking_config:
+                request['generation_config']['thinking_config'] = {
+                    'thinking_budget': self._generation_config.thinking_config.thinking_budget
+                }
+        return {'key': product.product_id, 'request': request}
+
+    def _write_request_file(self, products: List[Product]) -> str:
+        path = os.path.join(self._work_dir, f"gemini_batch_{uuid.uuid4().hex}.jsonl")
+        with open(path, 'w', encoding='utf-8') as request_file:
+            for product in products:
+                request_file.write(json.dumps(self._request_entry(product)) + '\n')
+        return path
+
+    def _cancel_jobs(self, job_names: List[str]) -> None:
+        """Best-effort cancellation of submitted jobs so a cancelled run stops spending quota."""
+        for job_name in job_names:
+            try:
+                self.backend.cancel(job_name)
+                logger.info(f"Cancelled batch job {job_name}")
+            except Exception as e:
+                logger.warning(f"Could not cancel batch job {job_name}: {e}")
+
+    def _wait_for_jobs(self, job_names: List[str]) -> Dict[str, str]:
+        """Poll jobs until every one reaches a terminal state or the timeout elapses.
+
+        If the run is cancelled meanwhile, the unfinished jobs are cancelled
+        through the backend before JobCancelled propagates.
+        """
+        deadline = time.monotonic() + self._timeout
+        states: Dict[str, str] = {}
+        pending = list(job_names)
+        while pending:
+            if self.control:
+                try:
+                    self.control.raise_if_cancelled()
+                except JobCancelled:
+                    self._cancel_jobs(pending)
+                    raise
+            for job_name in list(pending):
+                state = self.backend.poll(job_name)
+                if state in _SUCCEEDED_STATES or state in _FAILED_STATES:
+                    states[job_name] = state
+                    pending.remove(job_name)
+                    logger.info(f"Batch job {job_name} finished with state {state}")
+            if not pending:
+                break
+            if time.monotonic() >= deadline:
+                logger.error(f"Timed out waiting for {len(pending)} batch jobs")
+                # Abandoned jobs would otherwise keep running, and billing, remotely
+                self._cancel_jobs(pending)
+                for job_name in pending:
+                    states[job_name] = 'TIMEOUT'
+                break
+            time.sleep(self._poll_interval)
+        return states
+
+    def _read_results(self, result_path: str) -> Dict[str, Dict]:
+        results: Dict[str, Dict] = {}
+        with open(result_path, encoding='utf-8') as result_file:
+            for line in result_file:
+                if line.strip():
+                    entry = json.loads(line)
+                    results[entry['key']] = entry
+        return results
+
+    def _build_result(self, product: Product, entry: Optional[Dict]) -> EvaluationResult:
+        """Convert a batch output line into an EvaluationResult."""
+        now = datetime.now(timezone.utc)
+        if entry is None:
+            return EvaluationResult(product_id=product.product_id, quality_score=0, evaluation_timestamp=now,
+                                    reason="Missing from batch output", raw_response="BATCH_MISSING")
+        if 'error' in entry:
+            message = entry['error'].get('message', str(entry['error']))
+            return EvaluationResult(product_id=product.product_id, quality_score=0, evaluation_timestamp=now,
+                                    reason=f"Evaluation failed: {message}", raw_response=message)
+
+        raw_response = _response_text(entry.get('response') or {}) or ''
+        try:
+            parsed = self._parse_response(raw_response)
+        except ResponseParseError as e:
+            return EvaluationResult(product_id=product.product_id, quality_score=0, evaluation_timestamp=now,
+                                    reason=f"Unparseable Gemini response: {e}", raw_response=raw_response)
+
+        return EvaluationResult(product_id=product.product_id, quality_score=parsed.score, evaluation_timestamp=now,
+                                reason=parsed.reason, raw_response=raw_response)
+
+    def _charge_batch_usage(self, entries) -> None:
+        """Charge the budget with the usage metadata of batch output lines."""
+        requests = input_tokens = output_tokens = 0
+        for entry in entries:
+            requests += 1
+            usage = (entry.get('response') or {}).get('usageMetadata') or {}
+            input_tokens += usage.get('promptTokenCount') or 0
+            output_tokens += (usage.get('candidatesTokenCount') or 0) + (usage.get('thoughtsTokenCount') or 0)
+        self.budget.charge(requests, input_tokens, output_tokens)
+
+    def evaluate_products(self, products: List[Product]) -> List[EvaluationResult]:
+        """Evaluate products through batch jobs, returning results in input order."""
+        if not products:
+            return []
+
+        chunks = [
+            products[start:start + self._max_requests_per_job]
+            for start in range(0, len(products), self._max_requests_per_job)
+        ]
+        request_paths: List[str] = []
+        job_names: List[str] = []
+        try:
+            try:
+                for chunk in chunks:
+                    request_paths.append(self._write_request_file(chunk))
+                for path in request_paths:
+                    # Usage is only known once a job's results are read, so caps are checked per submitted job
+                    if self.control:
+                        self.control.checkpoint()
+                        self.budget.wait_blocking(self.control.raise_if_cancelled)
+                    else:
+                        self.budget.wait_blocking()
+                    job_names.append(self.backend.submit(path, self.model))
+            except BaseException:
+                # Cancelled or failed part-way: jobs already submitted would run on unattended
+                self._cancel_jobs(job_names)
+                raise
+            logger.info(f"Submitted {len(job_names)} batch jobs for {len(products)} products with {self.model}")
+
+            states = self._wait_for_jobs(job_names)
+
+            results: List[EvaluationResult] = []
+            for chunk, job_name, request_path in zip(chunks, job_names, request_paths):
+                entries: Dict[str, Dict] = {}
+                if states[job_name] in _SUCCEEDED_STATES:
+                    result_path = request_path.replace('.jsonl', '_results.jsonl')
+                    try:
+                        entries = self._read_results(self.backend.download_results(job_name, result_path))
+                    finally:
+                        if os.path.exists(result_path):
+                            os.unlink(result_path)
+                    if isinstance(self.backend, GeminiBatchBackend):
+                        # The local backend goes through _generate_content, which already charged usage
+                        self._charge_batch_usage(entries.values())
+
+                for product in chunk:
+                    entry = entries.get(product.product_id)
+                    if entry is None and states[job_name] not in _SUCCEEDED_STATES:
+                        entry = {'error': {'message': f"Batch job {job_name} ended with state {states[job_name]}"}}
+                    results.append(self._build_result(product, entry))
+        finally:
+            for path in request_paths:
+                os.unlink(path)
+
+        logger.info(f"Ingested {len(results)} batch evaluation results")
+        return results
@@ -1,135 +1,446 @@
 import os
+import time
+import random
 import asyncio
+from collections import deque
 from concurrent.futures import ThreadPoolExecutor
-from typing import List
+from dataclasses import dataclass, field
+from typing import Deque, Dict, List
 from datetime import datetime, timezone
 import google.genai as genai
+from google.genai import errors, types
 from app.models.product import Product
 from app.models.evaluation_result import EvaluationResult
+from app.services.context_cache import ContextCache, get_context_cache
+from app.utils.budget import BudgetGovernor, create_governor
+from app.utils.circuit_breaker import CircuitOpenError, get_circuit_breaker
+from app.utils.hedging import HedgingPolicy
+from app.utils.job_control import JobCancelled, JobControl
 from app.utils.logger import get_logger
+from app.utils.metrics import (
+    GEMINI_REQUEST_SECONDS,
+    PIPELINE_QUEUE_DEPTH,
+    UPSTREAM_ERRORS,
+    UPSTREAM_IN_FLIGHT,
+    UPSTREAM_RETRIES,
+    record_gemini_usage,
+)
+from app.utils.response_parser import (
+    EVALUATION_RESPONSE_SCHEMA,
+    ParsedEvaluation,
+    ResponseParseError,
+    parse_json_response,
+    parse_text_response,
+)
+from app.utils.text_preprocessing import preprocess_description
+from app.utils.tracing import tracer
+from app.utils.upstream_recorder import UpstreamRecorder, get_upstream_recorder
 
 logger = get_logger(__name__)
 
+# Output caps at or below this leave no room for thinking unless GEMINI_THINKING_BUDGET says otherwise
+_THINKING_OFF_BELOW_OUTPUT_TOKENS = 1024
+
+
+@dataclass
+class TierStats:
+    """Call counters and latency samples for one model tier of the cascade."""
+    model: str
+    calls: int = 0
+    accepted: int = 0
+    escalated: int = 0
+    failures: int = 0
+    latencies: Deque[float] = field(default_factory=lambda: deque(maxlen=10000))
+
+    def report(self) -> Dict:
+        ordered = sorted(self.latencies)
+
+        def percentile(q: float) -> float:
+            if not ordered:
+                return 0.0
+            return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000, 1)
+
+        return {
+            'model': self.model,
+            'calls': self.calls,
+            'accepted': self.accepted,
+            'escalated': self.escalated,
+            'failures': self.failures,
+            'p50_ms': percentile(0.50),
+            'p95_ms': percentile(0.95),
+            'max_ms': percentile(1.0),
+        }
+
 
 class GeminiEvaluator:
     """Service for evaluating product descriptions using Google Gemini."""
 
-    def __init__(self):
+    def __init__(self, budget: BudgetGovernor | None = None, control: JobControl | None = None):
         api_key = os.getenv('GOOGLE_API_KEY')
         if not api_key:
             raise ValueError("GOOGLE_API_KEY not set")
 
-        self.client = genai.Client(api_key=api_key)
-        self.model = "models/gemini-flash-latest"  # Use a stable available model
-        
+        # Per-call deadline enforced by the HTTP client and by the awaiting coroutine
+        self._request_timeout = float(os.getenv('GEMINI_REQUEST_TIMEOUT_SECONDS', '30'))
+        self._max_attempts = max(1, int(os.getenv('GEMINI_MAX_ATTEMPTS', '2')))
+        self.client = genai.Client(
+            api_key=api_key,
+            # GEMINI_BASE_URL points the client at a stand-in server (benchmarks, local testing)
+            http_options=types.HttpOptions(
+                timeout=int(self._request_timeout * 1000),
+                base_url=os.getenv('GEMINI_BASE_URL') or None
+            )
+        )
+
+        # Model cascade: cheaper tiers first, escalating ambiguous products to later tiers
+        self.models = [
+            model.strip()
+            for model in os.getenv('GEMINI_MODEL_TIERS', 'models/gemini-flash-latest').split(',')
+            if model.strip()
+        ]
+        if not self.models:
+            raise ValueError("GEMINI_MODEL_TIERS must list at least one model")
+        self.model = self.models[-1]
+        self._escalate_scores = {
+            int(score) for score in os.getenv('GEMINI_ESCALATE_SCORES', '3').split(',') if score.strip()
+        }
+        self._escalate_min_confidence = float(os.getenv('GEMINI_ESCALATE_MIN_CONFIDENCE', '0.6'))
+        self.tier_stats = [TierStats(model=model) for model in self.models]
+
+        # Request/token budgets: global daily caps plus the job's own caps, if any
+        self.budget = budget or create_governor()
+        # Pause/cancel switch of the API job this evaluator works for
+        self.control = control
+
+        # Record/replay of raw responses (UPSTREAM_RECORD_MODE)
+        self.recorder = get_upstream_recorder()
+
         # Try to list available models for debugging
-        try:
-            models = self.client.models.list()
-            logger.info(f"Available Gemini models: {[m.name for m in models if 'gemini' in m.name.lower()]}")
-        except Exception as e:
-            logger.warning(f"Could not list models: {e}")
+        if not (self.recorder and self.recorder.replaying):
+            try:
+                models = self.client.models.list()
+                logger.info(f"Available Gemini models: {[m.name for m in models if 'gemini' in m.name.lower()]}")
+            except Exception as e:
+                logger.warning(f"Could not list models: {e}")
 
         # Concurrency controls (tune via environment variables)
         self.batch_size = max(1, int(os.getenv('GEMINI_REQUEST_BATCH_SIZE', '50')))
         self._max_concurrency = max(1, int(os.getenv('GEMINI_MAX_CONCURRENCY', '12')))
-        self._executor = ThreadPoolExecutor(max_workers=self._max_concurrency)
-        self._semaphore = asyncio.Semaphore(self._max_concurrency)
+        self.hedging = HedgingPolicy(
+            enabled=os.getenv('GEMINI_HEDGING_ENABLED', 'false').lower() == 'true',
+            percentile=float(os.getenv('GEMINI_HEDGE_PERCENTILE', '0.95')),
+            max_ratio=float(os.getenv('GEMINI_HEDGE_MAX_RATIO', '0.05'))
+        )
+        self.circuit_breaker = get_circuit_breaker('gemini')
+        self._max_breaker_pause = float(os.getenv('CIRCUIT_BREAKER_MAX_PAUSE_SECONDS', '600'))
+        # Leave headroom for hedged duplicates so they do not queue behind primaries
+        self._executor = ThreadPoolExecutor(max_workers=self._max_concurrency * (2 if self.hedging.enabled else 1))
+        self._semaphore: asyncio.Semaphore | None = None
 
-    def _create_evaluation_prompt(self, product: Product) -> str:
-        """Create prompt for evaluating product description quality."""
-        return f"""
-Evaluate the quality of this product description on a scale of 1-5, where:
+        # Response format: 'text' (SCORE:/REASON: lines) or 'json' (response schema)
+        self.response_mode = os.getenv('GEMINI_RESPONSE_MODE', 'text').lower()
+        if self.response_mode not in ('text', 'json'):
+            raise ValueError("GEMINI_RESPONSE_MODE must be 'text' or 'json'")
+        self._parse_retries = max(0, int(os.getenv('GEMINI_PARSE_RETRIES', '2')))
+        self._generation_config = self._build_generation_config()
+
+        # Static instructions: 'off' repeats them in every prompt, 'system' sends them as a system
+        # instruction and 'cached' registers them once per model as Gemini cached content
+        self.context_cache_mode = os.getenv('GEMINI_CONTEXT_CACHE', 'off').lower()
+        if self.context_cache_mode not in ('off', 'system', 'cached'):
+            raise ValueError("GEMINI_CONTEXT_CACHE must be 'off', 'system' or 'cached'")
+        self._instructions = self._evaluation_instructions()
+        self.context_cache: ContextCache | None = None
+        if self.context_cache_mode == 'cached' and not (self.recorder and self.recorder.replaying):
+            self.context_cache = get_context_cache(
+                self.client, self._instructions, int(os.getenv('GEMINI_CONTEXT_CACHE_TTL_SECONDS', '3600'))
+            )
+        self._generation_config_key = (
+            self._generation_config.model_dump_json(exclude_none=True) if self._generation_config else ''
+        )
+        if self.context_cache_mode != 'off':
+            # Cache names change on every re-creation, so recordings key on the instructions instead
+            self._generation_config_key += f"|instructions:{self._instructions}"
+
+        # Description reduction before prompting (0 disables truncation)
+        self._description_token_budget = max(0, int(os.getenv('GEMINI_DESCRIPTION_TOKEN_BUDGET', '512')))
+        self.description_chars_original = 0
+        self.description_chars_reduced = 0
+        self.descriptions_truncated = 0
+
+    def _response_format(self) -> str:
+        if self.response_mode == 'json':
+            return (
+                'Respond with a JSON object with an integer "score" (1-5), '
+                'a brief "reason" of at most 150 characters in English '
+                'and your "confidence" in the score between 0 and 1.'
+            )
+        return """Provide your response in this exact format:
+SCORE: [1-5]
+REASON: [brief 150 characters explanation in English]"""
+
+    def _evaluation_instructions(self, product_details: str | None = None) -> str:
+        """Rubric and response format.
+
+        Without ``product_details`` this is the block shared by every request
+        when GEMINI_CONTEXT_CACHE is on; with them it is the self-contained
+        prompt body used when the cache is off.
+        """
+        subject = 'this product description' if product_details else 'the product description in each request'
+        product_section = f"\n{product_details}\n" if product_details else ''
+        return f"""Evaluate the quality of {subject} on a scale of 1-5, where:
 1 = Excellent quality (clear, detailed, engaging, error-free)
 2 = Good quality (mostly clear, some details, minor issues)
 3 = Average quality (basic information, some clarity issues)
 4 = Poor quality (unclear, missing key info, noticeable errors)
 5 = Very poor quality (confusing, incomplete, major errors)
-
-Product Name: {product.name or 'N/A'}
-Product Description: {product.description or 'No description available'}
-
-Provide your response in this exact format:
-SCORE: [1-5]
-REASON: [brief 150 characters explanation in English]
+{product_section}
+{self._response_format()}
 
 Consider:
 - Clarity and comprehensibility
 - Completeness of information
 - Grammar and spelling
 - Engagement and appeal
-- Accuracy and helpfulness
+- Accuracy and helpfulness"""
 
-Response:"""
+    def _create_evaluation_prompt(self, product: Product) -> str:
+        """Create prompt for evaluating product description quality."""
+        with tracer.span('preprocess', product.product_id) as span:
+            description = preprocess_description(product.description, self._description_token_budget)
+            if span is not None:
+                span.update(original_chars=description.original_chars, reduced_chars=description.reduced_chars)
+        self.description_chars_original += description.original_chars
+        self.description_chars_reduced += description.reduced_chars
+        self.descriptions_truncated += int(description.truncated)
 
-    def _generate_content(self, prompt: str):
-        """Call Gemini synchronously to enable delegation to thread pool."""
-        return self.client.models.generate_content(
-            model=self.model,
-            contents=prompt
+        product_details = f"""Product Name: {product.name or 'N/A'}
+Product Description: {description.text or 'No description available'}"""
+        if self.context_cache_mode != 'off':
+            return f"{product_details}\n\nResponse:"
+        return f"\n{self._evaluation_instructions(product_details)}\n\nResponse:"
+
+    def _build_generation_config(self) -> types.GenerateContentConfig | None:
+        """Build the generation config for JSON mode; text mode uses model defaults."""
+        if self.response_mode != 'json':
+            return None
+
+        max_output_tokens = int(os.getenv('GEMINI_MAX_OUTPUT_TOKENS', '128'))
+        config = types.GenerateContentConfig(
+            response_mime_type='application/json',
+            response_schema=EVALUATION_RESPONSE_SCHEMA,
+            max_output_tokens=max_output_tokens,
         )
+        # Thinking tokens count against max_output_tokens: with a small cap, a thinking
+        # model would spend it all thinking and return no text, so thinking is off by default
+        thinking_budget = os.getenv('GEMINI_THINKING_BUDGET')
+        if not thinking_budget and max_output_tokens <= _THINKING_OFF_BELOW_OUTPUT_TOKENS:
+            thinking_budget = '0'
+        if thinking_budget:
+            config.thinking_config = types.ThinkingConfig(thinking_budget=int(thinking_budget))
+        return config
+
+    def _config_for(self, model: str) -> types.GenerateContentConfig | None:
+        """Generation config for one call, carrying the instructions by cache reference or inline."""
+        if self.context_cache_mode == 'off':
+            return self._generation_config
+        config = self._generation_config.model_copy() if self._generation_config else types.GenerateContentConfig()
+        cache_name = self.context_cache.name_for(model) if self.context_cache else None
+        if cache_name:
+            config.cached_content = cache_name
+        else:
+            config.system_instruction = self._instructions
+        return config
+
+    def _parse_response(self, raw_response: str, strict: bool = False) -> ParsedEvaluation:
+        """Parse a response according to the configured response mode.
+
+        JSON mode is always strict; text mode is strict only when asked, so
+        cheaper cascade tiers escalate on garbage instead of guessing a score.
+        """
+        if self.response_mode == 'json':
+            return parse_json_response(raw_response)
+        return parse_text_response(raw_response, strict=strict)
+
+    def _should_escalate(self, parsed: ParsedEvaluation) -> bool:
+        """Borderline scores and low-confidence answers go to the next tier."""
+        if parsed.score in self._escalate_scores:
+            return True
+        return parsed.confidence is not None and parsed.confidence < self._escalate_min_confidence
+
+    def _generate_content(self, prompt: str, model: str | None = None):
+        """Call Gemini synchronously to enable delegation to thread pool."""
+        model = model or self.model
+        request_key = None
+        if self.recorder:
+            request_key = UpstreamRecorder.request_key(model, self._generation_config_key, prompt)
+            if self.recorder.replaying:
+                _, payload = self.recorder.load('gemini', request_key)
+                return types.GenerateContentResponse.model_validate_json(payload)
+
+        for attempt in range(2):
+            config = self._config_for(model)
+            try:
+                with UPSTREAM_IN_FLIGHT.labels('gemini').track_inprogress(), GEMINI_REQUEST_SECONDS.labels(model).time():
+                    response = self.client.models.generate_content(
+                        model=model,
+                        contents=prompt,
+                        config=config
+                    )
+                break
+            except Exception as e:
+                self.budget.charge(requests=1)
+                stale_cache = (
+                    config is not None and config.cached_content and isinstance(e, errors.ClientError)
+                    and e.code in (403, 404)
+                )
+                if not stale_cache:
+                    raise
+                # The cache expired or was deleted server-side: re-create it and retry once
+                logger.warning(f"Context cache {config.cached_content} rejected ({e.code}), re-creating it")
+                self.context_cache.invalidate(model, config.cached_content)
+                if attempt:
+                    raise
+        input_tokens, output_tokens = record_gemini_usage(model, response)
+        self.budget.charge(1, input_tokens, output_tokens)
+        if request_key:
+            self.recorder.store('gemini', request_key, response.model_dump_json(
+                exclude_none=True, exclude={'sdk_http_response'}
+            ).encode('utf-8'))
+        return response
+
+    @staticmethod
+    def _is_retryable(exc: BaseException) -> bool:
+        """Retry deadlines, throttling and server errors; other client errors are final."""
+        if isinstance(exc, errors.ClientError):
+            return exc.code == 429
+        return isinstance(exc, (asyncio.TimeoutError, errors.ServerError, ConnectionError))
+
+    async def _wait_for_circuit(self) -> None:
+        """Pause while the Gemini breaker is open instead of producing failed rows."""
+        paused = 0.0
+        while True:
+            try:
+                self.circuit_breaker.before_call()
+                return
+            except CircuitOpenError as e:
+                if paused >= self._max_breaker_pause:
+                    raise
+                delay = max(0.5, e.retry_after)
+                await asyncio.sleep(delay)
+                paused += delay
+
+    async def _call_with_deadline(self, prompt: str, model: str):
+        """Run one (possibly hedged) Gemini call bounded by the request timeout."""
+        loop = asyncio.get_running_loop()
+
+        def run():
+            return loop.run_in_executor(self._executor, self._generate_content, prompt, model)
+
+        await self._wait_for_circuit()
+        started = time.perf_counter()
+        try:
+            response = await asyncio.wait_for(self.hedging.call_async(run), timeout=self._request_timeout)
+        except Exception as e:
+            UPSTREAM_ERRORS.labels('gemini').inc()
+            self.circuit_breaker.record(not self._is_retryable(e), time.perf_counter() - started)
+            raise
+        except BaseException:
+            # Cancellation says nothing about Gemini's health, but a half-open slot must not leak
+            self.circuit_breaker.release()
+            raise
+        self.circuit_breaker.record(True, time.perf_counter() - started)
+        return response
+
+    async def _query_model(self, tier: int, prompt: str) -> str:
+        """Run one Gemini call for a tier and return the stripped response text."""
+        stats = self.tier_stats[tier]
+        async with self._semaphore:
+            for attempt in range(1, self._max_attempts + 1):
+                if self.control:
+                    await self.control.checkpoint_async()
+                await self.budget.wait(self.control.raise_if_cancelled if self.control else None)
+                started = time.perf_counter()
+                try:
+                    response = await self._call_with_deadline(prompt, self.models[tier])
+                    break
+                except Exception as e:
+                    if attempt == self._max_attempts or not self._is_retryable(e):
+                        raise
+                    UPSTREAM_RETRIES.labels('gemini').inc()
+                    # Short jittered backoff: tail latency matters more than politeness here
+                    await asyncio.sleep(random.uniform(0, 0.25 * 2 ** (attempt - 1)))
+                finally:
+                    stats.calls += 1
+                    stats.latencies.append(time.perf_counter() - started)
+
+        if hasattr(response, 'text') and response.text is not None:
+            return response.text.strip()
+        return str(response)
 
     async def _evaluate_single_product(self, product: Product) -> EvaluationResult:
-        """Evaluate a single product description."""
+        """Evaluate a single product description, escalating through the model tiers."""
         try:
             prompt = self._create_evaluation_prompt(product)
+            last_tier = len(self.models) - 1
 
-            # Run in thread pool since google-genai is synchronous
-            async with self._semaphore:
-                loop = asyncio.get_running_loop()
-                response = await loop.run_in_executor(
-                    self._executor,
-                    self._generate_content,
-                    prompt
-                )
+            for tier, stats in enumerate(self.tier_stats):
+                is_last = tier == last_tier
+                # Cheaper tiers escalate on the first bad response instead of retrying
+                attempts = self._parse_retries + 1 if self.response_mode == 'json' and is_last else 1
+                parsed = None
+
+                for attempt in range(1, attempts + 1):
+                    try:
+                        with tracer.span('evaluate', product.product_id, model=stats.model, attempt=attempt):
+                            raw_response = await self._query_model(tier, prompt)
+                    except Exception as e:
+                        if is_last:
+                            raise
+                        logger.warning(f"Tier {stats.model} failed for product {product.product_id}: {e}",
+                                       extra={'product_id': product.product_id})
+                        break
 
-            # Extract score and reason from response
-            if hasattr(response, 'text'):
-                raw_response = response.text.strip()
-            else:
-                raw_response = str(response)
-            
-            # Parse structured response
-            score = None
-            reason = None
-            
-            lines = raw_response.split('\n')
-            for line in lines:
-                line = line.strip()
-                if line.startswith('SCORE:'):
                     try:
-                        score = int(line.split(':', 1)[1].strip())
-                    except (ValueError, IndexError):
-                        pass
-                elif line.startswith('REASON:'):
-                    reason = line.split(':', 1)[1].strip()
-            
-            # Fallback parsing if structured format not followed
-            if score is None:
-                # Try to find a number 1-5 in the response
-                import re
-                numbers = re.findall(r'\b([1-5])\b', raw_response)
-                if numbers:
-                    score = int(numbers[0])
-                else:
-                    score = 5  # Default to poor quality
-            
-            if reason is None:
-                reason = "Evaluation completed"  # Default reason
-            
-            if not (1 <= score <= 5):
-                score = 5
-                reason = "Invalid score received, defaulted to poor quality"
+                        with tracer.span('parse', product.product_id):
+                            parsed = self._parse_response(raw_response, strict=not is_last)
+                        break
+                    except ResponseParseError as e:
+                        logger.warning(f"Unparseable response from {stats.model} for product {product.product_id} "
+                                       f"(attempt {attempt}/{attempts}): {e}",
+                                       extra={'product_id': product.product_id})
+
+                if parsed is None:
+                    stats.failures += 1
+                    if is_last:
+                        return EvaluationResult(
+                            product_id=product.product_id,
+                            quality_score=0,
+                            evaluation_timestamp=datetime.now(timezone.utc),
+                            reason=f"Unparseable Gemini response after {attempts} attempts",
+                            raw_response=raw_response
+                        )
+                    stats.escalated += 1
+                    continue
+
+                # Near a budget cap, accept the cheaper tier's answer
+                if not is_last and self._should_escalate(parsed) and not self.budget.downscaled:
+                    stats.escalated += 1
+                    continue
+
+                stats.accepted += 1
+                break
 
             result = EvaluationResult(
                 product_id=product.product_id,
-                quality_score=score,
-                evaluation_timestamp=datetime.utcnow(),
-                reason=reason,
+                quality_score=parsed.score,
+                evaluation_timestamp=datetime.now(timezone.utc),
+                reason=parsed.reason,
                 raw_response=raw_response
             )
 
-            logger.info(f"Evaluated product {product.product_id} with score {score}",
-                       extra={'product_id': product.product_id})
+            logger.info(f"Evaluated product {product.product_id} with score {parsed.score} using {stats.model}",
+                       extra={'product_id': product.product_id, 'sampled': True})
             return result
 
         except Exception as e:
@@ -144,23 +455,59 @@ Response:"""
                 raw_response=str(e)
             )
 
+    def tier_report(self) -> List[Dict]:
+        """Per-tier call, escalation and latency statistics for the cascade."""
+        return [stats.report() for stats in self.tier_stats]
+
     async def evaluate_batch(self, products: List[Product]) -> List[EvaluationResult]:
-        """Evaluate a batch of products concurrently."""
+        """Evaluate a batch of products concurrently.
+
+        Once the job is cancelled no new Gemini calls start; the results that
+        already finished are returned and the unfinished products left out.
+        """
         total = len(products)
         if total == 0:
             return []
 
         logger.info(f"Starting evaluation of {total} products")
 
+        # Description counters are lifetime totals; the batch log reports this batch's share
+        chars_before = (self.description_chars_original, self.description_chars_reduced, self.descriptions_truncated)
+
+        # Semaphores bind to the running loop, and each evaluate_products call runs a new one
+        self._semaphore = asyncio.Semaphore(self._max_concurrency)
+
         results: List[EvaluationResult | None] = [None] * total
 
+        queue_depth = PIPELINE_QUEUE_DEPTH.labels('evaluate')
+        queue_depth.inc(total)
+
         async def evaluate_index(idx: int, item: Product) -> None:
-            results[idx] = await self._evaluate_single_product(item)
+            try:
+                results[idx] = await self._evaluate_single_product(item)
+            except JobCancelled:
+                # Left unset: the job stops at the next chunk boundary with the results that finished
+                pass
+            finally:
+                queue_depth.dec()
 
         tasks = [evaluate_index(idx, product) for idx, product in enumerate(products)]
         await asyncio.gather(*tasks)
 
-        logger.info(f"Completed evaluation of {total} products")
+        scores = [result.quality_score for result in results if result is not None]
+        if len(scores) < total:
+            logger.info(f"Job cancelled with {len(scores)} of {total} products evaluated")
+        logger.info(
+            f"Completed evaluation of {len(scores)} products: {scores.count(0)} failed, "
+            f"score distribution {[scores.count(score) for score in range(1, 6)]} "
+            f"(description chars {self.description_chars_original - chars_before[0]} -> "
+            f"{self.description_chars_reduced - chars_before[1]}, "
+            f"{self.descriptions_truncated - chars_before[2]} truncated)"
+        )
+        if len(self.models) > 1:
+            logger.info(f"Model cascade report: {self.tier_report()}")
+        if self.hedging.enabled:
+            logger.info(f"Gemini hedging report: {self.hedging.report()}")
         return [result for result in results if result is not None]
 
     def evaluate_products(self, products: List[Product]) -> List[EvaluationResult]:
@@ -0,0 +1,137 @@
+import re
+import zlib
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+import numpy as np
+
+_TOKEN_PATTERN = re.compile(r"\w+")
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+_SHINGLE_SIZE = 3
+
+
+def _choose_bands(num_perm: int, threshold: float) -> Tuple[int, int]:
+    """Pick the LSH band/row split whose S-curve threshold is closest to the target."""
+    best = (num_perm, 1)
+    best_distance = float('inf')
+    for rows in range(1, num_perm + 1):
+        if num_perm % rows:
+            continue
+        bands = num_perm // rows
+        distance = abs((1 / bands) ** (1 / rows) - threshold)
+        if distance < best_distance:
+            best, best_distance = (bands, rows), distance
+    return best
+
+
+class NearDuplicateIndex:
+    """MinHash/LSH index grouping near-duplicate product descriptions.
+
+    Only cluster representatives are inserted, so a lookup touches one bucket
+    per band instead of scanning previously seen products. At most
+    ``max_size`` representatives are kept; the least recently matched one is
+    evicted (and reported to ``on_evict``) when a new one would exceed it.
+    """
+
+    def __init__(
+        self,
+        threshold: float = 0.8,
+        num_perm: int = 64,
+        seed: int = 1,
+        max_size: int = 100_000,
+        on_evict: Optional[Callable[[str], None]] = None
+    ):
+        if not (0 < threshold <= 1):
+            raise ValueError("threshold must be in (0, 1]")
+        if num_perm < 1:
+            raise ValueError("num_perm must be positive")
+        if max_size < 1:
+            raise ValueError("max_size must be positive")
+
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self._bands, self._rows = _choose_bands(num_perm, threshold)
+
+        generator = np.random.default_rng(seed)
+        self._perm_a = generator.integers(1, int(_MERSENNE_PRIME), size=num_perm, dtype=np.uint64)
+        self._perm_b = generator.integers(0, int(_MERSENNE_PRIME), size=num_perm, dtype=np.uint64)
+
+        self._buckets: List[Dict[bytes, List[str]]] = [{} for _ in range(self._bands)]
+        self._signatures: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self.max_size = max_size
+        self.on_evict = on_evict
+        self.evicted = 0
+
+    def __len__(self) -> int:
+        return len(self._signatures)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._signatures
+
+    def _signature(self, text: str) -> np.ndarray:
+        """Compute the MinHash signature of a description's word shingles."""
+        tokens = _TOKEN_PATTERN.findall(text.lower())
+        if len(tokens) > _SHINGLE_SIZE:
+            shingles = {' '.join(tokens[i:i + _SHINGLE_SIZE]) for i in range(len(tokens) - _SHINGLE_SIZE + 1)}
+        else:
+            shingles = {' '.join(tokens)}
+
+        hashes = np.fromiter(
+            (zlib.crc32(shingle.encode('utf-8')) for shingle in shingles),
+            dtype=np.uint64,
+            count=len(shingles)
+        )
+        with np.errstate(over='ignore'):
+            permuted = (np.outer(self._perm_a, hashes) + self._perm_b[:, None]) % _MERSENNE_PRIME
+        return (permuted & _MAX_HASH).min(axis=1)
+
+    def _band_keys(self, signature: np.ndarray) -> List[bytes]:
+        return [
+            signature[band * self._rows:(band + 1) * self._rows].tobytes()
+            for band in range(self._bands)
+        ]
+
+    def find_or_add(self, key: str, text: str) -> Tuple[Optional[str], float]:
+        """Return the representative key and similarity for a near-duplicate.
+
+        When no representative is similar enough, the text is registered as a
+        new representative under ``key`` and ``(None, 1.0)`` is returned.
+        """
+        signature = self._signature(text)
+        band_keys = self._band_keys(signature)
+
+        candidates: Dict[str, None] = {}
+        for band, band_key in enumerate(band_keys):
+            for candidate in self._buckets[band].get(band_key, ()):
+                candidates[candidate] = None
+
+        best_key: Optional[str] = None
+        best_similarity = 0.0
+        if candidates:
+            keys = list(candidates)
+            matrix = np.stack([self._signatures[candidate] for candidate in keys])
+            similarities = (matrix == signature).mean(axis=1)
+            best = int(similarities.argmax())
+            best_key, best_similarity = keys[best], float(similarities[best])
+
+        if best_key is not None and best_similarity >= self.threshold:
+            self._signatures.move_to_end(best_key)
+            return best_key, best_similarity
+
+        self._signatures[key] = signature
+        for band, band_key in enumerate(band_keys):
+            self._buckets[band].setdefault(band_key, []).append(key)
+        if len(self._signatures) > self.max_size:
+            self._evict_oldest()
+        return None, 1.0
+
+    def _evict_oldest(self) -> None:
+        key, signature = self._signatures.popitem(last=False)
+        for band, band_key in enumerate(self._band_keys(signature)):
+            bucket = self._buckets[band][band_key]
+            bucket.remove(key)
+            if not bucket:
+                del self._buckets[band][band_key]
+        self.evicted += 1
+        if self.on_evict:
+            self.on_evict(key)
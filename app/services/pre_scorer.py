@@ -0,0 +1,126 @@
+import os
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+import numpy as np
+import pandas as pd
+from app.models.product import Product
+from app.models.evaluation_result import EvaluationResult
+from app.utils.logger import get_logger
+from app.utils.text_preprocessing import HTML_TAG_PATTERN
+
+logger = get_logger(__name__)
+
+_TOKEN_PATTERN = r"\w+"
+_DIGIT_PATTERN = r"\d"
+
+
+@dataclass
+class PreScorerThresholds:
+    """Thresholds below which a description is scored without calling the LLM."""
+    min_chars: int = 40
+    min_tokens: int = 8
+    thin_tokens: int = 15
+    max_name_overlap: float = 0.9
+    max_html_ratio: float = 0.8
+    # Short descriptions without numbers can still be legitimate 3s, so this rule is opt-in
+    thin_rule_enabled: bool = False
+
+    @classmethod
+    def from_env(cls) -> "PreScorerThresholds":
+        return cls(
+            min_chars=int(os.getenv('PRE_SCORER_MIN_CHARS', str(cls.min_chars))),
+            min_tokens=int(os.getenv('PRE_SCORER_MIN_TOKENS', str(cls.min_tokens))),
+            thin_tokens=int(os.getenv('PRE_SCORER_THIN_TOKENS', str(cls.thin_tokens))),
+            max_name_overlap=float(os.getenv('PRE_SCORER_MAX_NAME_OVERLAP', str(cls.max_name_overlap))),
+            max_html_ratio=float(os.getenv('PRE_SCORER_MAX_HTML_RATIO', str(cls.max_html_ratio))),
+            thin_rule_enabled=os.getenv('PRE_SCORER_THIN_RULE_ENABLED', 'false').lower() == 'true',
+        )
+
+
+# Rule name -> (score, reason), checked in this order
+_RULES = {
+    'html_boilerplate': (5, "Description is mostly HTML markup with almost no visible text"),
+    'too_short': (5, "Description is too short to be informative"),
+    'too_few_tokens': (5, "Description has too few words to be informative"),
+    'name_only': (5, "Description only repeats the product name"),
+    'thin_without_specs': (4, "Description is thin and has no measurable specifications"),
+}
+
+
+class PreScorer:
+    """Deterministic heuristic scorer for products that do not need an LLM."""
+
+    def __init__(self, thresholds: PreScorerThresholds | None = None):
+        self.thresholds = thresholds or PreScorerThresholds.from_env()
+        self.products_seen = 0
+        self.calls_avoided: Dict[str, int] = {rule: 0 for rule in _RULES}
+
+    def _classify(self, products: List[Product]) -> np.ndarray:
+        """Return the matching rule name per product, or an empty string."""
+        thresholds = self.thresholds
+        descriptions = pd.Series([product.description or '' for product in products], dtype=object)
+        names = pd.Series([product.name or '' for product in products], dtype=object)
+
+        visible = descriptions.str.replace(HTML_TAG_PATTERN, ' ', regex=True).str.split().str.join(' ')
+        raw_chars = descriptions.str.len().to_numpy()
+        visible_chars = visible.str.len().to_numpy()
+        html_ratio = 1 - visible_chars / np.maximum(raw_chars, 1)
+
+        tokens = visible.str.lower().str.findall(_TOKEN_PATTERN)
+        token_counts = tokens.str.len().to_numpy()
+        name_tokens = names.str.lower().str.findall(_TOKEN_PATTERN)
+        name_overlap = np.fromiter(
+            (
+                len(set(desc) & set(name)) / len(set(desc)) if desc else 0.0
+                for desc, name in zip(tokens, name_tokens)
+            ),
+            dtype=float,
+            count=len(products)
+        )
+        has_specs = visible.str.contains(_DIGIT_PATTERN, regex=True).to_numpy()
+
+        conditions = [
+            (html_ratio >= thresholds.max_html_ratio) & (token_counts < thresholds.thin_tokens),
+            visible_chars < thresholds.min_chars,
+            token_counts < thresholds.min_tokens,
+            name_overlap >= thresholds.max_name_overlap,
+            (token_counts < thresholds.thin_tokens) & ~has_specs & thresholds.thin_rule_enabled,
+        ]
+        return np.select(conditions, list(_RULES), default='')
+
+    def score(self, products: List[Product]) -> List[Optional[EvaluationResult]]:
+        """Score products that match a rule; None means the product needs the LLM."""
+        if not products:
+            return []
+
+        rules = self._classify(products)
+        self.products_seen += len(products)
+
+        results: List[Optional[EvaluationResult]] = []
+        for product, rule in zip(products, rules):
+            if not rule:
+                results.append(None)
+                continue
+
+            self.calls_avoided[rule] += 1
+            score, reason = _RULES[rule]
+            results.append(EvaluationResult(
+                product_id=product.product_id,
+                quality_score=score,
+                evaluation_timestamp=datetime.now(timezone.utc),
+                reason=reason,
+                raw_response=f"PRE_SCORER:{rule}"
+            ))
+
+        return results
+
+    def report(self) -> Dict:
+        """Summarize how many LLM calls were avoided and by which rule."""
+        avoided = sum(self.calls_avoided.values())
+        return {
+            'products_seen': self.products_seen,
+            'llm_calls_avoided': avoided,
+            'avoided_ratio': round(avoided / self.products_seen, 4) if self.products_seen else 0.0,
+            'by_rule': dict(self.calls_avoided),
+        }
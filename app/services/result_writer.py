@@ -0,0 +1,198 @@
+import abc
+import csv
+import os
+import queue
+import threading
+import time
+from typing import List, Optional
+from app.models.evaluation_batch import EvaluationBatch
+from app.utils.csv_handler import RESULT_CSV_HEADER, evaluation_rows
+from app.utils.logger import get_logger
+from app.utils.metrics import PIPELINE_QUEUE_DEPTH, record_stage
+from app.utils.tracing import tracer
+
+logger = get_logger(__name__)
+
+
+class ResultSink(abc.ABC):
+    """Destination for coalesced result batches. ``required`` sinks abort the run on failure."""
+
+    name = 'sink'
+    required = False
+
+    @abc.abstractmethod
+    def write(self, batch: EvaluationBatch) -> None:
+        """Persist one coalesced batch."""
+
+    def close(self) -> None:
+        pass
+
+
+class CsvSink(ResultSink):
+    """Results CSV kept open for the whole run and flushed after every write."""
+
+    name = 'csv'
+    required = True
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, 'w', newline='', encoding='utf-8')
+        self._writer = csv.writer(self._file, quoting=csv.QUOTE_ALL)
+        self._writer.writerow(RESULT_CSV_HEADER)
+        self._file.flush()
+
+    def write(self, batch: EvaluationBatch) -> None:
+        self._writer.writerows(evaluation_rows(batch))
+        self._file.flush()
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class ResultsIndexSink(ResultSink):
+    name = 'results_index'
+
+    def __init__(self, results_index, job_id: Optional[str] = None, account: Optional[str] = None):
+        self.results_index = results_index
+        self.job_id = job_id
+        self.account = account
+
+    def write(self, batch: EvaluationBatch) -> None:
+        self.results_index.add_batch(batch, self.job_id, self.account)
+
+
+class DatabaseSink(ResultSink):
+    """Appends each coalesced batch through one DatabaseService (and its connection pool)."""
+
+    name = 'database'
+
+    def __init__(self, db_service, account: str):
+        self.db_service = db_service
+        self.account = account
+
+    def write(self, batch: EvaluationBatch) -> None:
+        self.db_service.store_evaluation_results(batch.products(), batch, account=self.account)
+
+
+class ResultWriter:
+    """Background writer stage between the pipeline and its result sinks.
+
+    ``submit`` hands a batch to a bounded queue and returns; a worker thread
+    coalesces queued batches and writes them to every sink once
+    ``flush_rows`` rows are pending or the oldest pending batch is
+    ``flush_seconds`` old. A full queue blocks ``submit`` (backpressure)
+    instead of buffering without bound. Failures of optional sinks are
+    logged; a failure of a required sink, or of the worker itself, is
+    re-raised from the next ``submit`` or from ``close``. After a failure
+    the worker keeps draining the queue so neither of them blocks.
+    """
+
+    def __init__(
+        self,
+        sinks: List[ResultSink],
+        max_queue: Optional[int] = None,
+        flush_rows: Optional[int] = None,
+        flush_seconds: Optional[float] = None
+    ):
+        self.sinks = sinks
+        self.flush_rows = flush_rows or int(os.getenv('RESULT_WRITER_FLUSH_ROWS', '5000'))
+        self.flush_seconds = flush_seconds or float(os.getenv('RESULT_WRITER_FLUSH_SECONDS', '2'))
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue or int(os.getenv('RESULT_WRITER_QUEUE', '8')))
+        self._error: Optional[BaseException] = None
+        self._closed = False
+
+        self.rows_written = 0
+        self.errors_written = 0
+        self.flushes = 0
+        self._worker = threading.Thread(target=self._run, name='result-writer', daemon=True)
+        self._worker.start()
+
+    def __enter__(self) -> "ResultWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        # Let the pipeline's own exception win over a writer error
+        self.close(raise_errors=exc_type is None)
+
+    def _raise_if_failed(self) -> None:
+        if self._error is not None:
+            raise RuntimeError(f"Result writer failed: {self._error}") from self._error
+
+    def submit(self, batch: EvaluationBatch) -> None:
+        """Queue a batch for writing, blocking while the queue is full."""
+        self._raise_if_failed()
+        if batch:
+            PIPELINE_QUEUE_DEPTH.labels('write').inc(len(batch))
+            self._queue.put(batch)
+
+    def _flush(self, pending: List[EvaluationBatch]) -> None:
+        batch = pending[0] if len(pending) == 1 else EvaluationBatch.concat(pending)
+        pending.clear()
+        if self._error is not None:
+            return
+
+        started = time.perf_counter()
+        with tracer.span('write', products=len(batch)):
+            for sink in self.sinks:
+                try:
+                    sink.write(batch)
+                except Exception as e:
+                    if sink.required:
+                        logger.error(f"Result sink {sink.name} failed: {e}")
+                        self._error = e
+                        return
+                    logger.warning(f"Result sink {sink.name} failed: {e}")
+        record_stage('write', len(batch), time.perf_counter() - started)
+        self.rows_written += len(batch)
+        self.errors_written += batch.scores.count(0)
+        self.flushes += 1
+
+    def _run(self) -> None:
+        pending: List[EvaluationBatch] = []
+        pending_rows = 0
+        oldest_pending = 0.0
+        while True:
+            timeout = max(0.0, self.flush_seconds - (time.monotonic() - oldest_pending)) if pending else None
+            try:
+                batch = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                batch = False
+
+            try:
+                if batch is None:
+                    if pending:
+                        self._flush(pending)
+                    return
+                if batch:
+                    PIPELINE_QUEUE_DEPTH.labels('write').dec(len(batch))
+                    if not pending:
+                        oldest_pending = time.monotonic()
+                    pending.append(batch)
+                    pending_rows += len(batch)
+                if pending and (pending_rows >= self.flush_rows or time.monotonic() - oldest_pending >= self.flush_seconds):
+                    self._flush(pending)
+                    pending_rows = 0
+            except Exception as e:
+                logger.error(f"Result writer failed: {e}")
+                if self._error is None:
+                    self._error = e
+                pending.clear()
+                pending_rows = 0
+                if batch is None:
+                    return
+
+    def close(self, raise_errors: bool = True) -> None:
+        """Flush what is queued, close every sink and re-raise a required sink's failure."""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._worker.join()
+        for sink in self.sinks:
+            try:
+                sink.close()
+            except Exception as e:
+                logger.warning(f"Closing result sink {sink.name} failed: {e}")
+        logger.info(f"Result writer stored {self.rows_written} rows in {self.flushes} flushes")
+        if raise_errors:
+            self._raise_if_failed()
@@ -0,0 +1,351 @@
+import os
+import sqlite3
+import threading
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Dict, Iterator, List, Optional, Tuple
+from app.models.evaluation_batch import EvaluationBatch
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+_US_PER_DAY = 86_400_000_000
+_SQLITE_MAX_PARAMS = 900
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+GROUP_BY_COLUMNS = ('category', 'brand', 'category_id', 'brand_id', 'day')
+MAX_PAGE_SIZE = 1000
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    account TEXT NOT NULL,
+    product_id TEXT NOT NULL,
+    job_id TEXT,
+    quality_score INTEGER NOT NULL,
+    evaluated_at INTEGER NOT NULL,
+    category TEXT,
+    brand TEXT,
+    category_id TEXT,
+    brand_id TEXT,
+    reason TEXT,
+    PRIMARY KEY (account, product_id)
+);
+CREATE INDEX IF NOT EXISTS idx_results_brand ON results (account, brand, product_id, quality_score);
+CREATE INDEX IF NOT EXISTS idx_results_category ON results (account, category, product_id, quality_score);
+CREATE INDEX IF NOT EXISTS idx_results_score ON results (account, quality_score, product_id);
+CREATE INDEX IF NOT EXISTS idx_results_evaluated_at ON results (account, evaluated_at);
+CREATE INDEX IF NOT EXISTS idx_results_job ON results (job_id, product_id);
+
+CREATE TABLE IF NOT EXISTS score_rollup (
+    account TEXT NOT NULL,
+    day INTEGER NOT NULL,
+    category TEXT NOT NULL,
+    brand TEXT NOT NULL,
+    category_id TEXT NOT NULL,
+    brand_id TEXT NOT NULL,
+    quality_score INTEGER NOT NULL,
+    products INTEGER NOT NULL,
+    PRIMARY KEY (account, day, category, brand, category_id, brand_id, quality_score)
+) WITHOUT ROWID;
+"""
+
+_ROLLUP_KEY = "account, day, category, brand, category_id, brand_id, quality_score"
+
+_REBUILD_ROLLUP = f"""
+INSERT INTO score_rollup ({_ROLLUP_KEY}, products)
+SELECT account, evaluated_at / {_US_PER_DAY}, COALESCE(category, ''), COALESCE(brand, ''),
+       COALESCE(category_id, ''), COALESCE(brand_id, ''), quality_score, COUNT(*)
+FROM results GROUP BY 1, 2, 3, 4, 5, 6, 7
+"""
+
+# Results indexes of the layout keyed by product_id alone; they keep their names when the table is renamed
+_UNSCOPED_INDEXES = (
+    'idx_results_brand', 'idx_results_category', 'idx_results_score', 'idx_results_evaluated_at', 'idx_results_job'
+)
+
+
+def _to_us(value: datetime) -> int:
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    delta = value - _EPOCH
+    return (delta.days * 86400 + delta.seconds) * 1_000_000 + delta.microseconds
+
+
+def _from_us(value: int) -> str:
+    return datetime.fromtimestamp(value / 1_000_000, timezone.utc).isoformat()
+
+
+class ResultsIndex:
+    """Embedded SQLite index of the latest evaluation per (account, product).
+
+    The pipeline upserts each batch as it completes. ``query`` serves
+    filtered lookups with keyset pagination over indexed columns.
+    ``summary`` reads a per-day (category, brand, ids, score) rollup
+    maintained on write, so grouped score distributions never scan the
+    results table. Every read is scoped to one VTEX account; ``account=None``
+    means ``default_account`` (VTEX_ACCOUNT_NAME).
+    """
+
+    def __init__(self, path: str, default_account: Optional[str] = None):
+        self.path = path
+        self.default_account = default_account if default_account is not None else os.getenv('VTEX_ACCOUNT_NAME', '')
+        self._write_lock = threading.Lock()
+        self._local = threading.local()
+        self._writer = self._connect()
+        self._migrate()
+        logger.info(f"Results index at {path}")
+
+    def _columns(self, table: str) -> List[str]:
+        return [row[1] for row in self._writer.execute(f"PRAGMA table_info({table})")]
+
+    def _migrate(self) -> None:
+        """Create the schema, moving an index written by an older layout onto it.
+
+        Rows from before accounts were tracked are assigned to the default
+        account, and an outdated rollup is rebuilt from the results table.
+        """
+        results_columns = self._columns('results')
+        if results_columns and 'account' not in results_columns:
+            for index in _UNSCOPED_INDEXES:
+                self._writer.execute(f"DROP INDEX IF EXISTS {index}")
+            self._writer.execute("ALTER TABLE results RENAME TO results_unscoped")
+        rollup_columns = self._columns('score_rollup')
+        rebuild_rollup = bool(rollup_columns) and 'account' not in rollup_columns
+        if rebuild_rollup:
+            self._writer.execute("DROP TABLE score_rollup")
+        self._writer.executescript(_SCHEMA)
+
+        # Also finishes a copy that was interrupted after the rename
+        if self._columns('results_unscoped'):
+            with self._writer:
+                copied = self._writer.execute(
+                    "INSERT OR IGNORE INTO results (account, product_id, job_id, quality_score, evaluated_at, "
+                    "category, brand, category_id, brand_id, reason) "
+                    "SELECT ?, product_id, job_id, quality_score, evaluated_at, category, brand, category_id, "
+                    "brand_id, reason FROM results_unscoped",
+                    (self.default_account,)
+                ).rowcount
+                self._writer.execute("DROP TABLE results_unscoped")
+            logger.info(f"Moved {copied} results index rows to account '{self.default_account}'")
+            rebuild_rollup = True
+        if rebuild_rollup:
+            with self._writer:
+                self._writer.execute("DELETE FROM score_rollup")
+                self._writer.execute(_REBUILD_ROLLUP)
+            logger.info("Rebuilt the results index score rollup for the current layout")
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        return conn
+
+    def _reader(self) -> sqlite3.Connection:
+        """Per-thread read connection; WAL lets reads run alongside the writer."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._connect()
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+        return conn
+
+    def _existing_rows(self, account: str, product_ids: List[str]) -> Dict[str, Tuple]:
+        """Current rollup key of each already indexed product of ``account``."""
+        existing = {}
+        unique_ids = list(dict.fromkeys(product_ids))
+        for start in range(0, len(unique_ids), _SQLITE_MAX_PARAMS):
+            chunk = unique_ids[start:start + _SQLITE_MAX_PARAMS]
+            placeholders = ','.join('?' * len(chunk))
+            for product_id, evaluated_at, category, brand, category_id, brand_id, score in self._writer.execute(
+                f"SELECT product_id, evaluated_at, category, brand, category_id, brand_id, quality_score "
+                f"FROM results WHERE account = ? AND product_id IN ({placeholders})", (account, *chunk)
+            ):
+                existing[product_id] = (
+                    account, evaluated_at // _US_PER_DAY, category or '', brand or '', category_id or '',
+                    brand_id or '', score
+                )
+        return existing
+
+    def add_batch(self, batch: EvaluationBatch, job_id: Optional[str] = None, account: Optional[str] = None) -> None:
+        """Upsert a batch's rows and move their rollup counts in one transaction."""
+        if not batch:
+            return
+        account = account or self.default_account
+        rows = list(zip(
+            [account] * len(batch), batch.product_ids, [job_id] * len(batch), batch.scores, batch.timestamps_us,
+            batch.categories, batch.brands, batch.category_ids, batch.brand_ids, batch.reasons
+        ))
+
+        with self._write_lock, self._writer:
+            current = self._existing_rows(account, batch.product_ids)
+            rollup: Counter = Counter()
+            for _, product_id, _, score, evaluated_at, category, brand, category_id, brand_id, _ in rows:
+                previous = current.get(product_id)
+                if previous is not None:
+                    rollup[previous] -= 1
+                key = (
+                    account, evaluated_at // _US_PER_DAY, category or '', brand or '', category_id or '',
+                    brand_id or '', score
+                )
+                rollup[key] += 1
+                current[product_id] = key
+
+            self._writer.executemany(
+                "INSERT INTO results (account, product_id, job_id, quality_score, evaluated_at, category, brand, "
+                "category_id, brand_id, reason) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (account, product_id) DO UPDATE SET job_id = excluded.job_id, "
+                "quality_score = excluded.quality_score, evaluated_at = excluded.evaluated_at, "
+                "category = excluded.category, brand = excluded.brand, category_id = excluded.category_id, "
+                "brand_id = excluded.brand_id, reason = excluded.reason",
+                rows
+            )
+            self._writer.executemany(
+                f"INSERT INTO score_rollup ({_ROLLUP_KEY}, products) VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+                f"ON CONFLICT ({_ROLLUP_KEY}) DO UPDATE SET products = products + excluded.products",
+                [(*key, delta) for key, delta in rollup.items() if delta]
+            )
+            self._writer.execute("DELETE FROM score_rollup WHERE products <= 0")
+
+    def query(
+        self,
+        *,
+        account: Optional[str] = None,
+        category: Optional[str] = None,
+        brand: Optional[str] = None,
+        category_id: Optional[str] = None,
+        brand_id: Optional[str] = None,
+        job_id: Optional[str] = None,
+        min_score: Optional[int] = None,
+        max_score: Optional[int] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        after: Optional[str] = None,
+        limit: int = 100
+    ) -> Dict:
+        """Filtered results of one account ordered by product_id; pass ``next_cursor`` back as ``after``."""
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+        clauses, params = ["account = ?"], [account or self.default_account]
+        for column, value in (('category', category), ('brand', brand), ('category_id', category_id),
+                              ('brand_id', brand_id), ('job_id', job_id)):
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        if min_score is not None:
+            clauses.append("quality_score >= ?")
+            params.append(min_score)
+        if max_score is not None:
+            clauses.append("quality_score <= ?")
+            params.append(max_score)
+        if since is not None:
+            clauses.append("evaluated_at >= ?")
+            params.append(_to_us(since))
+        if until is not None:
+            clauses.append("evaluated_at < ?")
+            params.append(_to_us(until))
+        if after is not None:
+            clauses.append("product_id > ?")
+            params.append(after)
+
+        rows = self._reader().execute(
+            f"SELECT account, product_id, job_id, quality_score, evaluated_at, category, brand, category_id, brand_id, "
+            f"reason FROM results WHERE {' AND '.join(clauses)} ORDER BY product_id LIMIT ?",
+            (*params, limit + 1)
+        ).fetchall()
+
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        return {
+            'results': [
+                {**dict(row), 'evaluated_at': _from_us(row['evaluated_at'])}
+                for row in rows
+            ],
+            'next_cursor': rows[-1]['product_id'] if has_more else None,
+        }
+
+    def summary(
+        self,
+        group_by: str = 'category',
+        *,
+        account: Optional[str] = None,
+        category: Optional[str] = None,
+        brand: Optional[str] = None,
+        category_id: Optional[str] = None,
+        brand_id: Optional[str] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None
+    ) -> Dict:
+        """Grouped product counts, average score and score distribution of one account (day-granular time filters)."""
+        if group_by not in GROUP_BY_COLUMNS:
+            raise ValueError(f"group_by must be one of {', '.join(GROUP_BY_COLUMNS)}")
+
+        account = account or self.default_account
+        clauses, params = ["account = ?"], [account]
+        for column, value in (('category', category), ('brand', brand),
+                              ('category_id', category_id), ('brand_id', brand_id)):
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        if since is not None:
+            clauses.append("day >= ?")
+            params.append(_to_us(since) // _US_PER_DAY)
+        if until is not None:
+            clauses.append("day <= ?")
+            params.append(_to_us(until) // _US_PER_DAY)
+
+        groups: Dict = {}
+        for key, score, products in self._reader().execute(
+            f"SELECT {group_by}, quality_score, SUM(products) FROM score_rollup WHERE {' AND '.join(clauses)} "
+            f"GROUP BY {group_by}, quality_score", params
+        ):
+            if group_by == 'day':
+                key = datetime.fromtimestamp(key * 86400, timezone.utc).date().isoformat()
+            groups.setdefault(key or None, Counter())[score] += products
+
+        summary = []
+        for key, distribution in groups.items():
+            total = sum(distribution.values())
+            scored = total - distribution.get(0, 0)
+            summary.append({
+                group_by: key,
+                'products': total,
+                # Score 0 marks failed evaluations and is left out of the average
+                'average_score': round(sum(s * n for s, n in distribution.items()) / scored, 3) if scored else None,
+                'distribution': {str(score): distribution.get(score, 0) for score in range(6)},
+            })
+        summary.sort(key=lambda item: item['products'], reverse=True)
+        return {'account': account, 'group_by': group_by, 'groups': summary}
+
+    def iter_categories(
+        self,
+        account: Optional[str] = None,
+        chunk_rows: int = 50000
+    ) -> Iterator[List[Tuple[str, Optional[str]]]]:
+        """Stream (product_id, category) pairs of every product indexed for an account in chunks."""
+        cursor = self._connect().execute(
+            "SELECT product_id, category FROM results WHERE account = ?", (account or self.default_account,)
+        )
+        try:
+            while rows := cursor.fetchmany(chunk_rows):
+                yield rows
+        finally:
+            cursor.connection.close()
+
+    def close(self) -> None:
+        with self._write_lock:
+            self._writer.close()
+
+
+_index: Optional[ResultsIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_results_index() -> Optional[ResultsIndex]:
+    """Return the process-wide results index, or None when RESULTS_INDEX_PATH is unset."""
+    global _index
+    path = os.getenv('RESULTS_INDEX_PATH')
+    if not path:
+        return None
+    with _index_lock:
+        if _index is None:
+            _index = ResultsIndex(path)
+        return _index
@@ -1,27 +1,75 @@
+import json
 import os
+import re
+import time
 import threading
 import requests
-from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
-from typing import Optional, Dict, Any
+from requests.adapters import HTTPAdapter
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from tenacity import retry, stop_after_attempt, wait_exponential_jitter, retry_if_exception
+from typing import Optional, Dict, Any, Iterator, List, Tuple
 from app.models.product import Product
+from app.utils.circuit_breaker import CircuitOpenError, get_circuit_breaker
+from app.utils.hedging import HedgingPolicy
 from app.utils.logger import get_logger
+from app.utils.metrics import UPSTREAM_ERRORS, UPSTREAM_IN_FLIGHT, UPSTREAM_RETRIES, VTEX_REQUEST_SECONDS
+from app.utils.rate_limiter import get_rate_limiter, scope_env_name
+from app.utils.upstream_recorder import UpstreamRecorder, get_upstream_recorder
 
 logger = get_logger(__name__)
 
 
+def _is_retryable(exc: BaseException) -> bool:
+    """Retry network errors, throttling and server errors; other 4xx responses are final."""
+    if isinstance(exc, requests.HTTPError) and exc.response is not None:
+        return exc.response.status_code == 429 or exc.response.status_code >= 500
+    return isinstance(exc, requests.RequestException)
+
+
+def _count_retry(retry_state) -> None:
+    UPSTREAM_RETRIES.labels('vtex').inc()
+
+
+_ACCOUNT_NAME = re.compile(r'^[A-Za-z0-9][A-Za-z0-9-]*$')
+
+
+def resolve_account(account: str | None = None) -> Tuple[str, str, str]:
+    """(account, app key, app token) for a VTEX account; None means VTEX_ACCOUNT_NAME.
+
+    Credentials come from ``VTEX_<ACCOUNT>_APP_KEY``/``VTEX_<ACCOUNT>_APP_TOKEN``
+    (e.g. VTEX_MY_STORE_APP_KEY for my-store); the default account may also
+    use the unprefixed VTEX_APP_KEY/VTEX_APP_TOKEN.
+    """
+    default_account = os.getenv('VTEX_ACCOUNT_NAME')
+    account = account or default_account
+    if not account or not _ACCOUNT_NAME.match(account):
+        raise ValueError("VTEX credentials not configured")
+
+    prefix = scope_env_name('vtex', account)
+    app_key, app_token = os.getenv(f"{prefix}_APP_KEY"), os.getenv(f"{prefix}_APP_TOKEN")
+    if not (app_key and app_token) and account == default_account:
+        app_key, app_token = os.getenv('VTEX_APP_KEY'), os.getenv('VTEX_APP_TOKEN')
+    if not (app_key and app_token):
+        raise ValueError(f"VTEX credentials not configured for account {account}")
+    return account, app_key, app_token
+
+
 class VtexClient:
     """Client for interacting with VTEX Catalog API."""
 
-    def __init__(self):
-        self.app_key = os.getenv('VTEX_APP_KEY')
-        self.app_token = os.getenv('VTEX_APP_TOKEN')
-        self.account_name = os.getenv('VTEX_ACCOUNT_NAME')
+    def __init__(self, account: str | None = None):
+        self.account_name, self.app_key, self.app_token = resolve_account(account)
 
-        if not all([self.app_key, self.app_token, self.account_name]):
-            raise ValueError("VTEX credentials not configured")
-
-        self.base_url = f"https://{self.account_name}.vtexcommercestable.com.br"
+        # VTEX_BASE_URL (or VTEX_<ACCOUNT>_BASE_URL) points the client at a stand-in server (benchmarks, local testing)
+        self.base_url = (
+            os.getenv(f"{scope_env_name('vtex', self.account_name)}_BASE_URL")
+            or os.getenv('VTEX_BASE_URL')
+            or f"https://{self.account_name}.vtexcommercestable.com.br"
+        )
         self._thread_local: threading.local = threading.local()
+        # One connection pool per account, mounted on the thread-local session of every worker
+        self._adapter = HTTPAdapter(pool_maxsize=int(os.getenv('VTEX_POOL_SIZE', '32')))
         self._session_headers = {
             'X-VTEX-API-AppKey': self.app_key,
             'X-VTEX-API-AppToken': self.app_token,
@@ -29,28 +77,101 @@ class VtexClient:
             'Accept': 'application/json'
         }
 
+        # Per-call deadline (connect, read) and optional hedging of slow requests
+        self._timeout = (
+            float(os.getenv('VTEX_CONNECT_TIMEOUT_SECONDS', '3.05')),
+            float(os.getenv('VTEX_READ_TIMEOUT_SECONDS', '10'))
+        )
+        self.hedging = HedgingPolicy(
+            enabled=os.getenv('VTEX_HEDGING_ENABLED', 'false').lower() == 'true',
+            percentile=float(os.getenv('VTEX_HEDGE_PERCENTILE', '0.95')),
+            max_ratio=float(os.getenv('VTEX_HEDGE_MAX_RATIO', '0.05'))
+        )
+        self.circuit_breaker = get_circuit_breaker('vtex', self.account_name)
+        # Pacing shared by every worker and job using this account
+        self.rate_limiter = get_rate_limiter('vtex', self.account_name)
+        self.recorder = get_upstream_recorder()
+
+        # Catalog enumeration (GetProductAndSkuIds pages are capped at 250 products)
+        self._listing_page_size = min(250, max(1, int(os.getenv('VTEX_LISTING_PAGE_SIZE', '250'))))
+        self._listing_workers = max(1, int(os.getenv('VTEX_LISTING_CONCURRENCY', '4')))
+        self._max_breaker_pause = float(os.getenv('CIRCUIT_BREAKER_MAX_PAUSE_SECONDS', '600'))
+
     def _get_session(self) -> requests.Session:
         """Return a thread-local requests session to keep headers and TCP reuse."""
         session = getattr(self._thread_local, 'session', None)
         if session is None:
             session = requests.Session()
             session.headers.update(self._session_headers)
+            session.mount('https://', self._adapter)
+            session.mount('http://', self._adapter)
             self._thread_local.session = session
         return session
 
+    def _get(self, url: str) -> requests.Response:
+        """Issue a single GET with the configured deadline; the caller paces it."""
+        with UPSTREAM_IN_FLIGHT.labels('vtex').track_inprogress(), VTEX_REQUEST_SECONDS.time():
+            response = self._get_session().get(url, timeout=self._timeout)
+        self.rate_limiter.on_response(response.status_code, response.headers)
+        response.raise_for_status()
+        return response
+
+    def _replay(self, endpoint: str) -> Dict[str, Any]:
+        """Serve a recorded response, re-raising recorded HTTP errors such as 404."""
+        status, payload = self.recorder.load('vtex', UpstreamRecorder.request_key(self.account_name, endpoint))
+        if status >= 400:
+            response = requests.Response()
+            response.status_code = status
+            response.url = f"{self.base_url}{endpoint}"
+            response._content = payload
+            raise requests.HTTPError(f"{status} Error (replayed) for url: {response.url}", response=response)
+        return json.loads(payload)
+
     @retry(
         stop=stop_after_attempt(3),
-        wait=wait_exponential(multiplier=1, min=4, max=10),
-        retry=retry_if_exception_type((requests.RequestException, requests.HTTPError))
+        wait=wait_exponential_jitter(initial=0.25, max=4, jitter=0.25),
+        retry=retry_if_exception(_is_retryable),
+        before_sleep=_count_retry,
+        reraise=True
     )
     def _make_request(self, endpoint: str) -> Dict[str, Any]:
         """Make authenticated request to VTEX API with retry logic."""
+        if self.recorder and self.recorder.replaying:
+            return self._replay(endpoint)
+
         url = f"{self.base_url}{endpoint}"
-        logger.info(f"Making request to {url}")
+        logger.info(f"Making request to {url}", extra={'sampled': True})
 
-        response = self._get_session().get(url)
-        response.raise_for_status()
+        self.circuit_breaker.before_call()
+        # Pace before timing so limiter waits are neither breaker "slow calls" nor hedge latency
+        self.rate_limiter.acquire()
+        primary = iter([True])
+
+        def get() -> requests.Response:
+            # A hedge duplicate is a second request and needs its own token
+            if not next(primary, False):
+                self.rate_limiter.acquire()
+            return self._get(url)
+
+        started = time.perf_counter()
+        try:
+            response = self.hedging.call(get)
+        except Exception as e:
+            UPSTREAM_ERRORS.labels('vtex').inc()
+            self.circuit_breaker.record(not _is_retryable(e), time.perf_counter() - started)
+            # Final HTTP errors (e.g. 404) are part of the recording; transient ones are not
+            if self.recorder and isinstance(e, requests.HTTPError) and not _is_retryable(e):
+                self.recorder.store('vtex', UpstreamRecorder.request_key(self.account_name, endpoint),
+                                    e.response.content, status=e.response.status_code)
+            raise
+        except BaseException:
+            # JobCancelled and friends carry no health signal; only hand back the admission
+            self.circuit_breaker.release()
+            raise
+        self.circuit_breaker.record(True, time.perf_counter() - started)
 
+        if self.recorder:
+            self.recorder.store('vtex', UpstreamRecorder.request_key(self.account_name, endpoint), response.content)
         return response.json()
 
     def get_product(self, product_id: str) -> Optional[Product]:
@@ -65,10 +186,12 @@ class VtexClient:
                 description=data.get('Description'),
                 name=data.get('Name'),
                 category=data.get('CategoryName'),
-                brand=data.get('BrandName')
+                brand=data.get('BrandName'),
+                category_id=str(data['CategoryId']) if data.get('CategoryId') is not None else None,
+                brand_id=str(data['BrandId']) if data.get('BrandId') is not None else None
             )
 
-            logger.info(f"Successfully fetched product {product_id}", extra={'product_id': product_id})
+            logger.info(f"Successfully fetched product {product_id}", extra={'product_id': product_id, 'sampled': True})
             return product
 
         except requests.HTTPError as e:
@@ -78,6 +201,73 @@ class VtexClient:
             else:
                 logger.error(f"HTTP error fetching product {product_id}: {e}", extra={'product_id': product_id})
                 raise
+        except CircuitOpenError:
+            raise
         except Exception as e:
             logger.error(f"Error fetching product {product_id}: {e}", extra={'product_id': product_id})
-            raise
\ No newline at end of file
+            raise
+
+    def get_product_ids_page(self, start: int, end: int, category_id: str | None = None) -> Tuple[List[str], int]:
+        """Fetch one page of catalog product IDs (1-based, inclusive range) and the catalog total."""
+        endpoint = f"/api/catalog_system/pvt/products/GetProductAndSkuIds?_from={start}&_to={end}"
+        if category_id:
+            endpoint += f"&categoryId={category_id}"
+
+        paused = 0.0
+        while True:
+            try:
+                data = self._make_request(endpoint)
+                break
+            except CircuitOpenError as e:
+                if paused >= self._max_breaker_pause:
+                    raise
+                delay = max(1.0, e.retry_after)
+                time.sleep(delay)
+                paused += delay
+
+        product_ids = list((data.get('data') or {}).keys())
+        total = int((data.get('range') or {}).get('total') or 0)
+        return product_ids, total
+
+    def iter_product_ids(self, category_id: str | None = None) -> Iterator[str]:
+        """Enumerate catalog product IDs, fetching pages in parallel ahead of the consumer."""
+        page_size = self._listing_page_size
+        product_ids, total = self.get_product_ids_page(1, page_size, category_id)
+        logger.info(f"Enumerating {total} catalog products", extra={'category_id': category_id})
+        yield from product_ids
+
+        starts = iter(range(page_size + 1, total + 1, page_size))
+        with ThreadPoolExecutor(max_workers=self._listing_workers, thread_name_prefix='vtex-listing') as executor:
+            # Keep a bounded window of pages in flight so enumeration stays ahead without buffering the catalog
+            window = deque()
+            for start in starts:
+                window.append(executor.submit(self.get_product_ids_page, start, start + page_size - 1, category_id))
+                if len(window) >= self._listing_workers * 2:
+                    break
+            while window:
+                page_ids, _ = window.popleft().result()
+                next_start = next(starts, None)
+                if next_start is not None:
+                    window.append(executor.submit(
+                        self.get_product_ids_page, next_start, next_start + page_size - 1, category_id
+                    ))
+                yield from page_ids
+
+
+_clients: Dict[str, VtexClient] = {}
+_clients_lock = threading.Lock()
+
+
+def get_vtex_client(account: str | None = None) -> VtexClient:
+    """Return the process-wide client of a VTEX account, shared by every job for that account.
+
+    Jobs for the same account share its connection pool, rate limiter and
+    circuit breaker; each account gets its own.
+    """
+    account = account or os.getenv('VTEX_ACCOUNT_NAME') or ''
+    with _clients_lock:
+        client = _clients.get(account)
+        if client is None:
+            client = VtexClient(account or None)
+            _clients[account] = client
+        return client
@@ -0,0 +1,292 @@
+import atexit
+import hashlib
+import heapq
+import hmac
+import ipaddress
+import itertools
+import json
+import os
+import socket
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+from urllib.parse import urlparse
+import requests
+from app.utils.logger import get_logger
+from app.utils.metrics import WEBHOOK_DELIVERIES, WEBHOOK_QUEUE_DEPTH
+
+logger = get_logger(__name__)
+
+TERMINAL_EVENTS = ('job.completed', 'job.failed', 'job.cancelled')
+
+
+def sign_payload(secret: str, timestamp: str, body: bytes) -> str:
+    """HMAC-SHA256 over ``"{timestamp}.{body}"``, as sent in X-Webhook-Signature."""
+    digest = hmac.new(secret.encode(), timestamp.encode() + b'.' + body, hashlib.sha256).hexdigest()
+    return f"sha256={digest}"
+
+
+def verify_signature(secret: str, timestamp: str, body: bytes, signature: str, tolerance_seconds: float = 300) -> bool:
+    """Receiver-side check of a webhook's signature and timestamp freshness."""
+    try:
+        if abs(time.time() - int(timestamp)) > tolerance_seconds:
+            return False
+    except ValueError:
+        return False
+    return hmac.compare_digest(sign_payload(secret, timestamp, body), signature)
+
+
+def allowed_callback_hosts() -> List[str]:
+    """WEBHOOK_ALLOWED_HOSTS entries: host names or CIDR networks exempt from the public-address check."""
+    return [host.strip().lower() for host in os.getenv('WEBHOOK_ALLOWED_HOSTS', '').split(',') if host.strip()]
+
+
+class UnresolvableHostError(ValueError):
+    """The callback host did not resolve; unlike a non-public address this may be transient."""
+
+
+def _is_public(address: ipaddress.IPv4Address | ipaddress.IPv6Address) -> bool:
+    if isinstance(address, ipaddress.IPv6Address) and address.ipv4_mapped:
+        address = address.ipv4_mapped
+    return address.is_global and not address.is_multicast
+
+
+def validate_callback_url(url: str, allowed_hosts: Optional[List[str]] = None) -> None:
+    """Raise ValueError unless ``url`` is an absolute http(s) URL whose host resolves to public addresses.
+
+    Loopback, private, link-local and other non-global addresses are refused
+    so callers cannot point the service at internal endpoints, unless the
+    host name or one of its networks is in ``allowed_hosts``
+    (WEBHOOK_ALLOWED_HOSTS by default).
+    """
+    parsed = urlparse(url)
+    if parsed.scheme not in ('http', 'https') or not parsed.hostname:
+        raise ValueError("callback_url must be an absolute http(s) URL")
+
+    allowed_hosts = allowed_callback_hosts() if allowed_hosts is None else allowed_hosts
+    host = parsed.hostname.lower()
+    if host in allowed_hosts:
+        return
+    try:
+        port = parsed.port or (443 if parsed.scheme == 'https' else 80)
+        addresses = {ipaddress.ip_address(info[4][0].split('%')[0])
+                     for info in socket.getaddrinfo(host, port, proto=socket.IPPROTO_TCP)}
+    except (OSError, ValueError):
+        raise UnresolvableHostError(f"callback_url host {host} does not resolve")
+
+    networks = []
+    for entry in allowed_hosts:
+        try:
+            networks.append(ipaddress.ip_network(entry, strict=False))
+        except ValueError:
+            continue
+    for address in addresses:
+        if not _is_public(address) and not any(address in network for network in networks):
+            raise ValueError(f"callback_url host {host} resolves to a non-public address")
+
+
+@dataclass(order=True)
+class _Delivery:
+    due: float
+    seq: int
+    url: str = field(compare=False)
+    event: str = field(compare=False)
+    event_id: str = field(compare=False)
+    body: bytes = field(compare=False)
+    attempts: int = field(default=0, compare=False)
+
+
+class WebhookNotifier:
+    """Delivers signed job events to callback URLs from a bounded retry queue.
+
+    ``notify`` never blocks the pipeline: events are queued and a single
+    worker thread POSTs them. Connection errors, 429 and 5xx responses are
+    retried with exponential backoff up to ``max_attempts``. When the queue
+    is full, progress events are dropped; completion and failure events
+    displace the oldest queued progress event instead. Each attempt
+    re-validates the callback host, since DNS may have changed since the job
+    was accepted, and redirects are not followed.
+    """
+
+    def __init__(
+        self,
+        secret: Optional[str] = None,
+        max_queue: int = 1000,
+        max_attempts: int = 6,
+        timeout: float = 10.0,
+        retry_base_seconds: float = 2.0,
+        retry_max_seconds: float = 300.0,
+        allowed_hosts: Optional[List[str]] = None
+    ):
+        self.secret = secret
+        self.allowed_hosts = allowed_hosts or []
+        self.max_queue = max_queue
+        self.max_attempts = max_attempts
+        self.timeout = timeout
+        self.retry_base_seconds = retry_base_seconds
+        self.retry_max_seconds = retry_max_seconds
+
+        self.session = requests.Session()
+        self.session.headers.update({'Content-Type': 'application/json', 'User-Agent': 'catalog-evaluator-webhooks/1.0'})
+        self._queue: List[_Delivery] = []
+        self._seq = itertools.count()
+        self._condition = threading.Condition()
+        self._in_flight = 0
+        self._closed = False
+        self.counts = {'delivered': 0, 'retried': 0, 'failed': 0, 'dropped': 0}
+
+        if not secret:
+            logger.warning("WEBHOOK_SECRET not set; webhook events will be sent unsigned")
+        self._worker = threading.Thread(target=self._run, name='webhook-notifier', daemon=True)
+        self._worker.start()
+
+    def _count(self, outcome: str) -> None:
+        self.counts[outcome] += 1
+        WEBHOOK_DELIVERIES.labels(outcome).inc()
+
+    def notify(self, url: str, event: str, job_id: str, data: Optional[Dict] = None) -> bool:
+        """Queue one event for delivery; returns False if it was dropped."""
+        event_id = str(uuid.uuid4())
+        body = json.dumps({
+            'id': event_id,
+            'event': event,
+            'job_id': job_id,
+            'occurred_at': datetime.now(timezone.utc).isoformat(),
+            'data': data or {},
+        }, default=str).encode()
+        delivery = _Delivery(time.monotonic(), next(self._seq), url, event, event_id, body)
+
+        with self._condition:
+            if self._closed:
+                return False
+            if len(self._queue) >= self.max_queue:
+                progress = [d for d in self._queue if d.event not in TERMINAL_EVENTS]
+                if event not in TERMINAL_EVENTS or not progress:
+                    self._count('dropped')
+                    logger.warning(f"Webhook queue full; dropped {event}", extra={'job_id': job_id})
+                    return False
+                self._queue.remove(min(progress, key=lambda d: d.seq))
+                heapq.heapify(self._queue)
+                self._count('dropped')
+            heapq.heappush(self._queue, delivery)
+            WEBHOOK_QUEUE_DEPTH.set(len(self._queue))
+            self._condition.notify()
+        return True
+
+    def _next_delivery(self) -> Optional[_Delivery]:
+        with self._condition:
+            while True:
+                if self._queue:
+                    wait = self._queue[0].due - time.monotonic()
+                    if wait <= 0:
+                        self._in_flight += 1
+                        delivery = heapq.heappop(self._queue)
+                        WEBHOOK_QUEUE_DEPTH.set(len(self._queue))
+                        return delivery
+                elif self._closed:
+                    return None
+                else:
+                    wait = None
+                self._condition.wait(wait)
+
+    def _send(self, delivery: _Delivery) -> Optional[int]:
+        """POST one delivery; returns the status code, or None on a connection error."""
+        timestamp = str(int(time.time()))
+        headers = {
+            'X-Webhook-Id': delivery.event_id,
+            'X-Webhook-Event': delivery.event,
+            'X-Webhook-Timestamp': timestamp,
+            'X-Webhook-Attempt': str(delivery.attempts),
+        }
+        if self.secret:
+            headers['X-Webhook-Signature'] = sign_payload(self.secret, timestamp, delivery.body)
+        try:
+            return self.session.post(
+                delivery.url, data=delivery.body, headers=headers, timeout=self.timeout, allow_redirects=False
+            ).status_code
+        except requests.exceptions.RequestException as e:
+            logger.warning(f"Webhook {delivery.event} to {delivery.url} failed: {e}")
+            return None
+
+    def _run(self) -> None:
+        while True:
+            delivery = self._next_delivery()
+            if delivery is None:
+                return
+            delivery.attempts += 1
+            try:
+                validate_callback_url(delivery.url, self.allowed_hosts)
+            except UnresolvableHostError:
+                # Let the POST fail as a connection error so it is retried
+                pass
+            except ValueError as e:
+                with self._condition:
+                    self._in_flight -= 1
+                    self._count('failed')
+                    logger.error(f"Refusing webhook {delivery.event} to {delivery.url}: {e}")
+                    self._condition.notify_all()
+                continue
+            status = self._send(delivery)
+            with self._condition:
+                self._in_flight -= 1
+                if status is not None and status < 300:
+                    self._count('delivered')
+                elif (status is None or status == 429 or status >= 500) and delivery.attempts < self.max_attempts:
+                    delay = min(self.retry_max_seconds, self.retry_base_seconds * 2 ** (delivery.attempts - 1))
+                    delivery.due = time.monotonic() + delay
+                    heapq.heappush(self._queue, delivery)
+                    WEBHOOK_QUEUE_DEPTH.set(len(self._queue))
+                    self._count('retried')
+                else:
+                    self._count('failed')
+                    logger.error(f"Giving up on webhook {delivery.event} to {delivery.url} "
+                                 f"after {delivery.attempts} attempts (last status {status})")
+                self._condition.notify_all()
+
+    def flush(self, timeout: float = 30.0) -> bool:
+        """Wait until every queued event is delivered or given up; returns False on timeout."""
+        deadline = time.monotonic() + timeout
+        with self._condition:
+            while self._queue or self._in_flight:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._condition.wait(remaining)
+        return True
+
+    def close(self, timeout: float = 10.0) -> None:
+        """Try to deliver what is queued, then stop the worker."""
+        self.flush(timeout)
+        with self._condition:
+            self._closed = True
+            self._queue.clear()
+            self._condition.notify_all()
+        self._worker.join(timeout=1)
+
+    def snapshot(self) -> Dict:
+        with self._condition:
+            return {'queued': len(self._queue), 'in_flight': self._in_flight, **self.counts}
+
+
+_notifier: Optional[WebhookNotifier] = None
+_notifier_lock = threading.Lock()
+
+
+def get_webhook_notifier() -> WebhookNotifier:
+    """Return the process-wide webhook notifier, created from env settings."""
+    global _notifier
+    with _notifier_lock:
+        if _notifier is None:
+            _notifier = WebhookNotifier(
+                secret=os.getenv('WEBHOOK_SECRET'),
+                max_queue=int(os.getenv('WEBHOOK_MAX_QUEUE', '1000')),
+                max_attempts=int(os.getenv('WEBHOOK_MAX_ATTEMPTS', '6')),
+                timeout=float(os.getenv('WEBHOOK_TIMEOUT_SECONDS', '10')),
+                retry_base_seconds=float(os.getenv('WEBHOOK_RETRY_BASE_SECONDS', '2')),
+                allowed_hosts=allowed_callback_hosts(),
+            )
+            atexit.register(_notifier.close)
+        return _notifier
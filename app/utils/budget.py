@@ -0,0 +1,232 @@
+import asyncio
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, List, Optional
+from app.utils.logger import get_logger
+from app.utils.metrics import GEMINI_BUDGET_PAUSED, GEMINI_BUDGET_UTILIZATION
+
+logger = get_logger(__name__)
+
+DIMENSIONS = ('requests', 'input_tokens', 'output_tokens')
+
+
+def _env_cap(name: str) -> int:
+    return max(0, int(os.getenv(name, '0')))
+
+
+class TokenBudget:
+    """Request and input/output token caps with actual usage, optionally reset daily (UTC).
+
+    A cap of 0 means unlimited. Usage is charged from Gemini responses, so
+    calls already in flight when a cap is reached can overshoot it slightly.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_requests: int = 0,
+        max_input_tokens: int = 0,
+        max_output_tokens: int = 0,
+        daily: bool = False
+    ):
+        self.name = name
+        self.daily = daily
+        self.caps = {'requests': max_requests, 'input_tokens': max_input_tokens, 'output_tokens': max_output_tokens}
+        self.usage = dict.fromkeys(DIMENSIONS, 0)
+        self._window = datetime.now(timezone.utc).date()
+        self._lock = threading.Lock()
+
+    def _roll_window(self) -> None:
+        if self.daily:
+            today = datetime.now(timezone.utc).date()
+            if today != self._window:
+                self._window = today
+                self.usage = dict.fromkeys(DIMENSIONS, 0)
+                logger.info(f"Budget {self.name} reset for {today.isoformat()}")
+
+    def charge(self, requests: int = 0, input_tokens: int = 0, output_tokens: int = 0) -> None:
+        with self._lock:
+            self._roll_window()
+            self.usage['requests'] += requests
+            self.usage['input_tokens'] += input_tokens
+            self.usage['output_tokens'] += output_tokens
+
+    def set_caps(self, **caps: Optional[int]) -> None:
+        """Change caps (e.g. raise them to resume a paused job); None leaves a cap unchanged."""
+        with self._lock:
+            for dimension, cap in caps.items():
+                if dimension not in self.caps:
+                    raise ValueError(f"Unknown budget dimension {dimension}")
+                if cap is not None:
+                    self.caps[dimension] = max(0, cap)
+
+    def utilization(self) -> float:
+        """Highest used/cap ratio over the capped dimensions (0 when nothing is capped)."""
+        with self._lock:
+            self._roll_window()
+            return max(
+                (self.usage[dimension] / cap for dimension, cap in self.caps.items() if cap),
+                default=0.0
+            )
+
+    def seconds_until_reset(self) -> Optional[float]:
+        """Seconds until a daily budget's next UTC midnight; None for budgets that never reset."""
+        if not self.daily:
+            return None
+        now = datetime.now(timezone.utc)
+        midnight = datetime.combine(now.date() + timedelta(days=1), datetime.min.time(), timezone.utc)
+        return (midnight - now).total_seconds()
+
+    def snapshot(self) -> Dict:
+        utilization = self.utilization()
+        with self._lock:
+            return {
+                'name': self.name,
+                'caps': dict(self.caps),
+                'usage': dict(self.usage),
+                'utilization': round(utilization, 4),
+                'resets_in_seconds': round(self.seconds_until_reset()) if self.daily else None,
+            }
+
+
+class BudgetGovernor:
+    """Applies the global budget and, for API jobs, a per-job budget to one evaluator.
+
+    Past ``downscale_at`` utilization of any budget the evaluator stops
+    escalating to later model tiers. At 100% new Gemini calls wait instead
+    of failing: until the daily window resets for the global budget, or
+    until the job's caps are raised for a job budget.
+    """
+
+    def __init__(self, budgets: List[TokenBudget], downscale_at: float = 0.8, check_interval: float = 5.0):
+        self.budgets = budgets
+        self.downscale_at = downscale_at
+        self.check_interval = check_interval
+        # Counted once per pause, however many calls wait it out
+        self.paused_seconds = 0.0
+        self._paused_by: Optional[str] = None
+        self._paused_at = 0.0
+        self._pause_lock = threading.Lock()
+
+    def _exhausted(self) -> Optional[TokenBudget]:
+        return next((budget for budget in self.budgets if budget.utilization() >= 1.0), None)
+
+    @property
+    def downscaled(self) -> bool:
+        return any(budget.utilization() >= self.downscale_at for budget in self.budgets)
+
+    @property
+    def state(self) -> str:
+        if self._paused_by is not None or self._exhausted() is not None:
+            return 'paused'
+        return 'downscaled' if self.downscaled else 'ok'
+
+    def charge(self, requests: int = 0, input_tokens: int = 0, output_tokens: int = 0) -> None:
+        for budget in self.budgets:
+            budget.charge(requests, input_tokens, output_tokens)
+            if budget.daily:
+                for dimension in DIMENSIONS:
+                    if budget.caps[dimension]:
+                        GEMINI_BUDGET_UTILIZATION.labels(dimension).set(budget.usage[dimension] / budget.caps[dimension])
+
+    def _pause_delay(self, budget: TokenBudget) -> float:
+        with self._pause_lock:
+            if self._paused_by != budget.name:
+                if self._paused_by is None:
+                    self._paused_at = time.monotonic()
+                self._paused_by = budget.name
+                GEMINI_BUDGET_PAUSED.labels('global' if budget.daily else 'job').inc()
+                logger.warning(f"Budget {budget.name} exhausted; pausing Gemini calls")
+        reset = budget.seconds_until_reset()
+        return min(self.check_interval, reset + 1) if reset is not None else self.check_interval
+
+    def _end_pause(self, resumed: bool = True) -> None:
+        with self._pause_lock:
+            if self._paused_by is not None:
+                self.paused_seconds += time.monotonic() - self._paused_at
+                if resumed:
+                    logger.info(f"Budget {self._paused_by} available again; resuming Gemini calls")
+                self._paused_by = None
+
+    def _check(self, checkpoint: Optional[Callable[[], None]]) -> None:
+        if checkpoint:
+            try:
+                checkpoint()
+            except BaseException:
+                # A cancelled job stops waiting, which also ends its pause
+                self._end_pause(resumed=False)
+                raise
+
+    async def wait(self, checkpoint: Optional[Callable[[], None]] = None) -> None:
+        """Wait (without blocking the event loop) until every budget has room.
+
+        ``checkpoint`` is called on every check so a paused call can still be
+        cancelled (it is expected to raise in that case).
+        """
+        while (budget := self._exhausted()) is not None:
+            self._check(checkpoint)
+            await asyncio.sleep(self._pause_delay(budget))
+        self._end_pause()
+
+    def wait_blocking(self, checkpoint: Optional[Callable[[], None]] = None) -> None:
+        """Blocking variant of ``wait`` for synchronous callers (batch job submission)."""
+        while (budget := self._exhausted()) is not None:
+            self._check(checkpoint)
+            time.sleep(self._pause_delay(budget))
+        self._end_pause()
+
+    def paused_total(self) -> float:
+        """Seconds spent paused so far, including a pause still in progress."""
+        with self._pause_lock:
+            if self._paused_by is None:
+                return self.paused_seconds
+            return self.paused_seconds + time.monotonic() - self._paused_at
+
+    def snapshot(self) -> Dict:
+        return {
+            'state': self.state,
+            'paused_seconds': round(self.paused_total(), 1),
+            'budgets': [budget.snapshot() for budget in self.budgets],
+        }
+
+
+_global_budget: Optional[TokenBudget] = None
+_global_budget_lock = threading.Lock()
+
+
+def get_global_budget() -> TokenBudget:
+    """Return the process-wide daily Gemini budget, created from env settings."""
+    global _global_budget
+    with _global_budget_lock:
+        if _global_budget is None:
+            _global_budget = TokenBudget(
+                'global',
+                max_requests=_env_cap('GEMINI_BUDGET_DAILY_REQUESTS'),
+                max_input_tokens=_env_cap('GEMINI_BUDGET_DAILY_INPUT_TOKENS'),
+                max_output_tokens=_env_cap('GEMINI_BUDGET_DAILY_OUTPUT_TOKENS'),
+                daily=True
+            )
+        return _global_budget
+
+
+def job_budget(
+    job_id: str,
+    max_requests: Optional[int] = None,
+    max_input_tokens: Optional[int] = None,
+    max_output_tokens: Optional[int] = None
+) -> TokenBudget:
+    """A job's budget, with GEMINI_BUDGET_JOB_* defaults for caps not given explicitly."""
+    return TokenBudget(
+        f"job:{job_id}",
+        max_requests=max_requests if max_requests is not None else _env_cap('GEMINI_BUDGET_JOB_REQUESTS'),
+        max_input_tokens=max_input_tokens if max_input_tokens is not None else _env_cap('GEMINI_BUDGET_JOB_INPUT_TOKENS'),
+        max_output_tokens=max_output_tokens if max_output_tokens is not None else _env_cap('GEMINI_BUDGET_JOB_OUTPUT_TOKENS')
+    )
+
+
+def create_governor(budget: Optional[TokenBudget] = None) -> BudgetGovernor:
+    """Governor over the global budget plus an optional job budget."""
+    budgets = [get_global_budget()] + ([budget] if budget is not None else [])
+    return BudgetGovernor(budgets, downscale_at=float(os.getenv('GEMINI_BUDGET_DOWNSCALE_AT', '0.8')))
@@ -0,0 +1,184 @@
+import os
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, Tuple
+from app.utils.logger import get_logger
+from app.utils.metrics import CIRCUIT_BREAKER_OPEN
+
+logger = get_logger(__name__)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised when a call is rejected because the upstream's breaker is open."""
+
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(f"Circuit breaker '{name}' is open; retry in {retry_after:.1f}s")
+        self.name = name
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """Count-based circuit breaker with error-rate and slow-call thresholds.
+
+    Closed: calls pass and outcomes fill a sliding window. Open: calls fail
+    fast for ``open_seconds``. Half-open: up to ``half_open_max_calls`` probes
+    pass; all succeeding closes the breaker, any failure reopens it.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        failure_rate_threshold: float = 0.5,
+        slow_call_seconds: float = 10.0,
+        slow_call_rate_threshold: float = 0.8,
+        window_size: int = 50,
+        min_calls: int = 20,
+        open_seconds: float = 30.0,
+        half_open_max_calls: int = 3
+    ):
+        self.name = name
+        self.failure_rate_threshold = failure_rate_threshold
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_call_rate_threshold = slow_call_rate_threshold
+        self.min_calls = min_calls
+        self.open_seconds = open_seconds
+        self.half_open_max_calls = half_open_max_calls
+
+        self.state = CLOSED
+        self._window: Deque[Tuple[bool, bool]] = deque(maxlen=window_size)
+        self._opened_at = 0.0
+        self._half_open_in_flight = 0
+        self._half_open_successes = 0
+        self._lock = threading.Lock()
+
+        self.total_calls = 0
+        self.total_failures = 0
+        self.rejected_calls = 0
+        self.times_opened = 0
+
+    def _transition(self, state: str) -> None:
+        logger.warning(f"Circuit breaker '{self.name}' {self.state} -> {state}")
+        self.state = state
+        CIRCUIT_BREAKER_OPEN.labels(self.name).set(1 if state == OPEN else 0)
+        if state == OPEN:
+            self._opened_at = time.monotonic()
+            self.times_opened += 1
+        elif state == HALF_OPEN:
+            self._half_open_in_flight = 0
+            self._half_open_successes = 0
+        else:
+            self._window.clear()
+
+    def retry_after(self) -> float:
+        """Seconds until the breaker lets probe calls through (0 when not open)."""
+        with self._lock:
+            if self.state != OPEN:
+                return 0.0
+            return max(0.0, self._opened_at + self.open_seconds - time.monotonic())
+
+    def before_call(self) -> None:
+        """Admit a call or raise CircuitOpenError."""
+        with self._lock:
+            if self.state == OPEN:
+                remaining = self._opened_at + self.open_seconds - time.monotonic()
+                if remaining > 0:
+                    self.rejected_calls += 1
+                    raise CircuitOpenError(self.name, remaining)
+                self._transition(HALF_OPEN)
+
+            if self.state == HALF_OPEN:
+                if self._half_open_in_flight >= self.half_open_max_calls:
+                    self.rejected_calls += 1
+                    raise CircuitOpenError(self.name, 1.0)
+                self._half_open_in_flight += 1
+
+    def release(self) -> None:
+        """Give back an admitted call that ended without an outcome (e.g. cancelled)."""
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self._half_open_in_flight = max(0, self._half_open_in_flight - 1)
+
+    def record(self, success: bool, duration: float) -> None:
+        """Record the outcome of an admitted call."""
+        slow = duration >= self.slow_call_seconds
+        with self._lock:
+            self.total_calls += 1
+            if not success:
+                self.total_failures += 1
+
+            if self.state == HALF_OPEN:
+                self._half_open_in_flight = max(0, self._half_open_in_flight - 1)
+                if not success or slow:
+                    self._transition(OPEN)
+                else:
+                    self._half_open_successes += 1
+                    if self._half_open_successes >= self.half_open_max_calls:
+                        self._transition(CLOSED)
+                return
+
+            if self.state != CLOSED:
+                return
+
+            self._window.append((success, slow))
+            calls = len(self._window)
+            if calls < self.min_calls:
+                return
+            failure_rate = sum(1 for ok, _ in self._window if not ok) / calls
+            slow_rate = sum(1 for _, is_slow in self._window if is_slow) / calls
+            if failure_rate >= self.failure_rate_threshold or slow_rate >= self.slow_call_rate_threshold:
+                self._transition(OPEN)
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            calls = len(self._window)
+            return {
+                'name': self.name,
+                'state': self.state,
+                'window_calls': calls,
+                'window_failure_rate': round(sum(1 for ok, _ in self._window if not ok) / calls, 4) if calls else 0.0,
+                'total_calls': self.total_calls,
+                'total_failures': self.total_failures,
+                'rejected_calls': self.rejected_calls,
+                'times_opened': self.times_opened,
+            }
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def _setting(name: str, key: str, default: str) -> str:
+    """Read a per-upstream override (e.g. VTEX_CIRCUIT_BREAKER_OPEN_SECONDS) or the global value."""
+    return os.getenv(f"{name.upper()}_CIRCUIT_BREAKER_{key}", os.getenv(f"CIRCUIT_BREAKER_{key}", default))
+
+
+def get_circuit_breaker(name: str, scope: str = '') -> CircuitBreaker:
+    """Return the process-wide breaker for an upstream (and account scope), creating it from env settings."""
+    key = f"{name}:{scope}" if scope else name
+    with _breakers_lock:
+        breaker = _breakers.get(key)
+        if breaker is None:
+            breaker = CircuitBreaker(
+                key,
+                failure_rate_threshold=float(_setting(name, 'FAILURE_RATE', '0.5')),
+                slow_call_seconds=float(_setting(name, 'SLOW_CALL_SECONDS', '10')),
+                slow_call_rate_threshold=float(_setting(name, 'SLOW_CALL_RATE', '0.8')),
+                window_size=int(_setting(name, 'WINDOW_SIZE', '50')),
+                min_calls=int(_setting(name, 'MIN_CALLS', '20')),
+                open_seconds=float(_setting(name, 'OPEN_SECONDS', '30')),
+                half_open_max_calls=int(_setting(name, 'HALF_OPEN_CALLS', '3')),
+            )
+            _breakers[key] = breaker
+        return breaker
+
+
+def circuit_breaker_snapshots() -> Dict[str, Dict]:
+    """State and counters of every breaker created in this process."""
+    with _breakers_lock:
+        breakers = list(_breakers.values())
+    return {breaker.name: breaker.snapshot() for breaker in breakers}
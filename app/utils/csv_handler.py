@@ -1,7 +1,8 @@
 import os
 import csv
 import pandas as pd
-from typing import List
+from typing import Iterable, Iterator, List
+from app.models.evaluation_batch import EvaluationBatch
 from app.models.evaluation_result import EvaluationResult
 from app.utils.logger import get_logger
 
@@ -27,8 +28,31 @@ def read_product_ids(csv_path: str) -> List[str]:
         raise
 
 
+RESULT_CSV_HEADER = ['product_id', 'quality_score', 'evaluation_timestamp', 'reason', 'raw_response']
+
+
+def evaluation_rows(results: EvaluationBatch | Iterable[EvaluationResult]) -> Iterator[List]:
+    """CSV rows for evaluation results, with newlines removed from free-text columns."""
+    if isinstance(results, EvaluationBatch):
+        rows = results.rows()
+    else:
+        rows = (
+            (result.product_id, result.quality_score, result.evaluation_timestamp.isoformat(),
+             result.reason, result.raw_response)
+            for result in results
+        )
+    for product_id, quality_score, timestamp, reason, raw_response in rows:
+        yield [
+            product_id,
+            quality_score,
+            timestamp,
+            (reason or '').replace('\n', ' ').replace('\r', ' ').strip(),
+            (raw_response or '').replace('\n', ' ').replace('\r', ' ').strip()
+        ]
+
+
 def write_evaluation_results(
-    results: List[EvaluationResult],
+    results: EvaluationBatch | Iterable[EvaluationResult],
     csv_path: str,
     *,
     mode: str = 'w',
@@ -48,21 +72,14 @@ def write_evaluation_results(
             writer = csv.writer(csv_file, quoting=csv.QUOTE_ALL)
 
             if header_needed:
-                writer.writerow(['product_id', 'quality_score', 'evaluation_timestamp', 'reason', 'raw_response'])
-
-            for result in results:
-                clean_reason = (result.reason or '').replace('\n', ' ').replace('\r', ' ').strip()
-                clean_raw_response = (result.raw_response or '').replace('\n', ' ').replace('\r', ' ').strip()
+                writer.writerow(RESULT_CSV_HEADER)
 
-                writer.writerow([
-                    result.product_id,
-                    result.quality_score,
-                    result.evaluation_timestamp.isoformat(),
-                    clean_reason,
-                    clean_raw_response
-                ])
+            written = 0
+            for row in evaluation_rows(results):
+                writer.writerow(row)
+                written += 1
 
-        logger.info(f"Wrote {len(results)} evaluation results to {csv_path}")
+        logger.info(f"Wrote {written} evaluation results to {csv_path}")
 
     except Exception as e:
         logger.error(f"Failed to write CSV {csv_path}: {e}")
@@ -0,0 +1,154 @@
+import asyncio
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Awaitable, Callable, Deque, Optional
+
+
+class LatencyTracker:
+    """Rolling window of call latencies used to estimate percentiles."""
+
+    def __init__(self, window: int = 1000, min_samples: int = 20):
+        self._samples: Deque[float] = deque(maxlen=window)
+        self._min_samples = min_samples
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, q: float) -> Optional[float]:
+        """Return the q-quantile, or None until enough samples were observed."""
+        with self._lock:
+            if len(self._samples) < self._min_samples:
+                return None
+            ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class HedgingPolicy:
+    """Fires a duplicate request once a call exceeds the observed latency percentile.
+
+    Hedges are capped at ``max_ratio`` of all calls so a slow upstream is not
+    hit with twice the traffic.
+    """
+
+    def __init__(
+        self,
+        enabled: bool = False,
+        percentile: float = 0.95,
+        max_ratio: float = 0.05,
+        min_delay: float = 0.05
+    ):
+        self.enabled = enabled
+        self.percentile = percentile
+        self.max_ratio = max_ratio
+        self.min_delay = min_delay
+        self.tracker = LatencyTracker()
+        self.calls = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self._lock = threading.Lock()
+        self._executor: ThreadPoolExecutor | None = None
+
+    def _hedge_delay(self) -> Optional[float]:
+        with self._lock:
+            self.calls += 1
+        if not self.enabled:
+            return None
+        threshold = self.tracker.percentile(self.percentile)
+        return None if threshold is None else max(self.min_delay, threshold)
+
+    def _try_acquire_hedge(self) -> bool:
+        with self._lock:
+            if self.hedges + 1 > self.max_ratio * self.calls:
+                return False
+            self.hedges += 1
+            return True
+
+    def _timed(self, fn: Callable[..., Any], *args) -> Any:
+        started = time.perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            self.tracker.record(time.perf_counter() - started)
+
+    def call(self, fn: Callable[..., Any], *args) -> Any:
+        """Run a blocking call, hedging it on a worker thread when it runs long."""
+        delay = self._hedge_delay()
+        if delay is None:
+            return self._timed(fn, *args)
+
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(thread_name_prefix='hedge')
+
+        primary = self._executor.submit(self._timed, fn, *args)
+        done, _ = wait([primary], timeout=delay)
+        if done or not self._try_acquire_hedge():
+            return primary.result()
+
+        hedge = self._executor.submit(self._timed, fn, *args)
+        return self._first_success([primary, hedge], hedge)
+
+    def _first_success(self, futures: list[Future], hedge: Future) -> Any:
+        pending = set(futures)
+        error: BaseException | None = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is hedge:
+                        with self._lock:
+                            self.hedge_wins += 1
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    async def call_async(self, run: Callable[[], Awaitable[Any]]) -> Any:
+        """Await ``run()``, starting a second attempt once it exceeds the hedge delay."""
+        delay = self._hedge_delay()
+
+        async def timed() -> Any:
+            started = time.perf_counter()
+            try:
+                return await run()
+            finally:
+                self.tracker.record(time.perf_counter() - started)
+
+        if delay is None:
+            return await timed()
+
+        primary = asyncio.ensure_future(timed())
+        done, _ = await asyncio.wait({primary}, timeout=delay)
+        if done or not self._try_acquire_hedge():
+            return await primary
+
+        hedge = asyncio.ensure_future(timed())
+        pending = {primary, hedge}
+        error: BaseException | None = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge:
+                            with self._lock:
+                                self.hedge_wins += 1
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def report(self) -> dict:
+        threshold = self.tracker.percentile(self.percentile)
+        return {
+            'calls': self.calls,
+            'hedges': self.hedges,
+            'hedge_wins': self.hedge_wins,
+            'hedge_delay_ms': round(threshold * 1000, 1) if threshold is not None else None,
+        }
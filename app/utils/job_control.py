@@ -0,0 +1,103 @@
+import asyncio
+import threading
+import time
+from typing import Dict
+
+
+class JobCancelled(BaseException):
+    """Raised at a checkpoint of a cancelled job.
+
+    Derives from BaseException so per-product error handling (which records
+    score-0 rows for ordinary exceptions) lets it through to the job loop.
+    """
+
+
+class JobControl:
+    """Cooperative pause/resume/cancel switch shared between an API job and its pipeline.
+
+    The pipeline calls ``checkpoint`` at chunk boundaries and before each
+    Gemini call; it blocks while the job is paused and raises JobCancelled
+    once the job is cancelled. Work that already completed is unaffected.
+    """
+
+    RUNNING = 'running'
+    PAUSED = 'paused'
+    CANCELLED = 'cancelled'
+    FINISHED = 'finished'
+
+    def __init__(self, poll_interval: float = 0.5):
+        self.poll_interval = poll_interval
+        self._state = self.RUNNING
+        self._condition = threading.Condition()
+        self._paused_at = 0.0
+        self.paused_seconds = 0.0
+
+    @property
+    def state(self) -> str:
+        return self._state
+
+    @property
+    def cancelled(self) -> bool:
+        return self._state == self.CANCELLED
+
+    def pause(self) -> bool:
+        with self._condition:
+            if self._state != self.RUNNING:
+                return False
+            self._state = self.PAUSED
+            self._paused_at = time.monotonic()
+            return True
+
+    def resume(self) -> bool:
+        with self._condition:
+            if self._state != self.PAUSED:
+                return False
+            self._state = self.RUNNING
+            self.paused_seconds += time.monotonic() - self._paused_at
+            self._condition.notify_all()
+            return True
+
+    def cancel(self) -> bool:
+        with self._condition:
+            if self._state in (self.CANCELLED, self.FINISHED):
+                return False
+            if self._state == self.PAUSED:
+                self.paused_seconds += time.monotonic() - self._paused_at
+            self._state = self.CANCELLED
+            self._condition.notify_all()
+            return True
+
+    def finish(self) -> bool:
+        """Mark the work done so later controls are refused; False if a cancel got there first."""
+        with self._condition:
+            if self._state == self.CANCELLED:
+                return False
+            self._state = self.FINISHED
+            return True
+
+    def raise_if_cancelled(self) -> None:
+        """Non-blocking check for loops that already wait on something else."""
+        if self.cancelled:
+            raise JobCancelled()
+
+    def checkpoint(self) -> None:
+        """Block while paused; raise JobCancelled if the job was cancelled."""
+        with self._condition:
+            while self._state == self.PAUSED:
+                self._condition.wait()
+            if self._state == self.CANCELLED:
+                raise JobCancelled()
+
+    async def checkpoint_async(self) -> None:
+        """``checkpoint`` for coroutines, polling so the event loop is never blocked."""
+        while self._state == self.PAUSED:
+            await asyncio.sleep(self.poll_interval)
+        if self._state == self.CANCELLED:
+            raise JobCancelled()
+
+    def snapshot(self) -> Dict:
+        with self._condition:
+            paused = self.paused_seconds
+            if self._state == self.PAUSED:
+                paused += time.monotonic() - self._paused_at
+            return {'state': self._state, 'paused_seconds': round(paused, 1)}
@@ -1,7 +1,21 @@
+import atexit
+import itertools
 import logging
 import os
-import json
-from datetime import datetime
+import queue
+import threading
+import time
+from logging.handlers import QueueHandler, QueueListener
+
+try:
+    import orjson
+
+    def _dumps(payload: dict) -> str:
+        return orjson.dumps(payload, default=str).decode()
+except ImportError:  # orjson is optional; the stdlib encoder is the fallback
+    import json
+
+    _dumps = json.JSONEncoder(separators=(',', ':'), default=str, ensure_ascii=False).encode
 
 
 class JSONFormatter(logging.Formatter):
@@ -9,7 +23,7 @@ class JSONFormatter(logging.Formatter):
 
     def format(self, record):
         log_entry = {
-            'timestamp': datetime.utcnow().isoformat() + 'Z',
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(record.created)) + f'.{int(record.msecs):03d}Z',
             'level': record.levelname,
             'message': record.getMessage(),
             'module': record.module,
@@ -23,11 +37,86 @@ class JSONFormatter(logging.Formatter):
         if hasattr(record, 'job_id'):
             log_entry['job_id'] = record.job_id
 
-        # Add exception info if present
+        # Add exception info if present (pre-rendered when queued)
         if record.exc_info:
             log_entry['exception'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            log_entry['exception'] = record.exc_text
+
+        return _dumps(log_entry)
+
+
+class ItemLogSampler(logging.Filter):
+    """Sample per-item success logs (``extra={'sampled': True}``) and cap them per second.
+
+    Every other record passes through untouched.
+    """
+
+    def __init__(self, sample_rate: float, max_per_second: int):
+        super().__init__()
+        self._every = max(1, round(1 / sample_rate)) if sample_rate > 0 else 0
+        self._max_per_second = max_per_second
+        self._counter = itertools.count()
+        self._window = 0
+        self._emitted = 0
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not getattr(record, 'sampled', False):
+            return True
+        if not self._every or next(self._counter) % self._every:
+            return False
+        with self._lock:
+            window = int(record.created)
+            if window != self._window:
+                self._window, self._emitted = window, 0
+            if self._emitted >= self._max_per_second:
+                return False
+            self._emitted += 1
+            return True
+
+
+class _DeferredFormatQueueHandler(QueueHandler):
+    """Queue records with the minimum work on the caller thread; JSON encoding happens on the listener."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+_handler: logging.Handler | None = None
+_handler_lock = threading.Lock()
+
+
+def _get_handler() -> logging.Handler:
+    """Build the process-wide handler once: a queue feeding one background writer thread."""
+    global _handler
+    with _handler_lock:
+        if _handler is not None:
+            return _handler
+
+        stream_handler = logging.StreamHandler()
+        stream_handler.setFormatter(JSONFormatter())
+
+        if os.getenv('LOG_ASYNC', 'true').lower() == 'true':
+            log_queue: queue.SimpleQueue = queue.SimpleQueue()
+            handler = _DeferredFormatQueueHandler(log_queue)
+            listener = QueueListener(log_queue, stream_handler, respect_handler_level=True)
+            listener.start()
+            atexit.register(listener.stop)
+        else:
+            handler = stream_handler
 
-        return json.dumps(log_entry)
+        handler.addFilter(ItemLogSampler(
+            sample_rate=float(os.getenv('LOG_ITEM_SAMPLE_RATE', '0.01')),
+            max_per_second=int(os.getenv('LOG_ITEM_MAX_PER_SECOND', '10'))
+        ))
+        _handler = handler
+        return handler
 
 
 def get_logger(name: str) -> logging.Logger:
@@ -42,9 +131,7 @@ def get_logger(name: str) -> logging.Logger:
     log_level = os.getenv('LOG_LEVEL', 'INFO').upper()
     logger.setLevel(getattr(logging, log_level, logging.INFO))
 
-    # Create console handler
-    handler = logging.StreamHandler()
-    handler.setFormatter(JSONFormatter())
-    logger.addHandler(handler)
+    # Shared asynchronous handler
+    logger.addHandler(_get_handler())
 
-    return logger
\ No newline at end of file
+    return logger
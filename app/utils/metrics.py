@@ -0,0 +1,124 @@
+import os
+from typing import Tuple
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    push_to_gateway,
+    write_to_textfile,
+)
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+_LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+VTEX_REQUEST_SECONDS = Histogram(
+    'vtex_request_duration_seconds', 'Latency of VTEX catalog API requests',
+    buckets=_LATENCY_BUCKETS
+)
+GEMINI_REQUEST_SECONDS = Histogram(
+    'gemini_request_duration_seconds', 'Latency of Gemini generate_content calls',
+    ['model'], buckets=_LATENCY_BUCKETS
+)
+UPSTREAM_IN_FLIGHT = Gauge(
+    'upstream_requests_in_flight', 'Requests currently in flight per upstream', ['upstream']
+)
+UPSTREAM_RETRIES = Counter(
+    'upstream_retries_total', 'Retried upstream calls', ['upstream']
+)
+UPSTREAM_ERRORS = Counter(
+    'upstream_errors_total', 'Failed upstream calls', ['upstream']
+)
+GEMINI_TOKENS = Counter(
+    'gemini_tokens_total', 'Gemini tokens from response usage metadata', ['model', 'direction']
+)
+EVALUATION_REUSE = Counter(
+    'evaluation_reuse_total', 'Products resolved without a Gemini call', ['source']
+)
+PIPELINE_QUEUE_DEPTH = Gauge(
+    'pipeline_queue_depth', 'Products waiting in a pipeline stage', ['stage']
+)
+PIPELINE_PRODUCTS = Counter(
+    'pipeline_products_total', 'Products processed per pipeline stage', ['stage']
+)
+PIPELINE_STAGE_SECONDS = Counter(
+    'pipeline_stage_seconds_total', 'Wall time spent per pipeline stage', ['stage']
+)
+PIPELINE_THROUGHPUT = Gauge(
+    'pipeline_stage_products_per_second', 'Products per second of the last completed stage run', ['stage']
+)
+UPSTREAM_RATE_LIMIT = Gauge(
+    'upstream_rate_limit_per_second', 'Current adaptive request pace per upstream', ['upstream']
+)
+UPSTREAM_THROTTLED = Counter(
+    'upstream_throttled_total', 'Throttled (429) upstream responses', ['upstream']
+)
+GEMINI_BUDGET_UTILIZATION = Gauge(
+    'gemini_budget_utilization', 'Fraction of the global daily Gemini budget used', ['dimension']
+)
+GEMINI_BUDGET_PAUSED = Counter(
+    'gemini_budget_pauses_total', 'Times Gemini calls were paused by an exhausted budget', ['scope']
+)
+WEBHOOK_DELIVERIES = Counter(
+    'webhook_deliveries_total', 'Webhook delivery outcomes', ['outcome']
+)
+WEBHOOK_QUEUE_DEPTH = Gauge(
+    'webhook_queue_depth', 'Webhook events waiting for delivery or retry'
+)
+CIRCUIT_BREAKER_OPEN = Gauge(
+    'circuit_breaker_open', 'Whether an upstream circuit breaker is open (1) or not (0)', ['upstream']
+)
+
+
+def record_stage(stage: str, products: int, seconds: float) -> None:
+    """Record products processed and wall time for one run of a pipeline stage."""
+    PIPELINE_PRODUCTS.labels(stage).inc(products)
+    PIPELINE_STAGE_SECONDS.labels(stage).inc(seconds)
+    if seconds > 0:
+        PIPELINE_THROUGHPUT.labels(stage).set(products / seconds)
+
+
+def record_gemini_usage(model: str, response) -> Tuple[int, int]:
+    """Count input/output tokens reported in a Gemini response's usage metadata; returns (input, output)."""
+    usage = getattr(response, 'usage_metadata', None)
+    if usage is None:
+        return 0, 0
+    input_tokens = usage.prompt_token_count or 0
+    # Thinking tokens are billed as output
+    output_tokens = (usage.candidates_token_count or 0) + (getattr(usage, 'thoughts_token_count', None) or 0)
+    if input_tokens:
+        GEMINI_TOKENS.labels(model, 'input').inc(input_tokens)
+    if output_tokens:
+        GEMINI_TOKENS.labels(model, 'output').inc(output_tokens)
+    # Input tokens served from cached content (already included in the input count)
+    if getattr(usage, 'cached_content_token_count', None):
+        GEMINI_TOKENS.labels(model, 'cached').inc(usage.cached_content_token_count)
+    return input_tokens, output_tokens
+
+
+def render_latest() -> tuple[bytes, str]:
+    """Return the Prometheus text exposition and its content type."""
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
+
+
+def export_metrics() -> None:
+    """Dump metrics to a node-exporter textfile and/or a Pushgateway when configured."""
+    textfile_path = os.getenv('METRICS_TEXTFILE_PATH')
+    if textfile_path:
+        try:
+            write_to_textfile(textfile_path, REGISTRY)
+            logger.info(f"Wrote metrics to {textfile_path}")
+        except Exception as e:
+            logger.warning(f"Failed to write metrics textfile: {e}")
+
+    pushgateway_url = os.getenv('METRICS_PUSHGATEWAY_URL')
+    if pushgateway_url:
+        try:
+            push_to_gateway(pushgateway_url, job=os.getenv('METRICS_JOB_NAME', 'catalog-evaluator'), registry=REGISTRY)
+            logger.info(f"Pushed metrics to {pushgateway_url}")
+        except Exception as e:
+            logger.warning(f"Failed to push metrics: {e}")
@@ -0,0 +1,62 @@
+import cProfile
+import io
+import pstats
+import tracemalloc
+from typing import Dict
+from app.utils.logger import get_logger
+from app.utils.tracing import tracer
+
+logger = get_logger(__name__)
+
+
+class RunProfiler:
+    """Captures cProfile and tracemalloc snapshots plus the stage-time breakdown for a CLI run.
+
+    cProfile only sees the calling thread (CLI control flow and the asyncio
+    loop); time spent on worker threads shows up in the stage breakdown.
+    """
+
+    def __init__(self, output_prefix: str, top: int = 25):
+        self.output_prefix = output_prefix
+        self.top = top
+        self._profile = cProfile.Profile()
+
+    def start(self) -> None:
+        tracer.enabled = True
+        tracemalloc.start(10)
+        self._profile.enable()
+
+    def stop(self) -> Dict:
+        """Stop profiling, write artifacts next to the output and return the summary."""
+        self._profile.disable()
+        stats_path = f"{self.output_prefix}.pstats"
+        self._profile.dump_stats(stats_path)
+
+        stream = io.StringIO()
+        pstats.Stats(self._profile, stream=stream).sort_stats('cumulative').print_stats(self.top)
+
+        snapshot = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        snapshot_path = f"{self.output_prefix}.tracemalloc"
+        snapshot.dump(snapshot_path)
+        top_allocations = [str(stat) for stat in snapshot.statistics('lineno')[:self.top]]
+
+        summary = {
+            'stage_breakdown': tracer.stage_summary(),
+            'memory': {'current_mb': round(current / 2**20, 2), 'peak_mb': round(peak / 2**20, 2)},
+            'cprofile_path': stats_path,
+            'tracemalloc_path': snapshot_path,
+        }
+
+        logger.info(f"Profile stage breakdown: {summary['stage_breakdown']}")
+        logger.info(f"Profile memory: {summary['memory']}")
+        print("\n=== Stage time breakdown ===")
+        for stage, stats in summary['stage_breakdown'].items():
+            print(f"{stage:<12} spans={stats['spans']:<8} total={stats['total_seconds']:>9.3f}s "
+                  f"mean={stats['mean_ms']:>8.2f}ms max={stats['max_ms']:>8.2f}ms")
+        print(f"\n=== Top functions (cumulative, main thread) ===\n{stream.getvalue()}")
+        print("=== Top allocations ===")
+        print('\n'.join(top_allocations))
+        print(f"\nProfile artifacts: {stats_path}, {snapshot_path}")
+        return summary
@@ -0,0 +1,197 @@
+import email.utils
+import os
+import re
+import threading
+import time
+from typing import Dict, Mapping, Optional, Tuple
+from app.utils.logger import get_logger
+from app.utils.metrics import UPSTREAM_RATE_LIMIT, UPSTREAM_THROTTLED
+
+logger = get_logger(__name__)
+
+
+def _parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Retry-After as delta-seconds or an HTTP date, in seconds from now."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def _parse_float(value: Optional[str]) -> Optional[float]:
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+class AdaptiveRateLimiter:
+    """Token bucket shared by every caller of one upstream, paced by its throttling signals.
+
+    The rate starts at ``initial_rate`` and doubles every second (slow start)
+    until the first 429. After that it grows by ``increase_per_second`` each
+    second and is cut by ``decrease_factor`` on each 429 (AIMD). Retry-After
+    pauses all callers. X-RateLimit-Remaining/Reset cap the rate at the
+    remaining quota spread over the reset window.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        initial_rate: float = 20.0,
+        min_rate: float = 1.0,
+        max_rate: float = 500.0,
+        burst: float = 10.0,
+        increase_per_second: float = 2.0,
+        decrease_factor: float = 0.5,
+        enabled: bool = True
+    ):
+        self.name = name
+        self.enabled = enabled
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.burst = burst
+        self.increase_per_second = increase_per_second
+        self.decrease_factor = decrease_factor
+
+        self.rate = min(max_rate, max(min_rate, initial_rate))
+        self._tokens = burst
+        self._last_refill = time.monotonic()
+        self._paused_until = 0.0
+        self._last_decrease = 0.0
+        self._slow_start = True
+        self._lock = threading.Lock()
+
+        self.throttled = 0
+        self.total_wait_seconds = 0.0
+        UPSTREAM_RATE_LIMIT.labels(name).set(self.rate)
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.burst, self._tokens + (now - self._last_refill) * self.rate)
+        self._last_refill = now
+
+    def acquire(self) -> float:
+        """Block until a request may be sent; returns the seconds waited."""
+        if not self.enabled:
+            return 0.0
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    delay = self._paused_until - now
+                else:
+                    self._refill(now)
+                    if self._tokens >= 1:
+                        self._tokens -= 1
+                        self.total_wait_seconds += waited
+                        return waited
+                    delay = (1 - self._tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+    def _set_rate(self, rate: float) -> None:
+        self.rate = min(self.max_rate, max(self.min_rate, rate))
+        UPSTREAM_RATE_LIMIT.labels(self.name).set(self.rate)
+
+    def on_response(self, status_code: int, headers: Mapping[str, str]) -> None:
+        """Adapt the pace to one response's status and rate-limit headers."""
+        if not self.enabled:
+            return
+        retry_after = _parse_retry_after(headers.get('Retry-After'))
+        remaining = _parse_float(headers.get('X-RateLimit-Remaining'))
+        reset = _parse_float(headers.get('X-RateLimit-Reset'))
+
+        with self._lock:
+            now = time.monotonic()
+            if status_code == 429:
+                self.throttled += 1
+                UPSTREAM_THROTTLED.labels(self.name).inc()
+                self._slow_start = False
+                # Responses already in flight report the same overload; cut once per second
+                if now - self._last_decrease >= 1.0:
+                    self._last_decrease = now
+                    self._set_rate(self.rate * self.decrease_factor)
+                    logger.warning(f"{self.name} throttled; pacing at {self.rate:.1f} req/s")
+                self._paused_until = max(self._paused_until, now + (retry_after or 1.0 / self.rate))
+                self._tokens = 0.0
+                return
+
+            if retry_after:
+                self._paused_until = max(self._paused_until, now + retry_after)
+
+            if remaining is not None and reset is not None:
+                # Reset may be seconds-until-reset or an epoch timestamp
+                window = reset - time.time() if reset > 1e9 else reset
+                if window > 0:
+                    sustainable = remaining / window
+                    if sustainable < self.rate:
+                        self._set_rate(sustainable)
+                        return
+
+            if status_code < 400:
+                step = 1.0 if self._slow_start else self.increase_per_second / self.rate
+                self._set_rate(self.rate + step)
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {
+                'name': self.name,
+                'enabled': self.enabled,
+                'rate_per_second': round(self.rate, 2),
+                'slow_start': self._slow_start,
+                'paused_for_seconds': round(max(0.0, self._paused_until - time.monotonic()), 2),
+                'throttled_responses': self.throttled,
+                'total_wait_seconds': round(self.total_wait_seconds, 2),
+            }
+
+
+_limiters: Dict[Tuple[str, str], AdaptiveRateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def scope_env_name(name: str, scope: str) -> str:
+    """Env prefix of an upstream scope, e.g. ('vtex', 'my-store') -> 'VTEX_MY_STORE'."""
+    return re.sub(r'[^0-9A-Za-z]', '_', f"{name}_{scope}").upper()
+
+
+def get_rate_limiter(name: str, scope: str = '') -> AdaptiveRateLimiter:
+    """Return the process-wide limiter for an upstream (and account scope), created from env settings.
+
+    Settings are read from ``<NAME>_RATE_LIMIT_<SETTING>``; a scope can
+    override them with ``<NAME>_<SCOPE>_RATE_LIMIT_<SETTING>``.
+    """
+    prefix = f"{name.upper()}_RATE_LIMIT"
+    scoped_prefix = f"{scope_env_name(name, scope)}_RATE_LIMIT" if scope else prefix
+
+    def setting(key: str, default: str) -> str:
+        return os.getenv(f"{scoped_prefix}_{key}", os.getenv(f"{prefix}_{key}", default))
+
+    with _limiters_lock:
+        limiter = _limiters.get((name, scope))
+        if limiter is None:
+            limiter = AdaptiveRateLimiter(
+                f"{name}:{scope}" if scope else name,
+                initial_rate=float(setting('INITIAL', '20')),
+                min_rate=float(setting('MIN', '1')),
+                max_rate=float(setting('MAX', '500')),
+                burst=float(setting('BURST', '10')),
+                increase_per_second=float(setting('INCREASE', '2')),
+                decrease_factor=float(setting('DECREASE', '0.5')),
+                enabled=setting('ENABLED', 'true').lower() == 'true',
+            )
+            _limiters[(name, scope)] = limiter
+        return limiter
+
+
+def rate_limiter_snapshots() -> Dict[str, Dict]:
+    """Current pace and counters of every limiter created in this process."""
+    with _limiters_lock:
+        limiters = list(_limiters.values())
+    return {limiter.name: limiter.snapshot() for limiter in limiters}
@@ -0,0 +1,93 @@
+import json
+import re
+from dataclasses import dataclass
+from typing import Optional
+
+# Whole-line values, as the original line-by-line parser read them: "SCORE: 3." is not a score
+_SCORE_LINE_PATTERN = re.compile(r"^[^\S\n]*SCORE:(.*)$", re.MULTILINE)
+_REASON_LINE_PATTERN = re.compile(r"^[^\S\n]*REASON:(.*)$", re.MULTILINE)
+_FALLBACK_SCORE_PATTERN = re.compile(r"\b([1-5])\b")
+
+# Response schema for Gemini JSON mode; kept as a plain dict so it can be
+# reused in batch request files as well as GenerateContentConfig.
+EVALUATION_RESPONSE_SCHEMA = {
+    'type': 'OBJECT',
+    'properties': {
+        'score': {'type': 'INTEGER', 'description': 'Quality score from 1 (excellent) to 5 (very poor)'},
+        'reason': {'type': 'STRING', 'description': 'Brief explanation in English, at most 150 characters'},
+        'confidence': {'type': 'NUMBER', 'description': 'Confidence in the score from 0 to 1'},
+    },
+    'required': ['score', 'reason'],
+    'propertyOrdering': ['score', 'reason', 'confidence'],
+}
+
+
+class ResponseParseError(ValueError):
+    """Raised when a model response does not match the expected format."""
+
+
+@dataclass
+class ParsedEvaluation:
+    """Score and reason extracted from a model response."""
+    score: int
+    reason: str
+    confidence: Optional[float] = None
+
+
+def parse_text_response(raw_response: str, strict: bool = False) -> ParsedEvaluation:
+    """Parse the legacy SCORE:/REASON: free-text format.
+
+    Lenient by default: falls back to the first 1-5 digit and finally to the
+    poor-quality score, matching the original text-mode behavior. With
+    ``strict`` a missing or out-of-range SCORE: line raises
+    ResponseParseError instead (used where a better model can be asked).
+    """
+    score: Optional[int] = None
+    # The last SCORE: line holding a plain integer wins
+    for score_match in _SCORE_LINE_PATTERN.finditer(raw_response):
+        try:
+            score = int(score_match.group(1))
+        except ValueError:
+            pass
+
+    if strict and (score is None or not (1 <= score <= 5)):
+        raise ResponseParseError("Missing or invalid SCORE: line")
+
+    reasons = _REASON_LINE_PATTERN.findall(raw_response)
+    reason = reasons[-1].strip() if reasons else "Evaluation completed"
+
+    if score is None:
+        fallback = _FALLBACK_SCORE_PATTERN.search(raw_response)
+        score = int(fallback.group(1)) if fallback else 5
+
+    if not (1 <= score <= 5):
+        return ParsedEvaluation(score=5, reason="Invalid score received, defaulted to poor quality")
+
+    return ParsedEvaluation(score=score, reason=reason)
+
+
+def parse_json_response(raw_response: str) -> ParsedEvaluation:
+    """Strictly parse a JSON-mode response, raising ResponseParseError on any deviation."""
+    try:
+        payload = json.loads(raw_response)
+    except json.JSONDecodeError as e:
+        raise ResponseParseError(f"Invalid JSON: {e.msg}") from e
+
+    if not isinstance(payload, dict):
+        raise ResponseParseError("Expected a JSON object")
+
+    score = payload.get('score')
+    if type(score) is not int or not (1 <= score <= 5):
+        raise ResponseParseError(f"Invalid score: {score!r}")
+
+    reason = payload.get('reason')
+    if not isinstance(reason, str) or not reason.strip():
+        raise ResponseParseError("Missing reason")
+
+    confidence = payload.get('confidence')
+    if confidence is not None:
+        if isinstance(confidence, bool) or not isinstance(confidence, (int, float)) or not (0 <= confidence <= 1):
+            raise ResponseParseError(f"Invalid confidence: {confidence!r}")
+        confidence = float(confidence)
+
+    return ParsedEvaluation(score=score, reason=reason.strip(), confidence=confidence)
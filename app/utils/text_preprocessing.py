@@ -0,0 +1,85 @@
+import html
+import re
+from dataclasses import dataclass
+
+HTML_TAG_PATTERN = re.compile(r"<[^>]*>")
+
+_SCRIPT_STYLE_PATTERN = re.compile(r"<(script|style)\b[^>]*>.*?</\1\s*>", re.IGNORECASE | re.DOTALL)
+_COMMENT_PATTERN = re.compile(r"<!--.*?-->", re.DOTALL)
+_BLOCK_TAG_PATTERN = re.compile(r"</?(?:p|div|br|li|tr|ul|ol|table|h[1-6])\b[^>]*>", re.IGNORECASE)
+_CELL_END_PATTERN = re.compile(r"</t[dh]\s*>", re.IGNORECASE)
+_TRAILING_CELL_PATTERN = re.compile(r"[ |]*\|[ ]*$", re.MULTILINE)
+_INLINE_WHITESPACE_PATTERN = re.compile(r"[^\S\n]+")
+_LINE_BREAK_PATTERN = re.compile(r" *\n[\s]*")
+_BOUNDARY_PATTERN = re.compile(r"[.!?;](?=\s)|\n")
+
+# Rough average for Portuguese/English text with the Gemini tokenizer
+CHARS_PER_TOKEN = 4
+
+
+@dataclass
+class PreprocessedDescription:
+    """Description text reduced for prompting, with size bookkeeping."""
+    text: str
+    original_chars: int
+    reduced_chars: int
+    truncated: bool = False
+
+    @property
+    def estimated_tokens(self) -> int:
+        return -(-self.reduced_chars // CHARS_PER_TOKEN)
+
+
+def strip_html(text: str) -> str:
+    """Remove markup, scripts/styles and entities, keeping one line per block element."""
+    text = _SCRIPT_STYLE_PATTERN.sub(' ', text)
+    text = _COMMENT_PATTERN.sub(' ', text)
+    text = _BLOCK_TAG_PATTERN.sub('\n', text)
+    text = _CELL_END_PATTERN.sub(' | ', text)
+    text = HTML_TAG_PATTERN.sub(' ', text)
+    text = html.unescape(text)
+    text = _INLINE_WHITESPACE_PATTERN.sub(' ', text)
+    text = _TRAILING_CELL_PATTERN.sub('', text)
+    return _LINE_BREAK_PATTERN.sub('\n', text).strip()
+
+
+def _drop_repeated_lines(text: str) -> str:
+    """Drop lines repeated verbatim, which is common in generated spec tables."""
+    seen = set()
+    lines = []
+    for line in text.split('\n'):
+        key = line.strip(' |').lower()
+        if not key or key in seen:
+            continue
+        seen.add(key)
+        lines.append(line)
+    return '\n'.join(lines)
+
+
+def truncate_to_budget(text: str, max_tokens: int) -> tuple[str, bool]:
+    """Cut text to roughly max_tokens, preferring a sentence or line boundary."""
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    if max_tokens <= 0 or len(text) <= max_chars:
+        return text, False
+
+    head = text[:max_chars]
+    boundaries = [match.end() for match in _BOUNDARY_PATTERN.finditer(head)]
+    # Only cut at a boundary when it keeps most of the budget
+    if boundaries and boundaries[-1] >= max_chars // 2:
+        head = head[:boundaries[-1]]
+    else:
+        head = head.rsplit(' ', 1)[0] if ' ' in head else head
+    return head.rstrip() + ' [...]', True
+
+
+def preprocess_description(text: str | None, max_tokens: int = 0) -> PreprocessedDescription:
+    """Strip markup, normalize whitespace/entities and apply the token budget."""
+    original = text or ''
+    reduced = _drop_repeated_lines(strip_html(original))
+    reduced, truncated = truncate_to_budget(reduced, max_tokens)
+    return PreprocessedDescription(
+        text=reduced,
+        original_chars=len(original),
+        reduced_chars=len(reduced),
+        truncated=truncated
+    )
@@ -0,0 +1,110 @@
+import contextlib
+import json
+import threading
+import time
+import uuid
+from typing import Dict, Iterator, Optional
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+_NOOP_SPAN = contextlib.nullcontext()
+
+
+class Tracer:
+    """Minimal OpenTelemetry-style span recorder for per-product pipeline stages.
+
+    Spans are written as JSON lines (one span per line, OTLP-like field names)
+    when an export path is configured, and per-stage totals are aggregated for
+    the profiling summary.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self._run_id = uuid.uuid4().hex
+        self._export_file = None
+        self._lock = threading.Lock()
+        self._stage_totals: Dict[str, list] = {}
+
+    def configure(self, export_path: Optional[str] = None, enabled: bool = False) -> None:
+        """Enable span collection and optionally open the JSONL export file."""
+        self.close()
+        self.enabled = enabled or bool(export_path)
+        if export_path:
+            self._export_file = open(export_path, 'a', encoding='utf-8', buffering=1 << 16)
+            logger.info(f"Exporting trace spans to {export_path}")
+
+    def flush(self) -> None:
+        """Write buffered spans out, e.g. when a long-running process finishes a job."""
+        with self._lock:
+            if self._export_file:
+                self._export_file.flush()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._export_file:
+                self._export_file.close()
+                self._export_file = None
+
+    def _trace_id(self, product_id: Optional[str]) -> str:
+        # One trace per product per run, so every stage of a product shares it
+        return uuid.uuid5(uuid.NAMESPACE_OID, f"{self._run_id}:{product_id}").hex
+
+    def span(self, name: str, product_id: Optional[str] = None, **attributes):
+        """Context manager timing one stage; a shared no-op when tracing is off."""
+        if not self.enabled:
+            return _NOOP_SPAN
+        return self._span(name, product_id, attributes)
+
+    @contextlib.contextmanager
+    def _span(self, name: str, product_id: Optional[str], attributes: Dict) -> Iterator[Dict]:
+        start_ns = time.time_ns()
+        started = time.perf_counter()
+        status = 'OK'
+        try:
+            yield attributes
+        except BaseException:
+            status = 'ERROR'
+            raise
+        finally:
+            duration = time.perf_counter() - started
+            self._record(name, product_id, attributes, start_ns, duration, status)
+
+    def _record(self, name: str, product_id: Optional[str], attributes: Dict,
+                start_ns: int, duration: float, status: str) -> None:
+        with self._lock:
+            totals = self._stage_totals.setdefault(name, [0, 0.0, 0.0])
+            totals[0] += 1
+            totals[1] += duration
+            totals[2] = max(totals[2], duration)
+
+            if self._export_file:
+                if product_id is not None:
+                    attributes = {'product_id': product_id, **attributes}
+                self._export_file.write(json.dumps({
+                    'trace_id': self._trace_id(product_id),
+                    'span_id': uuid.uuid4().hex[:16],
+                    'name': name,
+                    'start_time_unix_nano': start_ns,
+                    'end_time_unix_nano': start_ns + int(duration * 1e9),
+                    'status': status,
+                    'attributes': attributes,
+                }, default=str) + '\n')
+
+    def stage_summary(self) -> Dict[str, Dict]:
+        """Per-stage span count, total, mean and max time."""
+        with self._lock:
+            return {
+                name: {
+                    'spans': count,
+                    'total_seconds': round(total, 3),
+                    'mean_ms': round(total / count * 1000, 2) if count else 0.0,
+                    'max_ms': round(longest * 1000, 2),
+                }
+                for name, (count, total, longest) in sorted(
+                    self._stage_totals.items(), key=lambda item: item[1][1], reverse=True
+                )
+            }
+
+
+tracer = Tracer()
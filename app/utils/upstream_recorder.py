@@ -0,0 +1,144 @@
+import atexit
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Dict, Optional, Tuple
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+MODE_OFF = 'off'
+MODE_RECORD = 'record'
+MODE_REPLAY = 'replay'
+
+_COMMIT_EVERY = 200
+
+
+class RecordingNotFoundError(LookupError):
+    """Raised in replay mode when a request was never recorded."""
+
+    def __init__(self, upstream: str, key: str):
+        super().__init__(f"No recorded {upstream} response for request {key[:12]}")
+        self.upstream = upstream
+        self.key = key
+
+
+class UpstreamRecorder:
+    """Capture raw upstream responses to a SQLite file and serve them back offline.
+
+    Responses are keyed by a SHA-256 of the request (upstream, account/model,
+    endpoint/prompt/config) and stored zlib-compressed together with the HTTP
+    status, so a replayed run sees the same payloads and the same 404s.
+    """
+
+    def __init__(self, mode: str, path: str, replay_latency_ms: float = 0.0):
+        if mode not in (MODE_RECORD, MODE_REPLAY):
+            raise ValueError(f"Unsupported upstream record mode: {mode}")
+        self.mode = mode
+        self.path = path
+        self._replay_latency = replay_latency_ms / 1000
+        self._lock = threading.Lock()
+        self._pending = 0
+        self.hits = 0
+        self.misses = 0
+        self.recorded = 0
+
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS responses ('
+            ' upstream TEXT NOT NULL,'
+            ' request_key TEXT NOT NULL,'
+            ' status INTEGER NOT NULL,'
+            ' payload BLOB NOT NULL,'
+            ' recorded_at REAL NOT NULL,'
+            ' PRIMARY KEY (upstream, request_key)'
+            ') WITHOUT ROWID'
+        )
+        self._conn.commit()
+        logger.info(f"Upstream {mode} mode using {path}")
+
+    @property
+    def replaying(self) -> bool:
+        return self.mode == MODE_REPLAY
+
+    @property
+    def recording(self) -> bool:
+        return self.mode == MODE_RECORD
+
+    @staticmethod
+    def request_key(*parts: str) -> str:
+        digest = hashlib.sha256()
+        for part in parts:
+            digest.update(part.encode('utf-8'))
+            digest.update(b'\x00')
+        return digest.hexdigest()
+
+    def store(self, upstream: str, key: str, payload: bytes, status: int = 200) -> None:
+        """Save one response; commits are batched to keep recording cheap."""
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)',
+                (upstream, key, status, zlib.compress(payload, 6), time.time())
+            )
+            self.recorded += 1
+            self._pending += 1
+            if self._pending >= _COMMIT_EVERY:
+                self._conn.commit()
+                self._pending = 0
+
+    def load(self, upstream: str, key: str) -> Tuple[int, bytes]:
+        """Return (status, payload) for a recorded request or raise RecordingNotFoundError."""
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT status, payload FROM responses WHERE upstream = ? AND request_key = ?',
+                (upstream, key)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        if row is None:
+            raise RecordingNotFoundError(upstream, key)
+        if self._replay_latency:
+            time.sleep(self._replay_latency)
+        return row[0], zlib.decompress(row[1])
+
+    def report(self) -> Dict:
+        with self._lock:
+            return {'mode': self.mode, 'path': self.path, 'recorded': self.recorded,
+                    'replay_hits': self.hits, 'replay_misses': self.misses}
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is None:
+                return
+            self._conn.commit()
+            self._conn.close()
+            self._conn = None
+        logger.info("Upstream recorder closed", extra=self.report())
+
+
+_recorder: Optional[UpstreamRecorder] = None
+_recorder_lock = threading.Lock()
+
+
+def get_upstream_recorder() -> Optional[UpstreamRecorder]:
+    """Return the process-wide recorder, or None when UPSTREAM_RECORD_MODE is off."""
+    global _recorder
+    mode = os.getenv('UPSTREAM_RECORD_MODE', MODE_OFF).lower()
+    if mode == MODE_OFF:
+        return None
+    with _recorder_lock:
+        if _recorder is None:
+            _recorder = UpstreamRecorder(
+                mode,
+                os.getenv('UPSTREAM_RECORD_PATH', 'upstream_recording.sqlite3'),
+                replay_latency_ms=float(os.getenv('UPSTREAM_REPLAY_LATENCY_MS', '0'))
+            )
+            atexit.register(_recorder.close)
+        return _recorder
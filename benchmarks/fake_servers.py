@@ -0,0 +1,402 @@
+"""Local stand-in servers for the VTEX catalog API, the Gemini API and job webhook receivers.
+
+All servers run in background threads, draw latencies from a log-normal
+distribution and can inject server errors and 429 throttling responses.
+They count every request so benchmarks can report upstream call volumes.
+"""
+
+import json
+import math
+import random
+import re
+import threading
+import time
+import uuid
+import zlib
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+from urllib.parse import parse_qs, urlparse
+
+_WORDS = (
+    "camiseta algodão macio confortável tecido resistente costura reforçada modelagem "
+    "regular gola redonda ideal para uso diário lavagem fácil cor firme tamanho "
+    "disponível produto qualidade premium acabamento elegante leve respirável durável"
+).split()
+
+
+@dataclass
+class UpstreamProfile:
+    """Latency and failure behaviour of a fake upstream."""
+    median_latency_ms: float = 50.0
+    latency_sigma: float = 0.5
+    error_rate: float = 0.0
+    throttle_rate: float = 0.0
+    rate_limit_per_second: float = 0.0
+    seed: Optional[int] = None
+
+    def __post_init__(self):
+        self._random = random.Random(self.seed)
+        self._lock = threading.Lock()
+        self._window = 0
+        self._window_calls = 0
+
+    def admit(self) -> Dict[str, str] | None:
+        """Enforce the account rate limit (fixed one-second windows).
+
+        Returns None when the request is admitted, otherwise the 429 headers.
+        """
+        if not self.rate_limit_per_second:
+            return None
+        now = time.time()
+        with self._lock:
+            if int(now) != self._window:
+                self._window, self._window_calls = int(now), 0
+            self._window_calls += 1
+            remaining = int(self.rate_limit_per_second) - self._window_calls
+        if remaining >= 0:
+            return None
+        return {
+            'Retry-After': f"{1 - now % 1:.3f}",
+            'X-RateLimit-Remaining': '0',
+            'X-RateLimit-Reset': f"{1 - now % 1:.3f}",
+        }
+
+    def sample_latency(self) -> float:
+        with self._lock:
+            return self.median_latency_ms / 1000 * math.exp(self._random.gauss(0, self.latency_sigma))
+
+    def sample_outcome(self) -> str:
+        """Return 'throttle', 'error' or 'ok' for one request."""
+        with self._lock:
+            roll = self._random.random()
+        if roll < self.throttle_rate:
+            return 'throttle'
+        if roll < self.throttle_rate + self.error_rate:
+            return 'error'
+        return 'ok'
+
+
+@dataclass
+class CallCounters:
+    """Thread-safe request counters keyed by outcome."""
+    counts: Dict[str, int] = field(default_factory=dict)
+
+    def __post_init__(self):
+        self._lock = threading.Lock()
+
+    def increment(self, key: str) -> None:
+        with self._lock:
+            self.counts[key] = self.counts.get(key, 0) + 1
+
+    def snapshot(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self.counts)
+
+
+class _FakeServer:
+    """Shared lifecycle for the fake HTTP servers."""
+
+    handler_class: type
+
+    def __init__(self, profile: UpstreamProfile, host: str = '127.0.0.1', port: int = 0):
+        self.profile = profile
+        self.counters = CallCounters()
+        handler = type('BoundHandler', (self.handler_class,), {'server_state': self})
+        self._server = ThreadingHTTPServer((host, port), handler)
+        self._server.daemon_threads = True
+        self._server.request_queue_size = 1024
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "_FakeServer":
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+
+class _JSONHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    server_state: _FakeServer
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status: int, payload: Dict, headers: Optional[Dict[str, str]] = None) -> None:
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _simulate(self, counter_prefix: str) -> str:
+        """Sleep for a sampled latency and return the injected outcome."""
+        state = self.server_state
+        self._throttle_headers = state.profile.admit()
+        if self._throttle_headers is not None:
+            state.counters.increment(f"{counter_prefix}_rate_limited")
+            return 'throttle'
+        time.sleep(state.profile.sample_latency())
+        outcome = state.profile.sample_outcome()
+        state.counters.increment(f"{counter_prefix}_{outcome}")
+        return outcome
+
+
+class _VtexHandler(_JSONHandler):
+    _PRODUCT_PATH = re.compile(r"^/api/catalog/pvt/product/([^/?]+)")
+    _LISTING_PATH = '/api/catalog_system/pvt/products/GetProductAndSkuIds'
+
+    def _listing(self):
+        query = parse_qs(urlparse(self.path).query)
+        start = int(query.get('_from', ['1'])[0])
+        end = int(query.get('_to', ['250'])[0])
+        outcome = self._simulate('listing')
+        if outcome != 'ok':
+            self._send_json(429 if outcome == 'throttle' else 503, {'error': outcome})
+            return
+
+        catalog_size = self.server_state.catalog_size
+        category_id = query.get('categoryId', [None])[0]
+        if category_id is not None:
+            # Products are spread over 50 categories by id
+            product_ids = [i for i in range(1, catalog_size + 1) if i % 50 == int(category_id)]
+        else:
+            product_ids = range(1, catalog_size + 1)
+        page = product_ids[start - 1:end]
+        self._send_json(200, {
+            'data': {str(product_id): [product_id * 10] for product_id in page},
+            'range': {'total': len(product_ids), 'from': start, 'to': end},
+        })
+
+    def do_GET(self):
+        if self.path.startswith(self._LISTING_PATH):
+            self._listing()
+            return
+
+        match = self._PRODUCT_PATH.match(self.path)
+        if not match:
+            self._send_json(404, {'error': 'not found'})
+            return
+
+        product_id = match.group(1)
+        if not product_id.isdigit():
+            self.server_state.counters.increment('product_not_found')
+            self._send_json(404, {'error': 'Product not found'})
+            return
+
+        outcome = self._simulate('product')
+        if outcome == 'throttle':
+            self._send_json(429, {'error': 'Too Many Requests'}, self._throttle_headers or {'Retry-After': '1'})
+            return
+        if outcome == 'error':
+            self._send_json(503, {'error': 'Service Unavailable'})
+            return
+
+        state = self.server_state
+        self._send_json(200, {
+            'Id': product_id,
+            'Name': f"Produto {product_id}",
+            'Description': state.description_for(product_id),
+            'CategoryId': int(product_id) % 50,
+            'BrandId': int(product_id) % 20,
+        })
+
+
+class FakeVtexServer(_FakeServer):
+    """Serves product details with generated descriptions and paged catalog listing."""
+
+    handler_class = _VtexHandler
+
+    def __init__(self, profile: UpstreamProfile, description_words: int = 80, catalog_size: int = 100000, **kwargs):
+        super().__init__(profile, **kwargs)
+        self.description_words = description_words
+        self.catalog_size = catalog_size
+
+    def description_for(self, product_id: str) -> str:
+        rng = random.Random(product_id)
+        words = [rng.choice(_WORDS) for _ in range(self.description_words)]
+        return f"<p>{' '.join(words)}.</p><ul><li>Peso: {rng.randint(100, 900)}g</li></ul>"
+
+
+def _text_of(content: Optional[Dict]) -> str:
+    return ''.join(part.get('text', '') for part in (content or {}).get('parts', []))
+
+
+class _GeminiHandler(_JSONHandler):
+    _GENERATE_PATH = re.compile(r"^/[^/]+/(?:models|tunedModels)/([^:/]+):generateContent")
+    _CACHES_PATH = re.compile(r"^/[^/]+/cachedContents(?:/([^/?]+))?")
+
+    def _read_json(self) -> Dict:
+        length = int(self.headers.get('Content-Length') or 0)
+        return json.loads(self.rfile.read(length) or b'{}')
+
+    def _not_found(self) -> None:
+        self._send_json(404, {'error': {'code': 404, 'message': 'not found', 'status': 'NOT_FOUND'}})
+
+    def _cached_contents(self, method: str, cache_id: Optional[str]) -> None:
+        state = self.server_state
+        request = self._read_json() if method in ('POST', 'PATCH') else {}
+        if method == 'POST':
+            instructions = _text_of(request.get('systemInstruction'))
+            tokens = len(instructions) // 4
+            if tokens < state.min_cache_tokens:
+                state.counters.increment('cache_rejected')
+                self._send_json(400, {'error': {
+                    'code': 400, 'status': 'INVALID_ARGUMENT',
+                    'message': f"Cached content is too small. total_token_count={tokens}, min_total_token_count={state.min_cache_tokens}",
+                }})
+                return
+            cache_id = uuid.uuid4().hex[:12]
+            state.caches[cache_id] = instructions
+            state.counters.increment('cache_create')
+        elif cache_id not in state.caches:
+            self._not_found()
+            return
+        elif method == 'PATCH':
+            state.counters.increment('cache_update')
+        elif method == 'DELETE':
+            del state.caches[cache_id]
+            state.counters.increment('cache_delete')
+            self._send_json(200, {})
+            return
+
+        self._send_json(200, {
+            'name': f"cachedContents/{cache_id}",
+            'model': 'models/gemini-flash-latest',
+            'usageMetadata': {'totalTokenCount': len(state.caches[cache_id]) // 4},
+        })
+
+    def do_GET(self):
+        match = self._CACHES_PATH.match(self.path)
+        if match:
+            self._cached_contents('GET', match.group(1))
+            return
+        # models.list() at evaluator start-up
+        self.server_state.counters.increment('list_models')
+        self._send_json(200, {'models': [{'name': 'models/gemini-flash-latest'}]})
+
+    def do_PATCH(self):
+        match = self._CACHES_PATH.match(self.path)
+        if not match:
+            self._not_found()
+            return
+        self._cached_contents('PATCH', match.group(1))
+
+    def do_DELETE(self):
+        match = self._CACHES_PATH.match(self.path)
+        if not match:
+            self._not_found()
+            return
+        self._cached_contents('DELETE', match.group(1))
+
+    def do_POST(self):
+        caches_match = self._CACHES_PATH.match(self.path)
+        if caches_match:
+            self._cached_contents('POST', caches_match.group(1))
+            return
+        request = self._read_json()
+        match = self._GENERATE_PATH.match(self.path)
+        if not match:
+            self._not_found()
+            return
+
+        instructions = _text_of(request.get('systemInstruction'))
+        cached_tokens = 0
+        if request.get('cachedContent'):
+            cached = self.server_state.caches.get(request['cachedContent'].rsplit('/', 1)[-1])
+            if cached is None:
+                self._send_json(403, {'error': {'code': 403, 'message': 'CachedContent not found (or permission denied)',
+                                                'status': 'PERMISSION_DENIED'}})
+                return
+            cached_tokens = len(cached) // 4
+
+        outcome = self._simulate('generate')
+        if outcome == 'throttle':
+            self._send_json(429, {'error': {'code': 429, 'message': 'Quota exceeded', 'status': 'RESOURCE_EXHAUSTED'}})
+            return
+        if outcome == 'error':
+            self._send_json(503, {'error': {'code': 503, 'message': 'Overloaded', 'status': 'UNAVAILABLE'}})
+            return
+
+        prompt = ''.join(_text_of(content) for content in request.get('contents', []))
+        score = 1 + zlib.crc32(prompt.encode()) % 5
+        generation_config = request.get('generationConfig') or {}
+        if generation_config.get('responseMimeType') == 'application/json':
+            text = json.dumps({'score': score, 'reason': 'Synthetic benchmark evaluation', 'confidence': 0.9})
+        else:
+            text = f"SCORE: {score}\nREASON: Synthetic benchmark evaluation"
+
+        prompt_tokens = (len(prompt) + len(instructions)) // 4 + cached_tokens
+        usage = {
+            'promptTokenCount': prompt_tokens,
+            'candidatesTokenCount': len(text) // 4,
+            'totalTokenCount': prompt_tokens + len(text) // 4,
+        }
+        if cached_tokens:
+            usage['cachedContentTokenCount'] = cached_tokens
+        self._send_json(200, {
+            'candidates': [{'content': {'parts': [{'text': text}], 'role': 'model'}, 'finishReason': 'STOP'}],
+            'usageMetadata': usage,
+            'modelVersion': match.group(1),
+        })
+
+
+class FakeGeminiServer(_FakeServer):
+    """Serves models.list, generateContent and cachedContents in the Gemini REST format.
+
+    Cache creation is refused below ``min_cache_tokens`` (approximated as
+    characters / 4), like the real API's minimum cacheable size.
+    """
+
+    handler_class = _GeminiHandler
+
+    def __init__(self, profile: UpstreamProfile, min_cache_tokens: int = 0, **kwargs):
+        super().__init__(profile, **kwargs)
+        self.min_cache_tokens = min_cache_tokens
+        self.caches: Dict[str, str] = {}
+
+
+class _WebhookHandler(_JSONHandler):
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length)
+        outcome = self._simulate('webhook')
+        if outcome != 'ok':
+            self._send_json(429 if outcome == 'throttle' else 503, {'error': outcome})
+            return
+        self.server_state.record(self.headers, body)
+        self._send_json(200, {'received': True})
+
+
+class FakeWebhookReceiver(_FakeServer):
+    """Records job webhook events and checks their signatures against ``secret``."""
+
+    handler_class = _WebhookHandler
+
+    def __init__(self, profile: UpstreamProfile, secret: Optional[str] = None, **kwargs):
+        super().__init__(profile, **kwargs)
+        self.secret = secret
+        self.events = []
+        self._events_lock = threading.Lock()
+
+    def record(self, headers, body: bytes) -> None:
+        from app.services.webhook_notifier import verify_signature
+
+        event = json.loads(body)
+        event['signature_valid'] = (
+            verify_signature(self.secret, headers.get('X-Webhook-Timestamp', ''), body,
+                             headers.get('X-Webhook-Signature', ''))
+            if self.secret else None
+        )
+        with self._events_lock:
+            self.events.append(event)
@@ -0,0 +1,276 @@
+"""Throughput benchmark for the evaluation pipeline against local fake upstreams.
+
+Runs each (target, size) scenario in a fresh subprocess so peak RSS is
+per-scenario, and prints one JSON document with products/sec, per-product
+p50/p99 latency (from trace spans), peak RSS and upstream call counts.
+
+    python -m benchmarks.run_benchmark --sizes 1000,10000 --targets service,cli,api
+"""
+
+import argparse
+import json
+import os
+import resource
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from typing import Dict, List
+
+from benchmarks.fake_servers import FakeGeminiServer, FakeVtexServer, UpstreamProfile
+
+TARGETS = ('service', 'cli', 'api')
+
+
+def _percentile(sorted_values: List[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(q * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def _latency_summary(values: List[float]) -> Dict[str, float]:
+    values = sorted(values)
+    return {
+        'p50_ms': round(_percentile(values, 0.50) * 1000, 2),
+        'p99_ms': round(_percentile(values, 0.99) * 1000, 2),
+        'max_ms': round(values[-1] * 1000, 2) if values else 0.0,
+    }
+
+
+def summarize_trace(trace_path: str) -> Dict:
+    """Per-product end-to-end latency (first span start to last span end) and per-stage latency."""
+    bounds: Dict[str, List[int]] = {}
+    stages: Dict[str, List[float]] = {}
+    with open(trace_path, encoding='utf-8') as f:
+        for line in f:
+            span = json.loads(line)
+            start, end = span['start_time_unix_nano'], span['end_time_unix_nano']
+            stages.setdefault(span['name'], []).append((end - start) / 1e9)
+            if 'product_id' not in span['attributes']:
+                continue
+            product_bounds = bounds.get(span['trace_id'])
+            if product_bounds is None:
+                bounds[span['trace_id']] = [start, end]
+            else:
+                product_bounds[0] = min(product_bounds[0], start)
+                product_bounds[1] = max(product_bounds[1], end)
+
+    return {
+        'products_traced': len(bounds),
+        'end_to_end': _latency_summary([(end - start) / 1e9 for start, end in bounds.values()]),
+        'stages': {name: _latency_summary(values) for name, values in sorted(stages.items())},
+    }
+
+
+def _write_input_csv(size: int, directory: str) -> str:
+    path = os.path.join(directory, 'product_ids.csv')
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('product_id\n')
+        f.writelines(f"{product_id}\n" for product_id in range(1, size + 1))
+    return path
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+# --- child side: runs inside the scenario subprocess -------------------------
+
+def _run_service(size: int, workdir: str) -> int:
+    from app.services.evaluation_service import EvaluationService
+    from app.utils.tracing import tracer
+
+    tracer.configure(export_path=os.environ['TRACE_EXPORT_PATH'])
+    evaluated = 0
+    try:
+        service = EvaluationService()
+        for batch in service.evaluate_catalog_batches([str(i) for i in range(1, size + 1)]):
+            evaluated += len(batch)
+    finally:
+        tracer.close()
+    return evaluated
+
+
+def _run_cli(size: int, workdir: str) -> int:
+    from app import main as cli
+
+    output = os.path.join(workdir, 'results.csv')
+    sys.argv = ['app.main', '--input', _write_input_csv(size, workdir), '--output', output]
+    cli.main()
+    with open(output, encoding='utf-8') as f:
+        return sum(1 for _ in f) - 1
+
+
+def _run_api(size: int, workdir: str) -> int:
+    import requests
+    import uvicorn
+
+    port = _free_port()
+    server = uvicorn.Server(uvicorn.Config('app.api:app', host='127.0.0.1', port=port, log_level='warning'))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    base_url = f"http://127.0.0.1:{port}"
+    headers = {'X-API-Key': os.environ['API_KEY']}
+    try:
+        deadline = time.monotonic() + 30
+        while not server.started:
+            if time.monotonic() > deadline:
+                raise RuntimeError("API server did not start")
+            time.sleep(0.05)
+
+        with open(_write_input_csv(size, workdir), 'rb') as f:
+            response = requests.post(f"{base_url}/evaluate", headers=headers,
+                                     files={'file': ('product_ids.csv', f, 'text/csv')})
+        response.raise_for_status()
+        job_id = response.json()['job_id']
+
+        while True:
+            status = requests.get(f"{base_url}/status/{job_id}").json()
+            if status['status'] in ('completed', 'failed', 'cancelled'):
+                break
+            if status['status'] not in ('processing', 'paused', 'cancelling'):
+                raise RuntimeError(f"API job reported unexpected status {status['status']}")
+            time.sleep(0.2)
+        if status['status'] != 'completed':
+            raise RuntimeError(f"API job ended with status {status['status']}")
+        return status['progress']['processed']
+    finally:
+        server.should_exit = True
+        thread.join(timeout=10)
+
+
+_RUNNERS = {'service': _run_service, 'cli': _run_cli, 'api': _run_api}
+
+
+def run_child(target: str, size: int, workdir: str, result_path: str) -> None:
+    started = time.perf_counter()
+    evaluated = _RUNNERS[target](size, workdir)
+    wall_seconds = time.perf_counter() - started
+
+    # ru_maxrss is KiB on Linux
+    peak_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    with open(result_path, 'w', encoding='utf-8') as f:
+        json.dump({
+            'evaluated': evaluated,
+            'wall_seconds': round(wall_seconds, 3),
+            'peak_rss_mb': round(peak_rss_mb, 1),
+        }, f)
+
+
+# --- parent side --------------------------------------------------------------
+
+def _counter_delta(after: Dict[str, int], before: Dict[str, int]) -> Dict[str, int]:
+    return {key: after[key] - before.get(key, 0) for key in sorted(after) if after[key] - before.get(key, 0)}
+
+
+def run_scenario(target: str, size: int, vtex: FakeVtexServer, gemini: FakeGeminiServer,
+                 extra_env: Dict[str, str]) -> Dict:
+    with tempfile.TemporaryDirectory(prefix=f"bench_{target}_{size}_") as workdir:
+        trace_path = os.path.join(workdir, 'trace.jsonl')
+        result_path = os.path.join(workdir, 'result.json')
+        env = {
+            **os.environ,
+            'VTEX_BASE_URL': vtex.url,
+            'VTEX_APP_KEY': 'benchmark',
+            'VTEX_APP_TOKEN': 'benchmark',
+            'VTEX_ACCOUNT_NAME': 'benchmark',
+            'GEMINI_BASE_URL': gemini.url,
+            'GOOGLE_API_KEY': 'benchmark',
+            'API_KEY': 'benchmark',
+            'TRACE_EXPORT_PATH': trace_path,
+            'LOG_LEVEL': os.getenv('LOG_LEVEL', 'WARNING'),
+            **extra_env,
+        }
+        for name in ('GCS_BUCKET_NAME', 'DB_INSTANCE_CONNECTION_NAME', 'METRICS_PUSHGATEWAY_URL'):
+            env.pop(name, None)
+
+        vtex_before, gemini_before = vtex.counters.snapshot(), gemini.counters.snapshot()
+        subprocess.run(
+            [sys.executable, '-m', 'benchmarks.run_benchmark', '--child', target,
+             '--sizes', str(size), '--workdir', workdir, '--result-path', result_path],
+            env=env, check=True
+        )
+        with open(result_path, encoding='utf-8') as f:
+            child = json.load(f)
+        trace = summarize_trace(trace_path) if os.path.exists(trace_path) else {}
+
+    return {
+        'target': target,
+        'products': size,
+        'evaluated': child['evaluated'],
+        'wall_seconds': child['wall_seconds'],
+        'products_per_second': round(size / child['wall_seconds'], 2) if child['wall_seconds'] else 0.0,
+        'latency': trace.get('end_to_end', {}),
+        'stage_latency': trace.get('stages', {}),
+        'peak_rss_mb': child['peak_rss_mb'],
+        'upstream_calls': {
+            'vtex': _counter_delta(vtex.counters.snapshot(), vtex_before),
+            'gemini': _counter_delta(gemini.counters.snapshot(), gemini_before),
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the catalog evaluator against local fake upstreams')
+    parser.add_argument('--sizes', default='1000,10000,100000', help='Comma-separated product counts')
+    parser.add_argument('--targets', default=','.join(TARGETS), help=f"Comma-separated subset of {','.join(TARGETS)}")
+    parser.add_argument('--output', help='Write the JSON report to this file as well as stdout')
+    parser.add_argument('--vtex-latency-ms', type=float, default=40.0, help='Median VTEX latency')
+    parser.add_argument('--gemini-latency-ms', type=float, default=300.0, help='Median Gemini latency')
+    parser.add_argument('--latency-sigma', type=float, default=0.5, help='Log-normal sigma for both upstreams')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of 503 responses')
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help='Fraction of 429 responses')
+    parser.add_argument('--vtex-rate-limit', type=float, default=0.0,
+                        help='Requests per second the fake VTEX account allows before answering 429 (0 = unlimited)')
+    parser.add_argument('--description-words', type=int, default=80, help='Words per generated description')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--env', action='append', default=[], metavar='NAME=VALUE',
+                        help='Extra environment for the pipeline (repeatable), e.g. GEMINI_MAX_CONCURRENCY=32')
+    parser.add_argument('--child', choices=TARGETS, help=argparse.SUPPRESS)
+    parser.add_argument('--workdir', help=argparse.SUPPRESS)
+    parser.add_argument('--result-path', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child, int(args.sizes), args.workdir, args.result_path)
+        return
+
+    extra_env = dict(item.split('=', 1) for item in args.env)
+    vtex = FakeVtexServer(
+        UpstreamProfile(args.vtex_latency_ms, args.latency_sigma, args.error_rate, args.throttle_rate,
+                        args.vtex_rate_limit, args.seed),
+        description_words=args.description_words
+    ).start()
+    gemini = FakeGeminiServer(
+        UpstreamProfile(args.gemini_latency_ms, args.latency_sigma, args.error_rate, args.throttle_rate,
+                        seed=args.seed + 1)
+    ).start()
+
+    scenarios = []
+    try:
+        for size in (int(value) for value in args.sizes.split(',')):
+            for target in args.targets.split(','):
+                print(f"Running {target} with {size} products...", file=sys.stderr)
+                scenarios.append(run_scenario(target, size, vtex, gemini, extra_env))
+    finally:
+        vtex.stop()
+        gemini.stop()
+
+    report = json.dumps({
+        'config': {key: value for key, value in vars(args).items()
+                   if key not in ('child', 'workdir', 'result_path', 'output')},
+        'scenarios': scenarios,
+    }, indent=2)
+    print(report)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(report + '\n')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Test script for the Gemini batch evaluator (GEMINI_EVALUATOR_BACKEND=batch).
+Runs submit, poll, parse and cancel through LocalBatchBackend against the fake
+Gemini server, so it needs no credentials. Run with pytest or directly.
+"""
+
+import os
+import tempfile
+from benchmarks.fake_servers import FakeGeminiServer, UpstreamProfile
+from app.models.product import Product
+from app.services.gemini_batch_evaluator import GeminiBatchEvaluator, LocalBatchBackend
+from app.utils.job_control import JobCancelled, JobControl
+
+PRODUCTS = [
+    Product(str(i), f"<p>Camiseta de algodão modelo {i}, disponível em várias cores.</p>", name=f"Camiseta {i}")
+    for i in range(1, 8)
+]
+
+
+class StalledBackend(LocalBatchBackend):
+    """Local backend whose jobs never finish; records cancellations and can fail or cancel on submit."""
+
+    def __init__(self, fail_on_submit: int = 0, control: JobControl | None = None, cancel_on_submit: int = 0):
+        super().__init__(lambda model, prompt: "SCORE: 2\nREASON: Clear description")
+        self.submitted = []
+        self.cancelled = []
+        self.fail_on_submit = fail_on_submit
+        self.control = control
+        self.cancel_on_submit = cancel_on_submit
+
+    def submit(self, request_path: str, model: str) -> str:
+        if len(self.submitted) + 1 == self.fail_on_submit:
+            raise RuntimeError("upload failed")
+        job_name = super().submit(request_path, model)
+        self.submitted.append(job_name)
+        if len(self.submitted) == self.cancel_on_submit:
+            self.control.cancel()
+        return job_name
+
+    def poll(self, job_name: str) -> str:
+        return 'JOB_STATE_RUNNING'
+
+    def cancel(self, job_name: str) -> None:
+        self.cancelled.append(job_name)
+        super().cancel(job_name)
+
+
+def _batch_evaluator(server: FakeGeminiServer, work_dir: str, backend=None, control=None,
+                     timeout: str = '60') -> GeminiBatchEvaluator:
+    os.environ.update({
+        'GOOGLE_API_KEY': 'fake',
+        'GEMINI_BASE_URL': server.url,
+        'GEMINI_CONTEXT_CACHE': 'off',
+        'GEMINI_RESPONSE_MODE': 'text',
+        'GEMINI_BATCH_BACKEND': 'local',
+        'GEMINI_BATCH_WORK_DIR': work_dir,
+        'GEMINI_BATCH_MAX_REQUESTS': '3',
+        'GEMINI_BATCH_TIMEOUT_SECONDS': timeout,
+    })
+    return GeminiBatchEvaluator(backend=backend, control=control)
+
+
+def test_local_backend_round_trip():
+    server = FakeGeminiServer(UpstreamProfile(1, 0.0)).start()
+    try:
+        with tempfile.TemporaryDirectory() as work_dir:
+            evaluator = _batch_evaluator(server, work_dir)
+            results = evaluator.evaluate_products(PRODUCTS)
+
+            assert [result.product_id for result in results] == [product.product_id for product in PRODUCTS]
+            assert all(1 <= result.quality_score <= 5 for result in results)
+            assert all(result.reason == 'Synthetic benchmark evaluation' for result in results)
+            assert server.counters.snapshot()['generate_ok'] == len(PRODUCTS)
+            # Request and result files are removed once ingested
+            assert os.listdir(work_dir) == []
+    finally:
+        server.stop()
+
+
+def test_timed_out_jobs_are_cancelled():
+    server = FakeGeminiServer(UpstreamProfile(1, 0.0)).start()
+    try:
+        with tempfile.TemporaryDirectory() as work_dir:
+            backend = StalledBackend()
+            evaluator = _batch_evaluator(server, work_dir, backend=backend, timeout='0')
+            results = evaluator.evaluate_products(PRODUCTS)
+
+            assert len(backend.submitted) == 3
+            assert backend.cancelled == backend.submitted
+            assert all(result.quality_score == 0 and 'TIMEOUT' in result.reason for result in results)
+            assert os.listdir(work_dir) == []
+    finally:
+        server.stop()
+
+
+def test_cancel_while_submitting_cancels_submitted_jobs():
+    server = FakeGeminiServer(UpstreamProfile(1, 0.0)).start()
+    try:
+        with tempfile.TemporaryDirectory() as work_dir:
+            control = JobControl()
+            backend = StalledBackend(control=control, cancel_on_submit=2)
+            evaluator = _batch_evaluator(server, work_dir, backend=backend, control=control)
+            try:
+                evaluator.evaluate_products(PRODUCTS)
+                raise AssertionError("JobCancelled was not raised")
+            except JobCancelled:
+                pass
+
+            assert len(backend.submitted) == 2
+            assert backend.cancelled == backend.submitted
+            assert os.listdir(work_dir) == []
+    finally:
+        server.stop()
+
+
+def test_cancel_while_polling_cancels_pending_jobs():
+    server = FakeGeminiServer(UpstreamProfile(1, 0.0)).start()
+    try:
+        with tempfile.TemporaryDirectory() as work_dir:
+            control = JobControl()
+            backend = StalledBackend(control=control, cancel_on_submit=3)
+            evaluator = _batch_evaluator(server, work_dir, backend=backend, control=control)
+            try:
+                evaluator.evaluate_products(PRODUCTS)
+                raise AssertionError("JobCancelled was not raised")
+            except JobCancelled:
+                pass
+
+            assert len(backend.submitted) == 3
+            assert backend.cancelled == backend.submitted
+            assert os.listdir(work_dir) == []
+    finally:
+        server.stop()
+
+
+def test_submit_failure_removes_request_files():
+    server = FakeGeminiServer(UpstreamProfile(1, 0.0)).start()
+    try:
+        with tempfile.TemporaryDirectory() as work_dir:
+            backend = StalledBackend(fail_on_submit=2)
+            evaluator = _batch_evaluator(server, work_dir, backend=backend)
+            try:
+                evaluator.evaluate_products(PRODUCTS)
+                raise AssertionError("RuntimeError was not raised")
+            except RuntimeError as e:
+                assert str(e) == "upload failed"
+
+            assert backend.cancelled == backend.submitted and len(backend.submitted) == 1
+            assert os.listdir(work_dir) == []
+    finally:
+        server.stop()
+
+
+if __name__ == "__main__":
+    test_local_backend_round_trip()
+    test_timed_out_jobs_are_cancelled()
+    test_cancel_while_submitting_cancels_submitted_jobs()
+    test_cancel_while_polling_cancels_pending_jobs()
+    test_submit_failure_removes_request_files()
+    print("✅ Batch evaluator tests passed")
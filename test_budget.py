@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Test script for Gemini request/token budgets and the pause they impose.
+Run with pytest or directly.
+"""
+
+import asyncio
+import time
+from app.utils.budget import BudgetGovernor, TokenBudget
+from app.utils.job_control import JobCancelled, JobControl
+
+
+def test_caps_and_utilization():
+    budget = TokenBudget('job:test', max_requests=10, max_output_tokens=100)
+    governor = BudgetGovernor([budget], downscale_at=0.8)
+    assert governor.state == 'ok'
+
+    governor.charge(requests=5, input_tokens=1000, output_tokens=80)
+    assert budget.utilization() == 0.8
+    assert governor.state == 'downscaled'
+
+    governor.charge(requests=5)
+    assert governor.state == 'paused'
+    budget.set_caps(requests=0, output_tokens=1000)
+    assert governor.state == 'ok'
+
+
+def test_concurrent_waiters_count_one_pause():
+    budget = TokenBudget('job:test', max_requests=1)
+    governor = BudgetGovernor([budget], check_interval=0.05)
+    governor.charge(requests=1)
+
+    async def run():
+        waiters = [asyncio.create_task(governor.wait()) for _ in range(20)]
+        await asyncio.sleep(0.3)
+        assert governor.snapshot()['state'] == 'paused'
+        budget.set_caps(requests=0)
+        await asyncio.gather(*waiters)
+
+    started = time.monotonic()
+    asyncio.run(run())
+    elapsed = time.monotonic() - started
+
+    # Twenty waiters shared one pause, so it is counted once
+    assert 0.3 <= governor.paused_seconds <= elapsed
+    assert governor.state == 'ok'
+
+
+def test_cancelled_waiter_ends_the_pause():
+    budget = TokenBudget('job:test', max_requests=1)
+    governor = BudgetGovernor([budget], check_interval=0.05)
+    governor.charge(requests=1)
+    control = JobControl()
+
+    async def run():
+        waiter = asyncio.create_task(governor.wait(control.raise_if_cancelled))
+        await asyncio.sleep(0.2)
+        control.cancel()
+        await waiter
+
+    try:
+        asyncio.run(run())
+        raise AssertionError("JobCancelled was not raised")
+    except JobCancelled:
+        pass
+
+    paused = governor.paused_seconds
+    assert paused >= 0.2
+    time.sleep(0.1)
+    # No pause is still running after the cancel
+    assert governor.snapshot()['paused_seconds'] == round(paused, 1)
+
+
+if __name__ == "__main__":
+    test_caps_and_utilization()
+    test_concurrent_waiters_count_one_pause()
+    test_cancelled_waiter_ends_the_pause()
+    print("✅ Budget tests passed")
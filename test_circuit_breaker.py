@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Test script for the upstream circuit breakers (CIRCUIT_BREAKER_*).
+Run with pytest or directly.
+"""
+
+import time
+from app.utils.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError
+
+
+def _breaker(**kwargs) -> CircuitBreaker:
+    settings = {'window_size': 10, 'min_calls': 4, 'open_seconds': 0.05, 'half_open_max_calls': 2}
+    return CircuitBreaker('test', **{**settings, **kwargs})
+
+
+def _call(breaker: CircuitBreaker, success: bool = True, duration: float = 0.01) -> None:
+    breaker.before_call()
+    breaker.record(success, duration)
+
+
+def _rejected(breaker: CircuitBreaker) -> bool:
+    try:
+        breaker.before_call()
+    except CircuitOpenError:
+        return True
+    return False
+
+
+def _open(breaker: CircuitBreaker) -> None:
+    for _ in range(breaker.min_calls):
+        _call(breaker, success=False)
+    assert breaker.state == OPEN
+
+
+def test_stays_closed_below_thresholds():
+    breaker = _breaker()
+    # Failures before min_calls never trip it
+    for _ in range(3):
+        _call(breaker, success=False)
+    assert breaker.state == CLOSED
+
+    breaker = _breaker()
+    for _ in range(7):
+        _call(breaker)
+    for _ in range(3):
+        _call(breaker, success=False)
+    # 3 failures in a window of 10 is under the 50% failure rate
+    assert breaker.state == CLOSED
+    assert breaker.snapshot()['window_failure_rate'] == 0.3
+
+
+def test_opens_on_failure_rate_and_rejects_until_open_seconds():
+    breaker = _breaker()
+    _open(breaker)
+    assert breaker.times_opened == 1
+
+    try:
+        breaker.before_call()
+        raise AssertionError("call was admitted while open")
+    except CircuitOpenError as e:
+        assert 0 < e.retry_after <= 0.05
+    assert breaker.rejected_calls == 1
+    assert 0 < breaker.retry_after() <= 0.05
+
+
+def test_opens_on_slow_call_rate():
+    breaker = _breaker(slow_call_seconds=1.0, slow_call_rate_threshold=0.75)
+    for _ in range(3):
+        _call(breaker, duration=2.0)
+    _call(breaker)
+    assert breaker.state == OPEN
+
+
+def test_half_open_probes_close_the_breaker():
+    breaker = _breaker()
+    _open(breaker)
+    time.sleep(0.06)
+
+    breaker.before_call()
+    assert breaker.state == HALF_OPEN
+    breaker.before_call()
+    # Only half_open_max_calls probes are admitted at a time
+    assert _rejected(breaker)
+
+    breaker.record(True, 0.01)
+    breaker.record(True, 0.01)
+    assert breaker.state == CLOSED
+    assert breaker.snapshot()['window_calls'] == 0
+
+
+def test_failed_or_slow_probe_reopens():
+    for success, duration in ((False, 0.01), (True, 20.0)):
+        breaker = _breaker()
+        _open(breaker)
+        time.sleep(0.06)
+        breaker.before_call()
+        breaker.record(success, duration)
+        assert breaker.state == OPEN
+        assert breaker.times_opened == 2
+        assert _rejected(breaker)
+
+
+def test_released_probe_frees_its_slot():
+    breaker = _breaker(half_open_max_calls=1)
+    _open(breaker)
+    time.sleep(0.06)
+
+    breaker.before_call()
+    assert _rejected(breaker)
+    # A cancelled probe gives its slot back without counting as an outcome
+    breaker.release()
+    breaker.before_call()
+    breaker.record(True, 0.01)
+    assert breaker.state == CLOSED
+    assert breaker.total_calls == breaker.min_calls + 1
+
+
+if __name__ == "__main__":
+    test_stays_closed_below_thresholds()
+    test_opens_on_failure_rate_and_rejects_until_open_seconds()
+    test_opens_on_slow_call_rate()
+    test_half_open_probes_close_the_breaker()
+    test_failed_or_slow_probe_reopens()
+    test_released_probe_frees_its_slot()
+    print("✅ Circuit breaker tests passed")
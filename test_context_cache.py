@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Test script for Gemini context caching (GEMINI_CONTEXT_CACHE=cached).
+Runs the evaluator against the fake Gemini server's cachedContents endpoints,
+so it needs no credentials. Run with pytest or directly.
+"""
+
+import os
+from benchmarks.fake_servers import FakeGeminiServer, UpstreamProfile
+from app.models.product import Product
+from app.services import context_cache
+from app.services.gemini_evaluator import GeminiEvaluator
+
+PRODUCTS = [
+    Product(str(i), f"<p>Camiseta de algodão modelo {i}, disponível em várias cores.</p>", name=f"Camiseta {i}")
+    for i in range(1, 9)
+]
+
+
+def _cached_evaluator(server: FakeGeminiServer) -> GeminiEvaluator:
+    os.environ.update({
+        'GOOGLE_API_KEY': 'fake',
+        'GEMINI_BASE_URL': server.url,
+        'GEMINI_CONTEXT_CACHE': 'cached',
+        'GEMINI_RESPONSE_MODE': 'text',
+    })
+    # The cache registry is process-wide and keyed by instructions; start from a clean one
+    context_cache._caches.clear()
+    return GeminiEvaluator()
+
+
+def test_instructions_cached_once_and_recreated_when_gone():
+    server = FakeGeminiServer(UpstreamProfile(1, 0.0)).start()
+    try:
+        evaluator = _cached_evaluator(server)
+        results = evaluator.evaluate_products(PRODUCTS[:4])
+        assert all(1 <= result.quality_score <= 5 for result in results)
+        assert server.counters.snapshot()['cache_create'] == 1
+        assert list(server.caches.values()) == [evaluator._instructions]
+
+        # Deleted server-side: the next calls get 403, re-create the cache and retry
+        server.caches.clear()
+        results = evaluator.evaluate_products(PRODUCTS[4:])
+        assert all(1 <= result.quality_score <= 5 for result in results)
+        counters = server.counters.snapshot()
+        assert counters['cache_create'] == 2
+        assert counters['generate_ok'] == len(PRODUCTS)
+
+        evaluator.context_cache.close()
+        assert server.caches == {}
+        assert server.counters.snapshot()['cache_delete'] == 1
+    finally:
+        server.stop()
+
+
+def test_rejected_cache_falls_back_to_system_instruction():
+    server = FakeGeminiServer(UpstreamProfile(1, 0.0), min_cache_tokens=1_000_000).start()
+    try:
+        evaluator = _cached_evaluator(server)
+        results = evaluator.evaluate_products(PRODUCTS[:4])
+        assert all(1 <= result.quality_score <= 5 for result in results)
+        counters = server.counters.snapshot()
+        # A 400 is final, so creation is attempted once and not per request
+        assert counters['cache_rejected'] == 1
+        assert counters.get('cache_create', 0) == 0
+        assert evaluator.context_cache.name_for(evaluator.model) is None
+    finally:
+        server.stop()
+
+
+if __name__ == "__main__":
+    test_instructions_cached_once_and_recreated_when_gone()
+    test_rejected_cache_falls_back_to_system_instruction()
+    print("✅ Context cache tests passed")
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Test script for the run-to-run diff report (python -m app.diff).
+Run with pytest or directly.
+"""
+
+import csv
+import json
+import os
+import tempfile
+from datetime import datetime
+import pandas as pd
+from app.services.diff_report import UNKNOWN_CATEGORY, compute_diff, parse_db_source, read_results_csv
+
+# product_id: (base score, head score, category); None means absent from that run
+PRODUCTS = {
+    'improved': (3, 2, 'Shirts'),
+    'regressed': (2, 4, 'Shirts'),
+    'failed': (3, 0, 'Pants'),
+    'recovered': (0, 5, 'Pants'),
+    'unchanged': (1, 1, 'Pants'),
+    'still-failing': (0, 0, None),
+    'removed': (4, None, None),
+    'new': (None, 2, 'Shoes'),
+}
+
+
+def _write(path: str, rows) -> None:
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['product_id', 'quality_score', 'category', 'reason'])
+        writer.writerows(rows)
+
+
+def _result_sets(directory: str):
+    base_path, head_path = os.path.join(directory, 'base.csv'), os.path.join(directory, 'head.csv')
+    _write(base_path, [
+        (product_id, base, category, 'text') for product_id, (base, _, category) in PRODUCTS.items()
+        if base is not None
+    ] + [('unreadable', 'n/a', 'Shirts', 'text')])
+    # Appended result files repeat products; the last row is the one that counts
+    _write(head_path, [('improved', 5, 'Shirts', 'first try')] + [
+        (product_id, head, category, 'text') for product_id, (_, head, category) in PRODUCTS.items()
+        if head is not None
+    ])
+    return read_results_csv(base_path, chunk_rows=3), read_results_csv(head_path, chunk_rows=3)
+
+
+def test_classifies_every_status():
+    with tempfile.TemporaryDirectory() as directory:
+        report = compute_diff(*_result_sets(directory))
+
+    statuses = report.changes.set_index('product_id')['status'].astype(str).to_dict()
+    # Every status is named after the product that should get it; unchanged rows are left out
+    assert statuses == {product_id: product_id for product_id in PRODUCTS
+                        if product_id not in ('unchanged', 'still-failing')}
+
+    summary = report.summary
+    assert (summary['base_products'], summary['head_products'], summary['common_products']) == (7, 7, 6)
+    assert {status: summary[status] for status in ('new', 'removed', 'improved', 'regressed',
+                                                   'failed', 'recovered', 'unchanged')} == {
+        'new': 1, 'removed': 1, 'improved': 1, 'regressed': 1, 'failed': 1, 'recovered': 1, 'unchanged': 2,
+    }
+    # Score 0 is a failure, not a score: it stays out of averages and deltas
+    assert summary['base_average_score'] == 2.6 and summary['head_average_score'] == 2.8
+    assert summary['average_delta'] == round((1 - 2 + 0) / 3, 4)
+    assert summary['delta'].startswith('base_score - head_score')
+
+
+def test_delta_sign_follows_the_rubric():
+    with tempfile.TemporaryDirectory() as directory:
+        report = compute_diff(*_result_sets(directory))
+
+    changes = report.changes.set_index('product_id')
+    # 1 is the best score, so going from 3 to 2 is a positive delta
+    assert changes.loc['improved', 'delta'] == 1
+    assert changes.loc['regressed', 'delta'] == -2
+    for product_id in ('failed', 'recovered', 'new', 'removed'):
+        assert pd.isna(changes.loc[product_id, 'delta'])
+
+    assert [(row['product_id'], row['delta']) for row in report.regressions] == [('regressed', -2)]
+    assert [(row['product_id'], row['delta']) for row in report.improvements] == [('improved', 1)]
+    transitions = {(row['base_score'], row['head_score']): row['products'] for row in report.score_transitions}
+    assert transitions == {(3, 2): 1, (2, 4): 1, (3, 0): 1, (0, 5): 1}
+
+
+def test_top_limits_the_lists():
+    base = pd.DataFrame({'quality_score': [1, 1, 1, 5, 5], 'category': ['A'] * 5},
+                        index=pd.Index(['r1', 'r2', 'r3', 'i1', 'i2'], name='product_id'))
+    head = pd.DataFrame({'quality_score': [3, 5, 2, 1, 4], 'category': ['A'] * 5}, index=base.index)
+    report = compute_diff(base, head, top=2)
+    assert [row['product_id'] for row in report.regressions] == ['r2', 'r1']
+    assert [row['product_id'] for row in report.improvements] == ['i1', 'i2']
+
+
+def test_categories_and_lookup():
+    with tempfile.TemporaryDirectory() as directory:
+        base, head = _result_sets(directory)
+    unknown = {row['category']: row for row in compute_diff(base, head).categories}[UNKNOWN_CATEGORY]
+    assert (unknown['products'], unknown['removed'], unknown['unchanged']) == (2, 1, 1)
+
+    lookup = pd.Series({'removed': 'Hats'})
+    report = compute_diff(base, head, category_lookup=lookup)
+    categories = {row['category']: row for row in report.categories}
+    assert categories['Hats']['removed'] == 1
+    assert categories[UNKNOWN_CATEGORY]['products'] == 1
+    assert (categories['Shirts']['products'], categories['Shirts']['average_delta']) == (2, -0.5)
+    assert (categories['Pants']['failed'], categories['Pants']['recovered']) == (1, 1)
+    # Worst average delta first
+    assert report.categories[0]['category'] == 'Shirts'
+    json.dumps(report.to_dict())
+
+
+def test_parse_db_source():
+    assert parse_db_source('db') == (None, None)
+    assert parse_db_source('db:latest') == (None, None)
+    assert parse_db_source('db:2026-01-01..2026-02-01T12:00') == (
+        datetime(2026, 1, 1), datetime(2026, 2, 1, 12)
+    )
+    assert parse_db_source('db:..2026-02-01') == (None, datetime(2026, 2, 1))
+    try:
+        parse_db_source('db:2026-01-01')
+        raise AssertionError("ValueError was not raised")
+    except ValueError:
+        pass
+
+
+if __name__ == "__main__":
+    test_classifies_every_status()
+    test_delta_sign_follows_the_rubric()
+    test_top_limits_the_lists()
+    test_categories_and_lookup()
+    test_parse_db_source()
+    print("✅ Diff report tests passed")
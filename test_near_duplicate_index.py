@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Test script for the MinHash/LSH near-duplicate index (NEAR_DUPLICATE_THRESHOLD).
+Run with pytest or directly.
+"""
+
+import random
+from app.services.near_duplicate_index import NearDuplicateIndex, _choose_bands
+
+_VOCABULARY = (
+    "camiseta algodão macio confortável tecido resistente costura reforçada modelagem regular gola "
+    "redonda ideal uso diário lavagem fácil cor firme tamanho disponível qualidade premium acabamento "
+    "elegante leve respirável durável calça jeans bolso zíper botão manga longa curta estampa"
+).split()
+
+
+def _description(seed: int, words: int = 60) -> str:
+    generator = random.Random(seed)
+    return ' '.join(generator.choice(_VOCABULARY) for _ in range(words))
+
+
+def _with_one_word_changed(text: str) -> str:
+    words = text.split()
+    words[len(words) // 2] = 'diferente'
+    return ' '.join(words)
+
+
+def test_band_split_covers_every_permutation():
+    for num_perm, threshold in ((64, 0.8), (128, 0.5), (16, 0.9)):
+        bands, rows = _choose_bands(num_perm, threshold)
+        assert bands * rows == num_perm
+        # The S-curve midpoint lands near the requested threshold
+        assert abs((1 / bands) ** (1 / rows) - threshold) < 0.15
+    # A prime permutation count still splits exactly, just less precisely
+    assert _choose_bands(7, 0.8) in ((7, 1), (1, 7))
+
+
+def test_matches_duplicates_and_near_duplicates():
+    index = NearDuplicateIndex(threshold=0.8)
+    base = _description(1)
+
+    assert index.find_or_add('a', base) == (None, 1.0)
+    assert index.find_or_add('b', base) == ('a', 1.0)
+    # Case and punctuation do not matter
+    assert index.find_or_add('c', base.upper().replace(' ', ', ')) == ('a', 1.0)
+
+    representative, similarity = index.find_or_add('d', _with_one_word_changed(base))
+    assert representative == 'a' and 0.8 <= similarity < 1.0
+
+    # Matches are not inserted; only representatives are indexed
+    assert len(index) == 1 and 'b' not in index
+
+
+def test_unrelated_descriptions_become_representatives():
+    index = NearDuplicateIndex(threshold=0.8)
+    for key in range(50):
+        assert index.find_or_add(str(key), _description(key)) == (None, 1.0)
+    assert len(index) == 50
+
+
+def test_short_descriptions_use_a_single_shingle():
+    index = NearDuplicateIndex(threshold=0.8)
+    assert index.find_or_add('a', 'Camiseta azul') == (None, 1.0)
+    assert index.find_or_add('b', 'camiseta AZUL!') == ('a', 1.0)
+    assert index.find_or_add('c', 'Camiseta verde') == (None, 1.0)
+
+
+def test_evicts_least_recently_matched_representative():
+    evicted = []
+    index = NearDuplicateIndex(threshold=0.8, max_size=2, on_evict=evicted.append)
+    first, second, third = _description(1), _description(2), _description(3)
+
+    index.find_or_add('first', first)
+    index.find_or_add('second', second)
+    # Matching 'first' makes 'second' the least recently used
+    assert index.find_or_add('first-copy', first) == ('first', 1.0)
+    index.find_or_add('third', third)
+
+    assert evicted == ['second'] and index.evicted == 1
+    assert len(index) == 2 and 'second' not in index and 'first' in index
+    # Its LSH buckets went with it: the same text now registers a new representative
+    assert index.find_or_add('second-again', second) == (None, 1.0)
+    assert evicted == ['second', 'first']
+
+
+def test_rejects_invalid_settings():
+    for kwargs in ({'threshold': 0}, {'threshold': 1.5}, {'num_perm': 0}, {'max_size': 0}):
+        try:
+            NearDuplicateIndex(**kwargs)
+            raise AssertionError(f"{kwargs} was accepted")
+        except ValueError:
+            pass
+
+
+if __name__ == "__main__":
+    test_band_split_covers_every_permutation()
+    test_matches_duplicates_and_near_duplicates()
+    test_unrelated_descriptions_become_representatives()
+    test_short_descriptions_use_a_single_shingle()
+    test_evicts_least_recently_matched_representative()
+    test_rejects_invalid_settings()
+    print("✅ Near-duplicate index tests passed")
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Test script for heuristic pre-scoring (PRE_SCORER_ENABLED=true) and how its
+results are merged with Gemini's. Run with pytest or directly.
+"""
+
+from datetime import datetime, timezone
+from typing import List
+from app.models.evaluation_result import EvaluationResult
+from app.models.product import Product
+from app.services.evaluation_service import EvaluationService
+from app.services.pre_scorer import PreScorer, PreScorerThresholds
+from app.utils.job_control import JobControl
+
+RICH = (
+    "Camiseta de algodão penteado com toque macio, gola redonda reforçada e costuras duplas. "
+    "Modelagem regular que veste bem no dia a dia, tecido respirável e cores que não desbotam na lavagem."
+)
+THIN = "Camiseta bonita e confortável para usar em qualquer ocasião especial"
+
+PRODUCTS = [
+    Product('rich', RICH, name='Camiseta Básica'),
+    Product('markup', '<div class="produto-descricao-container"><span style="font-weight:bold">'
+                      '<br/><br/>Camiseta</span></div>' * 3, name='Camiseta'),
+    Product('short', 'Camiseta azul', name='Camiseta'),
+    Product('few-words', 'Supercalifragilístico extraordinariamente confortabilíssima maravilhosa',
+            name='Camiseta'),
+    Product('name-only', 'Camiseta Algodão Premium Gola Redonda Manga Curta Azul Marinho',
+            name='Camiseta Algodão Premium Gola Redonda Manga Curta Azul Marinho'),
+    Product('thin', THIN, name='Camiseta'),
+    Product('thin-specs', THIN + " 100% algodão 180g", name='Camiseta'),
+]
+
+
+def _rules(scorer: PreScorer) -> dict:
+    return {
+        product.product_id: (result.raw_response if result else None)
+        for product, result in zip(PRODUCTS, scorer.score(PRODUCTS))
+    }
+
+
+def test_rules_classify_products():
+    assert _rules(PreScorer(PreScorerThresholds())) == {
+        'rich': None,
+        'markup': 'PRE_SCORER:html_boilerplate',
+        'short': 'PRE_SCORER:too_short',
+        'few-words': 'PRE_SCORER:too_few_tokens',
+        'name-only': 'PRE_SCORER:name_only',
+        # The thin-description rule is opt-in
+        'thin': None,
+        'thin-specs': None,
+    }
+
+
+def test_thin_rule_when_enabled():
+    rules = _rules(PreScorer(PreScorerThresholds(thin_rule_enabled=True)))
+    assert rules['thin'] == 'PRE_SCORER:thin_without_specs'
+    # Numbers read as specifications, so the product still goes to Gemini
+    assert rules['thin-specs'] is None
+    assert rules['rich'] is None
+
+
+def test_scores_reasons_and_report():
+    scorer = PreScorer(PreScorerThresholds(thin_rule_enabled=True))
+    results = {result.product_id: result for result in scorer.score(PRODUCTS) if result}
+    assert {product_id: result.quality_score for product_id, result in results.items()} == {
+        'markup': 5, 'short': 5, 'few-words': 5, 'name-only': 5, 'thin': 4,
+    }
+    assert results['short'].reason == "Description is too short to be informative"
+
+    report = scorer.report()
+    assert report['products_seen'] == len(PRODUCTS)
+    assert report['llm_calls_avoided'] == 5
+    assert report['avoided_ratio'] == round(5 / len(PRODUCTS), 4)
+    assert report['by_rule']['too_short'] == 1
+    assert scorer.score([]) == []
+
+
+class _ReversingEvaluator:
+    """Evaluator double that answers out of order and can leave products unanswered."""
+
+    def __init__(self, skip: int = 0):
+        self.skip = skip
+        self.requested: List[str] = []
+
+    def evaluate_products(self, products: List[Product]) -> List[EvaluationResult]:
+        self.requested.extend(product.product_id for product in products)
+        return [
+            EvaluationResult(product.product_id, 2, datetime.now(timezone.utc), 'Gemini', 'SCORE: 2')
+            for product in reversed(products[self.skip:])
+        ]
+
+
+def _service(evaluator, control: JobControl | None = None) -> EvaluationService:
+    # Only the evaluation stages are exercised, so VTEX and Gemini clients are not needed
+    service = EvaluationService.__new__(EvaluationService)
+    service.pre_scorer = PreScorer(PreScorerThresholds())
+    service.near_duplicate_index = None
+    service.gemini_evaluator = evaluator
+    service.control = control
+    return service
+
+
+def test_results_realign_with_products():
+    evaluator = _ReversingEvaluator()
+    results = _service(evaluator)._evaluate_products(PRODUCTS)
+
+    assert [result.product_id for result in results] == [product.product_id for product in PRODUCTS]
+    assert evaluator.requested == ['rich', 'thin', 'thin-specs']
+    by_id = {result.product_id: result.raw_response for result in results}
+    assert by_id['rich'] == 'SCORE: 2' and by_id['short'] == 'PRE_SCORER:too_short'
+
+
+def test_missing_evaluations_fail_unless_cancelled():
+    try:
+        _service(_ReversingEvaluator(skip=1))._evaluate_products(PRODUCTS)
+        raise AssertionError("RuntimeError was not raised")
+    except RuntimeError:
+        pass
+
+    # A cancelled job keeps what finished and leaves the rest out
+    control = JobControl()
+    control.cancel()
+    results = _service(_ReversingEvaluator(skip=1), control)._evaluate_products(PRODUCTS)
+    assert [result.product_id for result in results] == [
+        'markup', 'short', 'few-words', 'name-only', 'thin', 'thin-specs'
+    ]
+
+
+if __name__ == "__main__":
+    test_rules_classify_products()
+    test_thin_rule_when_enabled()
+    test_scores_reasons_and_report()
+    test_results_realign_with_products()
+    test_missing_evaluations_fail_unless_cancelled()
+    print("✅ Pre-scorer tests passed")
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Test script for the adaptive upstream rate limiters (<NAME>_RATE_LIMIT_*).
+Run with pytest or directly.
+"""
+
+import email.utils
+import time
+from app.utils.rate_limiter import AdaptiveRateLimiter, _parse_retry_after
+
+
+def test_slow_start_grows_by_one_per_success():
+    limiter = AdaptiveRateLimiter('test', initial_rate=20)
+    for _ in range(5):
+        limiter.on_response(200, {})
+    assert limiter.rate == 25
+    # Errors other than 429 neither grow nor cut the rate
+    limiter.on_response(503, {})
+    assert limiter.rate == 25
+
+
+def test_throttling_cuts_once_per_second_then_grows_additively():
+    limiter = AdaptiveRateLimiter('test', initial_rate=20, increase_per_second=2, decrease_factor=0.5)
+    limiter.on_response(429, {})
+    assert limiter.rate == 10 and limiter.throttled == 1
+    assert not limiter.snapshot()['slow_start']
+
+    # Responses already in flight report the same overload and do not cut again
+    limiter.on_response(429, {})
+    assert limiter.rate == 10 and limiter.throttled == 2
+
+    # Additive increase: each success adds increase_per_second / rate, about 2 req/s per second
+    limiter.on_response(200, {})
+    assert limiter.rate == 10.2
+    for _ in range(9):
+        limiter.on_response(200, {})
+    assert 11.8 < limiter.rate < 12
+
+    time.sleep(1.01)
+    rate = limiter.rate
+    limiter.on_response(429, {})
+    assert limiter.rate == rate * 0.5
+
+
+def test_rate_stays_within_bounds():
+    limiter = AdaptiveRateLimiter('test', initial_rate=4, min_rate=1, max_rate=6)
+    for _ in range(10):
+        limiter.on_response(200, {})
+    assert limiter.rate == 6
+    for _ in range(4):
+        limiter._last_decrease = 0.0
+        limiter.on_response(429, {'Retry-After': '0'})
+    assert limiter.rate == 1
+
+
+def test_retry_after_pauses_every_caller():
+    limiter = AdaptiveRateLimiter('test', initial_rate=100, burst=10)
+    assert limiter.acquire() == 0.0
+
+    limiter.on_response(429, {'Retry-After': '0.3'})
+    started = time.monotonic()
+    waited = limiter.acquire()
+    assert waited >= 0.29 and time.monotonic() - started >= 0.29
+
+    # Retry-After on other responses pauses too, without cutting the rate
+    rate = limiter.rate
+    limiter.on_response(503, {'Retry-After': '0.2'})
+    assert limiter.acquire() >= 0.19
+    assert limiter.rate == rate
+
+
+def test_retry_after_formats():
+    assert _parse_retry_after('2.5') == 2.5
+    assert _parse_retry_after('-3') == 0.0
+    assert 3.0 < _parse_retry_after(email.utils.formatdate(time.time() + 5, usegmt=True)) <= 5.0
+    assert _parse_retry_after('soon') is None
+    assert _parse_retry_after(None) is None
+
+
+def test_remaining_quota_caps_the_rate():
+    limiter = AdaptiveRateLimiter('test', initial_rate=50)
+    limiter.on_response(200, {'X-RateLimit-Remaining': '10', 'X-RateLimit-Reset': '5'})
+    assert limiter.rate == 2
+    # Reset may also be an epoch timestamp
+    limiter = AdaptiveRateLimiter('test', initial_rate=50)
+    limiter.on_response(200, {'X-RateLimit-Remaining': '40', 'X-RateLimit-Reset': str(time.time() + 10)})
+    assert 3.9 < limiter.rate < 4.1
+
+
+def test_tokens_pace_requests():
+    limiter = AdaptiveRateLimiter('test', initial_rate=20, burst=1)
+    assert limiter.acquire() == 0.0
+    assert 0.04 <= limiter.acquire() < 0.2
+
+    disabled = AdaptiveRateLimiter('test', initial_rate=1, burst=1, enabled=False)
+    assert [disabled.acquire() for _ in range(5)] == [0.0] * 5
+    disabled.on_response(429, {'Retry-After': '10'})
+    assert disabled.acquire() == 0.0
+
+
+if __name__ == "__main__":
+    test_slow_start_grows_by_one_per_success()
+    test_throttling_cuts_once_per_second_then_grows_additively()
+    test_rate_stays_within_bounds()
+    test_retry_after_pauses_every_caller()
+    test_retry_after_formats()
+    test_remaining_quota_caps_the_rate()
+    test_tokens_pace_requests()
+    print("✅ Rate limiter tests passed")
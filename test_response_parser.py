@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Test script for Gemini response parsing (text and JSON modes).
+Run with pytest or directly.
+"""
+
+from app.utils.response_parser import ResponseParseError, parse_json_response, parse_text_response
+
+
+def _raises(parse, raw: str) -> bool:
+    try:
+        parse(raw)
+    except ResponseParseError:
+        return True
+    return False
+
+
+def test_text_reads_score_and_reason_lines():
+    parsed = parse_text_response("SCORE: 2\nREASON: Clear, mostly complete description")
+    assert (parsed.score, parsed.reason) == (2, "Clear, mostly complete description")
+    assert parse_text_response("  SCORE:4  \r\n  REASON: Short \r").score == 4
+    assert parse_text_response("SCORE: 4\r\nREASON: Short \r").reason == "Short"
+
+
+def test_text_lenient_forms_match_the_original_parser():
+    # The whole rest of the SCORE: line must be an integer; otherwise the first 1-5 digit wins
+    assert parse_text_response("SCORE: 3.\nREASON: ok").score == 3
+    assert parse_text_response("Grade 4 overall\nSCORE: 2.\nREASON: ok").score == 4
+    assert parse_text_response("SCORE: 3/5").score == 3
+    assert parse_text_response("Product 2 of the list\nSCORE: 3 out of 5").score == 2
+    # The last parseable SCORE: line and the last REASON: line are used
+    parsed = parse_text_response("SCORE: 2\nREASON: first\nSCORE: 4\nREASON: second")
+    assert (parsed.score, parsed.reason) == (4, "second")
+    # Only lines that start with the label count, and the label is case-sensitive
+    assert parse_text_response("score: 9\nThe answer is 3").score == 3
+    assert parse_text_response("REASON: SCORE: 1").reason == "SCORE: 1"
+
+
+def test_text_defaults():
+    parsed = parse_text_response("No digits in this answer")
+    assert (parsed.score, parsed.reason) == (5, "Evaluation completed")
+    assert parse_text_response("SCORE: 2\nREASON:").reason == ""
+    parsed = parse_text_response("SCORE: 7\nREASON: out of range")
+    assert (parsed.score, parsed.reason) == (5, "Invalid score received, defaulted to poor quality")
+
+
+def test_text_strict_requires_a_valid_score_line():
+    assert parse_text_response("SCORE: 3\nREASON: ok", strict=True).score == 3
+    for raw in ("The score is 3", "SCORE: 3.", "SCORE: 3/5", "SCORE: 0", "SCORE: 6", ""):
+        assert _raises(lambda text: parse_text_response(text, strict=True), raw), raw
+        # Lenient parsing never raises
+        assert 1 <= parse_text_response(raw).score <= 5
+
+
+def test_json_accepts_schema_conforming_objects():
+    parsed = parse_json_response('{"score": 1, "reason": " Detailed and engaging ", "confidence": 0.8}')
+    assert (parsed.score, parsed.reason, parsed.confidence) == (1, "Detailed and engaging", 0.8)
+    assert parse_json_response('{"score": 5, "reason": "Empty", "confidence": 1}').confidence == 1.0
+    assert parse_json_response('{"score": 3, "reason": "ok"}').confidence is None
+
+
+def test_json_rejects_deviations():
+    for raw in (
+        'SCORE: 3',
+        '[3, "ok"]',
+        '{"reason": "ok"}',
+        '{"score": "3", "reason": "ok"}',
+        '{"score": 3.0, "reason": "ok"}',
+        '{"score": true, "reason": "ok"}',
+        '{"score": 6, "reason": "ok"}',
+        '{"score": 3, "reason": "  "}',
+        '{"score": 3, "reason": "ok", "confidence": 1.5}',
+        '{"score": 3, "reason": "ok", "confidence": true}',
+    ):
+        assert _raises(parse_json_response, raw), raw
+
+
+if __name__ == "__main__":
+    test_text_reads_score_and_reason_lines()
+    test_text_lenient_forms_match_the_original_parser()
+    test_text_defaults()
+    test_text_strict_requires_a_valid_score_line()
+    test_json_accepts_schema_conforming_objects()
+    test_json_rejects_deviations()
+    print("✅ Response parser tests passed")
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Test script for the SQLite results index (RESULTS_INDEX_PATH).
+Run with pytest or directly.
+"""
+
+import os
+import sqlite3
+import tempfile
+from datetime import datetime, timedelta, timezone
+from typing import Dict
+from app.models.evaluation_batch import EvaluationBatch
+from app.models.evaluation_result import EvaluationResult
+from app.models.product import Product
+from app.services.results_index import ResultsIndex
+
+DAY_ONE = datetime(2026, 3, 1, 12, tzinfo=timezone.utc)
+
+
+def _batch(product_ids, score: int, category: str, brand: str = 'Acme', at: datetime = DAY_ONE) -> EvaluationBatch:
+    batch = EvaluationBatch()
+    for product_id in product_ids:
+        batch.append(
+            EvaluationResult(product_id, score, at, reason=f"score {score}"),
+            Product(product_id, 'description', category=category, brand=brand,
+                    category_id=f"id-{category}", brand_id=f"id-{brand}")
+        )
+    return batch
+
+
+def _distributions(index: ResultsIndex, group_by: str = 'category', **filters) -> Dict:
+    return {
+        group[group_by]: {score: n for score, n in group['distribution'].items() if n}
+        for group in index.summary(group_by, **filters)['groups']
+    }
+
+
+def _rollup_matches_results(index: ResultsIndex) -> bool:
+    """The incrementally maintained rollup equals one rebuilt from scratch."""
+    rollup = index._writer.execute(
+        "SELECT account, day, category, brand, category_id, brand_id, quality_score, products "
+        "FROM score_rollup ORDER BY 1, 2, 3, 4, 5, 6, 7"
+    ).fetchall()
+    rebuilt = index._writer.execute(
+        "SELECT account, evaluated_at / 86400000000, COALESCE(category, ''), COALESCE(brand, ''), "
+        "COALESCE(category_id, ''), COALESCE(brand_id, ''), quality_score, COUNT(*) "
+        "FROM results GROUP BY 1, 2, 3, 4, 5, 6, 7 ORDER BY 1, 2, 3, 4, 5, 6, 7"
+    ).fetchall()
+    return rollup == rebuilt
+
+
+def test_rollup_follows_re_upserts():
+    with tempfile.TemporaryDirectory() as directory:
+        index = ResultsIndex(os.path.join(directory, 'index.db'), default_account='store-a')
+        ids = [f"p{i}" for i in range(10)]
+        index.add_batch(_batch(ids, 2, 'Shirts'), 'job-1')
+        assert _distributions(index) == {'Shirts': {'2': 10}}
+
+        # Re-evaluated products move out of their old group instead of being counted twice
+        index.add_batch(_batch(ids[:4], 4, 'Pants'), 'job-2')
+        assert _distributions(index) == {'Shirts': {'2': 6}, 'Pants': {'4': 4}}
+
+        # A product repeated within one batch is counted once, with its last row
+        index.add_batch(_batch(['p0', 'p0'], 1, 'Shirts'), 'job-3')
+        assert _distributions(index) == {'Shirts': {'2': 6, '1': 1}, 'Pants': {'4': 3}}
+
+        # A later day is a separate rollup row, and the old day's count drops
+        index.add_batch(_batch(ids[5:], 0, 'Shirts', at=DAY_ONE + timedelta(days=1)), 'job-4')
+        assert _distributions(index, 'day') == {
+            '2026-03-01': {'1': 1, '2': 1, '4': 3},
+            '2026-03-02': {'0': 5},
+        }
+        assert _rollup_matches_results(index)
+
+        groups = {group['category']: group for group in index.summary()['groups']}
+        # Failed evaluations (score 0) count as products but not towards the average
+        assert groups['Shirts']['products'] == 7 and groups['Shirts']['average_score'] == 1.5
+        assert _distributions(index, 'category_id') == {'id-Shirts': {'0': 5, '1': 1, '2': 1}, 'id-Pants': {'4': 3}}
+        assert _distributions(index, 'brand', category_id='id-Pants') == {'Acme': {'4': 3}}
+        index.close()
+
+
+def test_accounts_are_kept_apart():
+    with tempfile.TemporaryDirectory() as directory:
+        index = ResultsIndex(os.path.join(directory, 'index.db'), default_account='store-a')
+        index.add_batch(_batch(['p1', 'p2'], 2, 'Shirts'), 'job-1')
+        index.add_batch(_batch(['p1'], 5, 'Shirts'), 'job-2', account='store-b')
+
+        assert _distributions(index) == {'Shirts': {'2': 2}}
+        assert _distributions(index, account='store-b') == {'Shirts': {'5': 1}}
+        assert [row['quality_score'] for row in index.query(account='store-b')['results']] == [5]
+        assert _rollup_matches_results(index)
+        index.close()
+
+
+def test_query_filters_and_pages():
+    with tempfile.TemporaryDirectory() as directory:
+        index = ResultsIndex(os.path.join(directory, 'index.db'), default_account='store-a')
+        index.add_batch(_batch([f"p{i:02d}" for i in range(25)], 3, 'Shirts'), 'job-1')
+        index.add_batch(_batch(['q1', 'q2'], 5, 'Pants'), 'job-2')
+
+        seen, cursor = [], None
+        while True:
+            page = index.query(category='Shirts', limit=10, after=cursor)
+            seen += [row['product_id'] for row in page['results']]
+            cursor = page['next_cursor']
+            if cursor is None:
+                break
+        assert seen == [f"p{i:02d}" for i in range(25)]
+        assert [row['product_id'] for row in index.query(min_score=4)['results']] == ['q1', 'q2']
+        assert index.query(job_id='job-2', limit=1)['next_cursor'] == 'q1'
+        index.close()
+
+
+def test_migrates_the_unscoped_layout():
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'index.db')
+        # The first layout: keyed by product_id alone, rollup without account or ids
+        conn = sqlite3.connect(path)
+        conn.executescript("""
+            CREATE TABLE results (
+                product_id TEXT PRIMARY KEY, job_id TEXT, quality_score INTEGER NOT NULL,
+                evaluated_at INTEGER NOT NULL, category TEXT, brand TEXT, category_id TEXT, brand_id TEXT,
+                reason TEXT
+            );
+            CREATE INDEX idx_results_category ON results (category, product_id, quality_score);
+            CREATE INDEX idx_results_job ON results (job_id, product_id);
+            CREATE TABLE score_rollup (
+                day INTEGER NOT NULL, category TEXT NOT NULL, brand TEXT NOT NULL,
+                quality_score INTEGER NOT NULL, products INTEGER NOT NULL,
+                PRIMARY KEY (day, category, brand, quality_score)
+            ) WITHOUT ROWID;
+        """)
+        conn.executemany(
+            "INSERT INTO results VALUES (?, 'old-job', ?, ?, ?, 'Acme', ?, 'id-Acme', 'old')",
+            [(f"p{i}", 2 + i % 2, 1_772_366_400_000_000, 'Shirts' if i < 6 else None, 'id-Shirts' if i < 6 else None)
+             for i in range(10)]
+        )
+        conn.execute("INSERT INTO score_rollup VALUES (20513, 'Shirts', 'Acme', 2, 99)")
+        conn.commit()
+        conn.close()
+
+        index = ResultsIndex(path, default_account='store-a')
+        # Old rows belong to the default account, and the rollup is rebuilt from them
+        assert _distributions(index) == {'Shirts': {'2': 3, '3': 3}, None: {'2': 2, '3': 2}}
+        assert len(index.query(limit=100)['results']) == 10
+        assert index.query(account='store-b')['results'] == []
+        assert _rollup_matches_results(index)
+        tables = {row[0] for row in index._writer.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        assert tables == {'results', 'score_rollup'}
+
+        # Writes after the migration keep the counts straight
+        index.add_batch(_batch(['p0', 'p1'], 5, 'Shirts'), 'new-job')
+        assert _distributions(index)['Shirts'] == {'2': 2, '3': 2, '5': 2}
+        index.close()
+
+        # Reopening a migrated index changes nothing
+        reopened = ResultsIndex(path, default_account='other')
+        assert _distributions(reopened, account='store-a')['Shirts'] == {'2': 2, '3': 2, '5': 2}
+        assert _distributions(reopened) == {}
+        reopened.close()
+
+
+if __name__ == "__main__":
+    test_rollup_follows_re_upserts()
+    test_accounts_are_kept_apart()
+    test_query_filters_and_pages()
+    test_migrates_the_unscoped_layout()
+    print("✅ Results index tests passed")
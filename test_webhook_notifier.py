@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Test script for job webhooks.
+Delivers events to the local FakeWebhookReceiver, so it needs no network
+access beyond loopback. Run with pytest or directly.
+"""
+
+import os
+import time
+from benchmarks.fake_servers import FakeWebhookReceiver, UpstreamProfile
+from app.services.webhook_notifier import (
+    UnresolvableHostError, WebhookNotifier, allowed_callback_hosts, sign_payload, validate_callback_url,
+    verify_signature
+)
+
+SECRET = 's3cret'
+
+# The receiver listens on loopback, which callback URLs may only reach when allowed explicitly
+os.environ['WEBHOOK_ALLOWED_HOSTS'] = '127.0.0.1'
+
+
+def _notifier(**kwargs) -> WebhookNotifier:
+    return WebhookNotifier(secret=SECRET, allowed_hosts=allowed_callback_hosts(), **kwargs)
+
+
+def _wait_for(condition, timeout: float = 10.0) -> None:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out waiting for the notifier"
+        time.sleep(0.01)
+
+
+def test_events_are_signed():
+    receiver = FakeWebhookReceiver(UpstreamProfile(1, 0.0), secret=SECRET).start()
+    notifier = _notifier()
+    try:
+        assert notifier.notify(f"{receiver.url}/hook", 'job.completed', 'job-1', {'progress': {'processed': 3}})
+        assert notifier.flush(10)
+
+        [event] = receiver.events
+        assert event['event'] == 'job.completed' and event['job_id'] == 'job-1'
+        assert event['data'] == {'progress': {'processed': 3}}
+        assert event['signature_valid'] is True
+        assert notifier.snapshot()['delivered'] == 1
+    finally:
+        notifier.close()
+        receiver.stop()
+
+
+def test_verify_signature_rejects_tampering_and_stale_timestamps():
+    timestamp = str(int(time.time()))
+    signature = sign_payload(SECRET, timestamp, b'{"event": "job.completed"}')
+    assert verify_signature(SECRET, timestamp, b'{"event": "job.completed"}', signature)
+    assert not verify_signature(SECRET, timestamp, b'{"event": "job.failed"}', signature)
+    assert not verify_signature('other', timestamp, b'{"event": "job.completed"}', signature)
+    stale = str(int(time.time()) - 3600)
+    assert not verify_signature(SECRET, stale, b'{}', sign_payload(SECRET, stale, b'{}'))
+
+
+def test_server_errors_are_retried_with_backoff():
+    receiver = FakeWebhookReceiver(UpstreamProfile(1, 0.0, error_rate=1.0), secret=SECRET).start()
+    notifier = _notifier(retry_base_seconds=0.2)
+    try:
+        started = time.monotonic()
+        notifier.notify(f"{receiver.url}/hook", 'job.completed', 'job-1')
+        _wait_for(lambda: receiver.counters.snapshot().get('webhook_error', 0) >= 2)
+        # Second failure waited out the first backoff (0.2s); the next retry waits 0.4s
+        assert time.monotonic() - started >= 0.2
+        receiver.profile.error_rate = 0.0
+        assert notifier.flush(10)
+
+        assert time.monotonic() - started >= 0.6
+        assert [event['event'] for event in receiver.events] == ['job.completed']
+        snapshot = notifier.snapshot()
+        assert (snapshot['retried'], snapshot['delivered'], snapshot['failed']) == (2, 1, 0)
+    finally:
+        notifier.close()
+        receiver.stop()
+
+
+def test_gives_up_after_max_attempts():
+    receiver = FakeWebhookReceiver(UpstreamProfile(1, 0.0, error_rate=1.0)).start()
+    notifier = _notifier(max_attempts=3, retry_base_seconds=0.05)
+    try:
+        notifier.notify(f"{receiver.url}/hook", 'job.failed', 'job-1')
+        assert notifier.flush(10)
+
+        assert receiver.counters.snapshot()['webhook_error'] == 3
+        snapshot = notifier.snapshot()
+        assert (snapshot['retried'], snapshot['failed']) == (2, 1)
+    finally:
+        notifier.close()
+        receiver.stop()
+
+
+def test_full_queue_drops_progress_and_displaces_it_for_terminal_events():
+    # A slow receiver keeps the worker busy with the first event while the queue fills
+    receiver = FakeWebhookReceiver(UpstreamProfile(300, 0.0)).start()
+    notifier = _notifier(max_queue=2)
+    url = f"{receiver.url}/hook"
+    try:
+        assert notifier.notify(url, 'job.progress', 'job-1', {'n': 1})
+        _wait_for(lambda: notifier.snapshot()['in_flight'] == 1)
+        assert notifier.notify(url, 'job.progress', 'job-1', {'n': 2})
+        assert notifier.notify(url, 'job.progress', 'job-1', {'n': 3})
+
+        # Full: another progress event is dropped, a terminal one displaces the oldest progress event
+        assert not notifier.notify(url, 'job.progress', 'job-1', {'n': 4})
+        assert notifier.notify(url, 'job.completed', 'job-1', {'n': 5})
+        assert notifier.flush(10)
+
+        assert [event['data']['n'] for event in receiver.events] == [1, 3, 5]
+        assert notifier.snapshot()['dropped'] == 2
+    finally:
+        notifier.close()
+        receiver.stop()
+
+
+def test_refuses_non_public_callback_addresses():
+    for url in (
+        'http://127.0.0.1:8080/hook',
+        'http://localhost/hook',
+        'http://10.0.0.5/hook',
+        'http://192.168.1.10/hook',
+        'http://169.254.169.254/latest/meta-data',
+        'http://[::1]/hook',
+        'http://[::ffff:10.0.0.5]/hook',
+        'http://224.0.0.1/hook',
+    ):
+        try:
+            validate_callback_url(url, allowed_hosts=[])
+            raise AssertionError(f"{url} was accepted")
+        except UnresolvableHostError:
+            raise AssertionError(f"{url} was reported as unresolvable")
+        except ValueError:
+            pass
+
+    for url in ('ftp://8.8.8.8/hook', '/relative/hook'):
+        try:
+            validate_callback_url(url, allowed_hosts=[])
+            raise AssertionError(f"{url} was accepted")
+        except ValueError:
+            pass
+
+    validate_callback_url('https://8.8.8.8/hook', allowed_hosts=[])
+    # WEBHOOK_ALLOWED_HOSTS exempts host names and networks
+    validate_callback_url('http://127.0.0.1:8080/hook')
+    validate_callback_url('http://10.0.0.5/hook', allowed_hosts=['10.0.0.0/8'])
+
+
+def test_deliveries_to_non_public_hosts_are_refused():
+    receiver = FakeWebhookReceiver(UpstreamProfile(1, 0.0)).start()
+    # Without the loopback exemption the host is re-validated and refused before sending
+    notifier = WebhookNotifier(secret=SECRET, allowed_hosts=[])
+    try:
+        notifier.notify(f"{receiver.url}/hook", 'job.completed', 'job-1')
+        assert notifier.flush(10)
+
+        assert receiver.events == []
+        assert notifier.snapshot()['failed'] == 1
+    finally:
+        notifier.close()
+        receiver.stop()
+
+
+if __name__ == "__main__":
+    test_events_are_signed()
+    test_verify_signature_rejects_tampering_and_stale_timestamps()
+    test_server_errors_are_retried_with_backoff()
+    test_gives_up_after_max_attempts()
+    test_full_queue_drops_progress_and_displaces_it_for_terminal_events()
+    test_refuses_non_public_callback_addresses()
+    test_deliveries_to_non_public_hosts_are_refused()
+    print("✅ Webhook notifier tests passed")